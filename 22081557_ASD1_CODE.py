@@ -9,575 +9,518 @@ Original file is located at
 # **Importing** **Libraries**
 """
 
+import argparse
+import os
+import warnings
 import numpy as np
 import pandas as pd
-import seaborn as sns
 import matplotlib.pyplot as plt
-from scipy.stats import norm
 from sklearn.preprocessing import MinMaxScaler
-from sklearn.cluster import KMeans
 from scipy.optimize import curve_fit
-import statsmodels.api as sm
-from sklearn.metrics import silhouette_score
 
-"""# **Function Definitions**
-
-**`Function to Read File`**
-"""
-
-def readFile(filename):
-    """
-    Read data from a CSV file into a Pandas DataFrame, remove metadata, and
-    return two DataFrames.
-
-    Parameters:
-    - filename (str): Path to the CSV file.
-
-    Returns:
-    - df and Transposed DataFrame as countries_data.
-    """
-    # Load data into a Pandas DataFrame and drop the last column
-    try:
-        df = pd.read_csv(filename,skiprows=4).iloc[:, :-1]
-    except FileNotFoundError:
-        raise FileNotFoundError(f"File not found at {filename}. Please provide a valid file path.")
-
-     # Create a dataset with countries as columns and drop unnecessary columns
-    df.drop(["Country Code", "Indicator Code"], axis=1, inplace=True)
-
-    # Create a dataset with countries as columns and drop unnecessary column
-    country_data = df.set_index(["Country Name", "Indicator Name"])
-
-
-    # Transpose the countries dataframe
-    country_data = country_data.T
-
-    return df, country_data
-
-"""# **Data Description & Statistics**"""
-
-#To describe data and dipslay statistics
-def describe_Data(df):
-
-  df.head()
-  df.info()
-  df.columns
-  df.describe()
-
-  #Display categorical features
-  categorical_features = (df.select_dtypes(include=['object']).columns.values)
-  categorical_features
-
-  #Display numerical features
-  numerical_features = df.select_dtypes(include = ['float64', 'int64']).columns.values
-  numerical_features
-
-"""# **Data Extraction**"""
-
-#define the list of indicators relevant to the analysis
-indicators_list = [
-
-    'Electricity production from coal sources (% of total)',
-    'Electricity production from oil sources (% of total)',
-    'Electricity production from natural gas sources (% of total)',
-    'Electricity production from nuclear sources (% of total)',
-    'Electricity production from hydroelectric sources (% of total)',
-    'Electricity production from renewable sources, excluding hydroelectric (% of total)',
-    'Electric power consumption (kWh per capita)',
-    'CO2 emissions (kt)',
-    'Total greenhouse gas emissions (kt of CO2 equivalent)',
-    'Access to electricity (% of population)',
-    'Renewable energy consumption (% of total final energy consumption)',
-    'Renewable electricity output (% of total electricity output)',
-]
-
-# Extracting data for relevant indicators
-def extract_data(df,indicators_list):
-  """
-    Extract data from a DataFrame based on a list of relevant indicators.
-
-    Parameters:
-    - df (pd.DataFrame): Input DataFrame containing the data.
-    - indicator_list (list): List of indicator names to extract.
-
-    Returns:
-    - pd.DataFrame: DataFrame with data only for the specified indicators.
-
-    """
-  filtered_df = df[df["Indicator Name"].isin(indicators_list)]
-
-  return filtered_df
-
-"""## **Data Preprocessing**"""
-
-# Handle missing values (Replace missing values with 0 )
-def preprocess(df):
-
-  df.fillna(0, inplace=True)
-
-  return df
-
-# Dropping all world records
-def drop_world(df):
-
-  index = df[df["Country Name"] == "World"].index
-  df.drop(index, axis=0, inplace=True)
-  df.reset_index(drop=True, inplace=True)
-
-  return df
-
-"""# **Cluster Tools**"""
-
-def map_corr(df, size=6):
-    """Function creates a heatmap of the correlation matrix for each pair of
-    columns in the DataFrame.
-
-    Input:
-        df: pandas DataFrame
-        size: vertical and horizontal size of the plot (in inch)
-
-    The function does not have a plt.show() at the end so that the user
-    can save the figure.
-    """
-
-    corr = df.corr()
-    plt.figure(figsize=(size, size))
-    plt.matshow(corr, cmap='coolwarm', aspect='auto')
-
-    # setting ticks to column names
-    plt.xticks(range(len(corr.columns)), corr.columns, rotation=90)
-    plt.yticks(range(len(corr.columns)), corr.columns)
-
-    plt.colorbar()
-
-# Function to estimate confidence ranges
-def err_ranges(fit_params, covariance_matrix, x_data, func, alpha=0.05):
-    n = len(x_data)
-    p = len(fit_params)
-    dof = max(0, n - p)  # Degrees of freedom
-
-    t_value = abs(t.ppf(alpha / 2, dof))
-
-    err = np.sqrt(np.diag(covariance_matrix))
-
-    lower_bounds = fit_params - t_value * err
-    upper_bounds = fit_params + t_value * err
-
-    return lower_bounds, upper_bounds
-
-""" Tools to support clustering: correlation heatmap, normaliser and scale
-(cluster centres) back to original scale, check for mismatching entries """
-
-
-def map_corr(df, size=6):
-    """Function creates heatmap of correlation matrix for each pair of
-    columns in the dataframe.
-
-    Input:
-        df: pandas DataFrame
-        size: vertical and horizontal size of the plot (in inch)
-
-    The function does not have a plt.show() at the end so that the user
-    can savethe figure.
-    """
-
-    corr = df.corr()
-    plt.figure(figsize=(size, size))
-    # fig, ax = plt.subplots()
-    plt.matshow(corr, cmap='coolwarm', location="bottom")
-    # setting ticks to column names
-    plt.xticks(range(len(corr.columns)), corr.columns, rotation=90)
-    plt.yticks(range(len(corr.columns)), corr.columns)
-
-    plt.colorbar()
-    plt.show()
+# Function definitions live in the energy_analysis package; the heavy
+# libraries are only imported by the parts of it that need them
+from energy_analysis.cache import DEFAULT_CACHE_DIR
+from energy_analysis.preprocessing import DEFAULT_PIPELINE, read_block, run_pipeline
+from energy_analysis.cube import IndicatorCube
+from energy_analysis.fitting import err_bands, fit_cube, simple_model
+from energy_analysis.panel import fit_cube_panel
+from energy_analysis.artifacts import DEFAULT_STORE, save_clusters, save_panel
+from energy_analysis.clustering import IncrementalClusters, choose_k, cluster_summary, sweep_k
+from energy_analysis.projection import METHODS as PROJECTIONS, fit_projection, plot_projection
+from energy_analysis.evaluation import cluster_scores
+from energy_analysis.plotting import RenderJob, draw, render_jobs, series_jobs
+from energy_analysis.ranking import Rankings
+from energy_analysis.tracing import TRACER
 
 """# **Main Function**"""
 
 if __name__ == "__main__":
-  df, country_data = readFile('API_19_DS2_en_csv_v2_6300757.csv')
-  df = extract_data(df, indicators_list)
-  df = preprocess(df)
-
-# Filtering data for the "CO2 emissions (kt)" indicator, dropping unnecessary columns
-df_co2 = df[(df["Indicator Name"] == "CO2 emissions (kt)") & (df["Country Name"] == "World")].iloc[:, :-2]
-
-# Calculating the mean of CO2 emissions for each year and plotting the results
-df_co2.iloc[:, 32:].mean().plot(kind="line", figsize=(14, 5))
-
-plt.xlabel('Year')
-plt.ylabel('CO2 emissions (kt)')
-
-plt.title("World Average CO2 Emission\n1990 - 2020", fontsize=18)
-plt.show()
-
-# Selecting data for a specific year (e.g., 2015)
-target_year = '2015'
-
-indicators = [
-
-    'Electricity production from coal sources (% of total)',
-    'Electricity production from oil sources (% of total)',
-    'Electricity production from natural gas sources (% of total)',
-    'Electricity production from nuclear sources (% of total)',
-    'Electricity production from hydroelectric sources (% of total)',
-    'Electricity production from renewable sources, excluding hydroelectric (% of total)',
-    ]
-
-#Selecting world data
-world_data = df[df["Country Name"] == "World"]
-
-#Extracting relevant indicators
-filtered_df = world_data[world_data["Indicator Name"].isin(indicators)]
-
-# Create a dictionary mapping long names to short forms
-short_labels = {
-    'Electricity production from coal sources (% of total)': 'Coal',
-    'Electricity production from oil sources (% of total)': 'Oil',
-    'Electricity production from natural gas sources (% of total)': 'Natural Gas',
-    'Electricity production from nuclear sources (% of total)':'Nuclear',
-    'Electricity production from hydroelectric sources (% of total)':'Hydroelectric',
-    'Electricity production from renewable sources, excluding hydroelectric (% of total)':'Renewable',
-}
-
-# Replace labels with short forms
-filtered_df['Short Indicator'] = filtered_df['Indicator Name'].map(short_labels)
-labels = filtered_df['Short Indicator']
-sizes = filtered_df[target_year]
-
-# Plotting the pie chart
-plt.figure(figsize=(10, 8))
-plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140, colors=['#ff9999', '#66b3ff', '#99ff99'])
-plt.title(f'Electricity Production Sources (% of Total) - World ({target_year})')
-plt.show()
-
-# List of countries to keep in the dataset
-countries = [
-      'United States',
-      'China',
-      'India',
-      'Russian Federation',
-      'United Kingdom',
-      'France',
-      'Germany',
-      'Japan',
-      'Brazil',
-      'Canada',
-      'Australia',
-      'South Korea',
-      'Italy',
-      'Spain',
-      'Mexico',
-      'Indonesia',
-      'Turkey',
-      'Nigeria',
-      'Saudi Arabia',
-      'Iceland',
-      'Pakistan',
-      'Kuwait',
-      'Sweden',
-      'Norway',
-      'Denmark',
-      'Finland',
-      'New Zealand',
-      'Austria',
-      'Switzerland',
+  # The input file, target year and fitted country can be changed on the
+  # command line; --config runs the analyses of a TOML/YAML spec through the
+  # batch driver instead of this walk-through. --save-artifact stores the
+  # clusters and forecasts as new artifact versions (off by default).
+  # Opt-in tracing: --trace writes a Chrome trace of the stages and the main
+  # functions, --profile-stage dumps a cProfile profile of one stage
+  stages = ('load', 'pipeline', 'cube', 'charts', 'clustering', 'fitting', 'comparison', 'render')
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--csv', help='World Bank CSV (default: API_19_DS2_en_csv_v2_6300757.csv, '
+                                    "or the spec's data.csv with --config)")
+  parser.add_argument('--target-year', default='2015')
+  parser.add_argument('--country', default='Iceland')
+  parser.add_argument('--shapes', metavar='FILE', help='Country shapes for the world maps')
+  parser.add_argument('--indicators', nargs='+', metavar='NAME')
+  parser.add_argument('--countries', nargs='+', metavar='NAME')
+  parser.add_argument('--config', metavar='SPEC')
+  parser.add_argument('--workers', type=int)
+  parser.add_argument('--save-artifact', action='store_true',
+                      help='Store the clusters and forecasts in the artifact store')
+  parser.add_argument('--projection', choices=('none',) + PROJECTIONS, default='none')
+  parser.add_argument('--variance', type=float, default=0.9)
+  parser.add_argument('--trace', metavar='FILE')
+  parser.add_argument('--trace-memory', action='store_true')
+  parser.add_argument('--profile-stage', metavar='STAGE', help=f"One of: {', '.join(stages)}")
+  parser.add_argument('--profile-out', metavar='FILE')
+  args = parser.parse_args()
+  if args.profile_stage and args.profile_stage not in stages:
+    parser.error(f"--profile-stage: unknown stage {args.profile_stage!r}, "
+                 f"expected one of: {', '.join(stages)}")
+  if args.config:
+    from energy_analysis.driver import load_spec, run_spec
+    spec = load_spec(args.config)
+    if args.csv:
+      spec.setdefault('data', {})['csv'] = args.csv
+    print(run_spec(spec, workers=args.workers))
+    raise SystemExit
+  if args.trace or args.profile_stage:
+    TRACER.enable(args.trace, memory=args.trace_memory,
+                  profile_stage=args.profile_stage, profile_path=args.profile_out)
+
+  TRACER.stage('load')
+
+  # Load as a float32 block and run the indicator selection, dropping of
+  # empty series and gap interpolation as an in-place pipeline, reporting
+  # each stage's time and peak memory
+  block = read_block(args.csv or 'API_19_DS2_en_csv_v2_6300757.csv')
+  TRACER.stage('pipeline')
+  observed_cells = ~np.isnan(block.values)
+  block, stage_report = run_pipeline(block, DEFAULT_PIPELINE)
+  print(stage_report)
+
+  # Index indicator x country x year once, the sections below slice it;
+  # raw_cube keeps only the observed values, for rankings and fits that
+  # must not treat interpolated years as data
+  TRACER.stage('cube')
+  cube = IndicatorCube.from_block(block)
+  raw_cube = IndicatorCube.from_block(block, observed_cells)
+
+  # Charts are shown one at a time, or queued and rendered to files in parallel
+  # (Agg backend) when the RENDER_DIR environment variable is set
+  render_dir = os.environ.get('RENDER_DIR')
+  render_queue = []
+  if render_dir:
+      plt.switch_backend('Agg')
+
+  def show_chart(name, chart, **kwargs):
+      job = RenderJob(name, chart, kwargs)
+      if render_dir:
+          render_queue.append(job)
+      else:
+          draw(job)
+          plt.show()
+
+  TRACER.stage('charts')
+
+  # Selecting world data for the "CO2 emissions (kt)" indicator
+  df_co2 = pd.Series(cube.series("CO2 emissions (kt)", "World"), index=cube.years)
+
+  # Plotting the CO2 emissions for each year from 1990 to 2020
+  df_co2 = df_co2.loc['1990':'2020']
+  show_chart('world_co2', 'line_chart', x=df_co2.index, lines={None: df_co2},
+             xlabel='Year', ylabel='CO2 emissions (kt)',
+             title="World Average CO2 Emission\n1990 - 2020", title_fontsize=18, xtick_step=5)
+
+  # Selecting data for a specific year (e.g., 2015)
+  target_year = args.target_year
+
+  indicators = args.indicators or [
+
+      'Electricity production from coal sources (% of total)',
+      'Electricity production from oil sources (% of total)',
+      'Electricity production from natural gas sources (% of total)',
+      'Electricity production from nuclear sources (% of total)',
+      'Electricity production from hydroelectric sources (% of total)',
+      'Electricity production from renewable sources, excluding hydroelectric (% of total)',
       ]
 
-# Assuming df is your DataFrame
-df_countries = df[df['Country Name'].isin(countries)]
-
-# Selecting data for coal production
-coal_data = df_countries[df_countries["Indicator Name"] == "Electricity production from coal sources (% of total)"]
-
-# Sorting by coal production in descending order
-sorted_coal_data = coal_data.sort_values(by='2015', ascending=False)
-
-# Taking the top 5 countries
-top_5_coal_countries = sorted_coal_data.head(10)
-
-# Data for the bar chart
-countries = top_5_coal_countries['Country Name']
-coal_percentages = top_5_coal_countries['2015']
-
-# Plotting the bar chart
-plt.figure(figsize=(13, 6))
-plt.bar(countries, coal_percentages, color='grey')
-plt.xlabel('Country')
-plt.ylabel('Electricity Production from Coal (%)')
-plt.title('Top 10 Countries Generating Electricity from Coal (2015)')
-plt.show()
-
-# Selecting data for Greenhouse gas emissions
-greenhouse_data = df_countries[df_countries["Indicator Name"] == "Total greenhouse gas emissions (kt of CO2 equivalent)"]
-
-# Sorting by CO2 emissions in descending order
-sorted_greenhouse_data = greenhouse_data.sort_values(by='2015', ascending=False)
-
-# Taking the top 10 countries
-top_10_greenhouse_countries = sorted_greenhouse_data.head(10)
-
-# Data for the bar chart
-countries = top_10_greenhouse_countries['Country Name']
-greenhouse_emissions = top_10_greenhouse_countries['2015']/1000
-
-# Plotting the bar chart
-plt.figure(figsize=(13, 8))
-plt.bar(countries, greenhouse_emissions, color='green')
-plt.xlabel('Country')
-plt.ylabel('Greenhouse gas emissions (kt of CO2 equivalent)')
-plt.title('Top 10 Countries Producing Greenhouse Gas Emissions (kt of CO2 equivalent) (2015)')
-plt.show()
-
-# Selecting multiple years (e.g., 2010 to 2020)
-years = ['2010', '2011', '2012', '2013', '2014', '2015', '2016', '2017', '2018', '2019', '2020']
-
-# Selecting data for Renewable Energy Consumption over the years
-renewable_data = df_countries[df_countries["Indicator Name"] == "Renewable energy consumption (% of total final energy consumption)"]
-
-# Sorting by renewable energy consumption in descending order
-renewable_data = renewable_data.sort_values(by=years[-1], ascending=False)
-
-# Selecting the top 7 countries
-top_7_countries = renewable_data.head(7)
-
-# Data for the line chart
-countries = top_7_countries['Country Name']
-renewable_consumption_percentage_over_years = top_7_countries[years]
-
-# Plotting the line chart
-plt.figure(figsize=(15, 8))
-for country in countries:
-    plt.plot(years, renewable_consumption_percentage_over_years[top_7_countries['Country Name'] == country].iloc[0], label=country)
-
-plt.xlabel('Year')
-plt.ylabel('Renewable Energy Consumption\n(% of total final energy consumption)')
-plt.title('Top 7 Countries for Renewable Energy Consumption')
-plt.legend(loc='upper left', bbox_to_anchor=(1, 1))
-plt.show()
-
-import geopandas as gpd
-import matplotlib.pyplot as plt
-
-# Assume you have a DataFrame 'df' with the provided dataset format
-
-# Specify the indicator name
-indicator_name = 'Electric power consumption (kWh per capita)'
-
-# Filter the DataFrame based on the indicator name
-df_selected = df[df['Indicator Name'] == indicator_name]
-
-# Load the world map shapefile
-world = gpd.read_file(gpd.datasets.get_path('naturalearth_lowres'))
-
-# Merge the world map with your selected data
-world = world.merge(df_selected, how='left', left_on='name', right_on='Country Name')
-
-# Plot the world map for the specified indicator
-fig, ax = plt.subplots(1, 1, figsize=(15, 10))
-world.boundary.plot(ax=ax)  # Plot the country boundaries
-world.plot(column='2019', ax=ax, legend=True, legend_kwds={'label': f"{indicator_name} - 2019"})
-plt.title(f'Global {indicator_name} by Country - 2019')
-plt.show()
-
-# Selecting data for Greenhouse gas emissions
-greenhouse_data = df_countries[df_countries["Indicator Name"] == "Electric power consumption (kWh per capita)"]
-
-# Sorting by CO2 emissions in descending order
-sorted_greenhouse_data = greenhouse_data.sort_values(by='2012', ascending=True)
-
-# Taking the top 10 countries
-top_10_greenhouse_countries = sorted_greenhouse_data.head(10)
-
-# Data for the bar chart
-countries = top_10_greenhouse_countries['Country Name']
-greenhouse_emissions = top_10_greenhouse_countries['2012']/1000
-
-# Plotting the bar chart
-plt.figure(figsize=(13, 8))
-plt.bar(countries, greenhouse_emissions, color='green')
-plt.xlabel('Country')
-plt.ylabel('Greenhouse gas emissions (kt of CO2 equivalent)')
-plt.title('Top 10 Countries Producing Least Greenhouse Gas Emissions (kt of CO2 equivalent) (2015)')
-plt.show()
-
-# Selecting data for Electric power consumption
-electricity_data = df_countries[df_countries["Indicator Name"] == "Electric power consumption (kWh per capita)"]
-
-# Sorting by electric power consumption in descending order
-sorted_electricity_data = electricity_data.sort_values(by='2012', ascending=False)
-
-# Taking the top 10 countries
-top_10_electricity_countries = sorted_electricity_data.head(10)
-
-# Data for the horizontal bar chart
-countries = top_10_electricity_countries['Country Name']
-electricity_consumption = top_10_electricity_countries['2012']
-
-# Specify different colors for each bar
-bar_colors = ['skyblue', 'lightgreen', 'lightcoral', 'lightsalmon', 'lightsteelblue', 'lightpink', 'lightseagreen', 'lightcyan', 'lightgoldenrodyellow', 'lightblue']
-
-# Plotting the horizontal bar chart
-plt.figure(figsize=(13, 8))
-plt.barh(countries, electricity_consumption, color=bar_colors)  # Use barh for horizontal bar chart
-plt.xlabel('Electric Power Consumption (kWh per capita)')
-plt.ylabel('Country')
-plt.title('Top 10 Countries in Electric Power Consumption (kWh per capita) - 2012')
-plt.show()
-
-# Filtering data for the "Renewable enery consumption (%)" indicator, dropping unnecessary columns
-df_electricity = df[(df["Indicator Name"] == "Electric power consumption (kWh per capita)") & (df["Country Name"] == "World")].iloc[:, :-8]
-
-# Calculating the mean of CO2 emissions for each year and plotting the results
-df_electricity.iloc[:, 32:].mean().plot(kind="line", figsize=(14, 5))
-
-plt.xlabel('Year')
-plt.ylabel('Electricity Consumption)')
-plt.title("World Avergae Electricity Consumption\n1990 to 2020", fontsize=18)
-plt.show()
-
-# Filtering data for the world for the "Renewable energy consumption (% of total final energy consumption)" indicator
-df_world_renewable = df[(df["Indicator Name"] == "Renewable energy consumption (% of total final energy consumption)") & (df["Country Name"] == "World")]
-
-# Selecting data for all years from 1990 to 2020
-years = [str(year) for year in range(1990, 2021)]
-df_world_renewable_selected = df_world_renewable[years]
-
-# Plotting the line for the world
-plt.figure(figsize=(14, 5))
-plt.plot(years, df_world_renewable_selected.iloc[0], marker='o', linestyle='-', color='lightgreen')
-
-# Set x-axis ticks at a 5-year interval
-plt.xticks(np.arange(0, len(years), 5), labels=years[::5])
-
-plt.xlabel('Year')
-plt.ylabel('Renewable Energy Consumption (% of total final energy consumption)')
-plt.title('World Renewable Energy Consumption Over Years (1990-2020)', fontsize=18)
-
-plt.show()
-
-# Filtering data for the "CO2 emissions (kt)" indicator, dropping unnecessary columns
-data = df[df["Indicator Name"] == "Renewable energy consumption (% of total final energy consumption)"].iloc[:, :-2]
-
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.metrics import silhouette_score
-import matplotlib.pyplot as plt
-import numpy as np
-
-# Selecting relevant data
-df_renewable = df[df['Indicator Name'] == 'Renewable energy consumption (% of total final energy consumption)']
-
-# Choose the columns for analysis
-data = df_renewable.loc[:, '2010':'2020']
-
-# Normalize the data
-scaler = MinMaxScaler()
-data_scaled = scaler.fit_transform(data)
-
-# Perform K-Means clustering
-kmeans = KMeans(n_clusters=5, random_state=42)
-clusters = kmeans.fit_predict(data_scaled)
-
-# Calculate silhouette score
-silhouette_avg = silhouette_score(data_scaled, clusters)
-print(f"Silhouette Score: {round(silhouette_avg, 2)}")
-
-# Add cluster labels to the DataFrame
-df_renewable['Cluster'] = clusters
-
-# Visualize the results
-markers = ['o', 's', '^', 'D', 'v']  # Different markers for each cluster
-for i in range(max(clusters) + 1):
-    cluster_data = data_scaled[clusters == i]
-    plt.scatter(cluster_data[:, 0], cluster_data[:, 1], label=f'Cluster {i + 1}', marker=markers[i])
-
-plt.scatter(kmeans.cluster_centers_[:, 0], kmeans.cluster_centers_[:, 1], s=300, c='red', marker='X')
-
-# Round cluster center values
-cluster_centers_rounded = np.round(kmeans.cluster_centers_, 2)
-
-plt.title("K-Means Clustering of Countries based on Renewable Energy Consumption")
-plt.xlabel("Renewable Energy Consumption (Scaled)")
-plt.ylabel("Other Economic Indicator (Scaled)")
-plt.legend(title='Clusters')
-plt.show()
-
-import numpy as np
-import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
-from scipy.stats import t
-
-# Choose a specific country, indicator, and years for curve fitting
-country_name = 'Iceland'
-indicator_name = 'Renewable energy consumption (% of total final energy consumption)'
-years = ['2010', '2011', '2012', '2013', '2014', '2015', '2016', '2017', '2018', '2019', '2020']
-
-# Extract relevant data from your DataFrame
-country_data = df[(df['Country Name'] == country_name) & (df['Indicator Name'] == indicator_name)]
-x_data = country_data[years].values.flatten()  # Flatten the data for curve fitting
-y_data = np.arange(len(years))
-
-# Define the model function
-def simple_model(x, a, b, c):
-    return a * x**2 + b * x + c
-
-# Fit the model to the data using curve_fit
-params, covariance = curve_fit(simple_model, y_data, x_data)
-
-# Calculate confidence ranges
-lower_bounds, upper_bounds = err_ranges(params, covariance, y_data, simple_model)
-
-# Generate data for plotting the fitted curve
-x_fit = np.linspace(min(y_data), max(y_data), 1000)
-y_fit = simple_model(x_fit, *params)
-
-# Plot the data, the fitted curve, and the confidence range
-plt.scatter(y_data, x_data, label='Data')
-plt.plot(x_fit, y_fit, color='red', label='Fitted Curve')
-plt.fill_between(x_fit, simple_model(x_fit, *lower_bounds), simple_model(x_fit, *upper_bounds), color='orange', alpha=0.3, label='Confidence Range')
-
-plt.xlabel('Year')
-plt.ylabel('Your Indicator')
-plt.title(f'Curve Fitting for {country_name}: {indicator_name}')
-plt.legend()
-plt.show()
-
-# Assuming 'Country' is the column containing country names
-# Replace 'Country' with the actual column name if it's different
-
-# Choose one country from each cluster
-selected_countries = []
-for i in range(max(clusters) + 1):
-    cluster_data = df_renewable[df_renewable['Cluster'] == i]
-    selected_country = cluster_data.iloc[0]['Country Name']
-    selected_countries.append(selected_country)
-
-# Print the selected countries
-print("Selected Countries from Each Cluster:")
-for i, country in enumerate(selected_countries):
-    print(f"Cluster {i + 1}: {country}")
-
-# Choose a subset of years for visualization
-selected_years = ['2010', '2012', '2015', '2018', '2020']
-
-# Analyze and compare the selected countries within each cluster
-for i, country in enumerate(selected_countries):
-    cluster_data = df_renewable[df_renewable['Cluster'] == i]
-    country_data = cluster_data[cluster_data['Country Name'] == country]
-
-    # Select only the chosen years
-    country_data_subset = country_data[['Country Name'] + selected_years]
-
-    # Perform analysis and visualization for each selected country within the cluster
-    # Plotting a line chart for the selected years
-    plt.plot(country_data_subset.columns[1:], country_data_subset.iloc[0, 1:], label=f'{country} - Cluster {i + 1}')
-
-# Customize the plot
-plt.title("Comparison of Selected Countries within Clusters")
-plt.xlabel("Year")
-plt.ylabel("Renewable Energy Consumption \n(% of total final energy consumption)")
-
-# Place the legend to the right outside the plot
-plt.legend(title='Legend', bbox_to_anchor=(1.05, 1), loc='upper left')
-plt.show()
\ No newline at end of file
+  # Create a dictionary mapping long names to short forms
+  short_labels = {
+      'Electricity production from coal sources (% of total)': 'Coal',
+      'Electricity production from oil sources (% of total)': 'Oil',
+      'Electricity production from natural gas sources (% of total)': 'Natural Gas',
+      'Electricity production from nuclear sources (% of total)':'Nuclear',
+      'Electricity production from hydroelectric sources (% of total)':'Hydroelectric',
+      'Electricity production from renewable sources, excluding hydroelectric (% of total)':'Renewable',
+  }
+
+  # Names given with --indicators must be indicators of the data
+  unknown = [name for name in indicators if name not in cube.indicators]
+  if unknown:
+      parser.error(f"--indicators: not in the data: {', '.join(unknown)}")
+
+  # Selecting world data for the relevant indicators, with short labels
+  labels = [short_labels.get(name, name) for name in indicators]
+  sizes = raw_cube.cross_section(target_year)[[raw_cube.indicators.get_loc(name) for name in indicators],
+                                              raw_cube.countries.get_loc("World")]
+
+  # Series without data for the year stay NaN after the pipeline; leave
+  # their wedges out rather than drawing a broken pie
+  has_data = np.isfinite(sizes)
+  if not has_data.all():
+      print(f"No {target_year} world data for: "
+            f"{', '.join(label for label, ok in zip(labels, has_data) if not ok)}")
+  labels = [label for label, ok in zip(labels, has_data) if ok]
+  sizes = sizes[has_data]
+
+  # Plotting the pie chart
+  if len(sizes):
+      show_chart('world_electricity_sources', 'pie_chart', sizes=sizes, labels=labels,
+                 title=f'Electricity Production Sources (% of Total) - World ({target_year})',
+                 colors=['#ff9999', '#66b3ff', '#99ff99'])
+
+  # List of countries to keep in the dataset
+  countries = args.countries or [
+        'United States',
+        'China',
+        'India',
+        'Russian Federation',
+        'United Kingdom',
+        'France',
+        'Germany',
+        'Japan',
+        'Brazil',
+        'Canada',
+        'Australia',
+        'South Korea',
+        'Italy',
+        'Spain',
+        'Mexico',
+        'Indonesia',
+        'Turkey',
+        'Nigeria',
+        'Saudi Arabia',
+        'Iceland',
+        'Pakistan',
+        'Kuwait',
+        'Sweden',
+        'Norway',
+        'Denmark',
+        'Finland',
+        'New Zealand',
+        'Austria',
+        'Switzerland',
+        ]
+
+  # Restricting the observed values to the selected countries
+  cube_countries = raw_cube.select(countries=countries)
+
+  # Ranking the selected countries for every indicator and year in one pass
+  rankings = Rankings(cube_countries, n=10)
+
+  # Taking the top 10 countries by coal production
+  top_5_coal_countries = rankings.top("Electricity production from coal sources (% of total)", target_year, 10)
+
+  # Data for the bar chart
+  countries = top_5_coal_countries.index
+  coal_percentages = top_5_coal_countries
+
+  # Plotting the bar chart
+  show_chart('top_coal', 'bar_chart', labels=countries, values=coal_percentages,
+             xlabel='Country', ylabel='Electricity Production from Coal (%)',
+             title=f'Top 10 Countries Generating Electricity from Coal ({target_year})',
+             figsize=(13, 6), color='grey')
+
+  # Taking the top 10 countries by greenhouse gas emissions
+  top_10_greenhouse_countries = rankings.top("Total greenhouse gas emissions (kt of CO2 equivalent)", target_year, 10)
+
+  # Data for the bar chart
+  countries = top_10_greenhouse_countries.index
+  greenhouse_emissions = top_10_greenhouse_countries/1000
+
+  # Plotting the bar chart
+  show_chart('top_greenhouse', 'bar_chart', labels=countries, values=greenhouse_emissions,
+             xlabel='Country', ylabel='Greenhouse gas emissions (kt of CO2 equivalent)',
+             title=f'Top 10 Countries Producing Greenhouse Gas Emissions (kt of CO2 equivalent) ({target_year})',
+             color='green')
+
+  # Selecting multiple years (e.g., 2010 to 2020)
+  years = ['2010', '2011', '2012', '2013', '2014', '2015', '2016', '2017', '2018', '2019', '2020']
+
+  # Selecting the top 7 countries for Renewable Energy Consumption in the last year
+  renewable_indicator = "Renewable energy consumption (% of total final energy consumption)"
+  countries = rankings.top(renewable_indicator, years[-1], 7).index
+
+  # Data for the line chart
+  renewable_consumption_percentage_over_years = cube_countries.frame(renewable_indicator).loc[countries, years]
+
+  # Plotting the line chart
+  show_chart('top_renewable', 'line_chart', x=years,
+             lines={country: renewable_consumption_percentage_over_years.loc[country] for country in countries},
+             xlabel='Year', ylabel='Renewable Energy Consumption\n(% of total final energy consumption)',
+             title='Top 7 Countries for Renewable Energy Consumption', figsize=(15, 8),
+             legend_kwargs=dict(loc='upper left', bbox_to_anchor=(1, 1)))
+
+  from energy_analysis.geometry import WorldGeometry, render_maps
+
+  # Specify the indicator name
+  indicator_name = 'Electric power consumption (kWh per capita)'
+
+  # Load the simplified world map shapes (cached after the first run); the
+  # maps are skipped when no shape file is given or bundled with geopandas
+  try:
+      world_geometry = WorldGeometry.load(args.shapes)
+  except FileNotFoundError as exc:
+      warnings.warn(f"Skipping the world maps: {exc}")
+      world_geometry = None
+
+  if world_geometry is not None:
+      # Look up each country's 2019 value for the map polygons
+      world = world_geometry.with_values('2019', world_geometry.values(
+          cube.countries, cube.indicator(indicator_name)[:, cube.years.get_loc('2019')]))
+
+      # Plot the world map for the specified indicator
+      show_chart('map_power_consumption', 'choropleth', world=world, column='2019',
+                 title=f'Global {indicator_name} by Country - 2019',
+                 legend_label=f"{indicator_name} - 2019")
+
+  # Taking the bottom 10 countries by electric power consumption
+  top_10_greenhouse_countries = rankings.bottom("Electric power consumption (kWh per capita)", '2012', 10)
+
+  # Data for the bar chart
+  countries = top_10_greenhouse_countries.index
+  greenhouse_emissions = top_10_greenhouse_countries/1000
+
+  # Plotting the bar chart
+  show_chart('bottom_greenhouse', 'bar_chart', labels=countries, values=greenhouse_emissions,
+             xlabel='Country', ylabel='Greenhouse gas emissions (kt of CO2 equivalent)',
+             title='Top 10 Countries Producing Least Greenhouse Gas Emissions (kt of CO2 equivalent) (2015)',
+             color='green')
+
+  # Taking the top 10 countries by electric power consumption
+  top_10_electricity_countries = rankings.top("Electric power consumption (kWh per capita)", '2012', 10)
+
+  # Data for the horizontal bar chart
+  countries = top_10_electricity_countries.index
+  electricity_consumption = top_10_electricity_countries
+
+  # Specify different colors for each bar
+  bar_colors = ['skyblue', 'lightgreen', 'lightcoral', 'lightsalmon', 'lightsteelblue', 'lightpink', 'lightseagreen', 'lightcyan', 'lightgoldenrodyellow', 'lightblue']
+
+  # Plotting the horizontal bar chart
+  show_chart('top_power_consumption', 'bar_chart', labels=countries, values=electricity_consumption,
+             xlabel='Electric Power Consumption (kWh per capita)', ylabel='Country',
+             title='Top 10 Countries in Electric Power Consumption (kWh per capita) - 2012',
+             color=bar_colors, horizontal=True)
+
+  # Selecting world data for the "Electric power consumption (kWh per capita)" indicator
+  df_electricity = pd.Series(cube.series("Electric power consumption (kWh per capita)", "World"), index=cube.years)
+
+  # Plotting the electricity consumption for each year from 1990 to 2014
+  df_electricity = df_electricity.loc['1990':'2014']
+  show_chart('world_power_consumption', 'line_chart', x=df_electricity.index,
+             lines={None: df_electricity}, xlabel='Year', ylabel='Electricity Consumption)',
+             title="World Avergae Electricity Consumption\n1990 to 2020", title_fontsize=18,
+             xtick_step=5)
+
+  # Selecting world data for the "Renewable energy consumption (% of total final energy consumption)" indicator
+  df_world_renewable = cube.series("Renewable energy consumption (% of total final energy consumption)", "World")
+
+  # Selecting data for all years from 1990 to 2020
+  years = [str(year) for year in range(1990, 2021)]
+  df_world_renewable_selected = df_world_renewable[cube.year_slice('1990', '2020')]
+
+  # Plotting the line for the world, x-axis ticks at a 5-year interval
+  show_chart('world_renewable', 'line_chart', x=years, lines={None: df_world_renewable_selected},
+             xlabel='Year', ylabel='Renewable Energy Consumption (% of total final energy consumption)',
+             title='World Renewable Energy Consumption Over Years (1990-2020)', title_fontsize=18,
+             xtick_step=5, marker='o', linestyle='-', color='lightgreen')
+
+  TRACER.stage('clustering')
+
+  # Selecting relevant data, one row per country (a view of the cube)
+  df_renewable = cube.frame('Renewable energy consumption (% of total final energy consumption)')
+
+  # Choose the columns for analysis, countries without any data are left out
+  data = df_renewable.loc[:, '2010':'2020'].dropna()
+
+  # Normalize the data
+  scaler = MinMaxScaler()
+  data_scaled = scaler.fit_transform(data.values)
+
+  # Optionally cluster on the principal components explaining --variance of
+  # the scaled data (--projection pca/randomized/incremental/auto)
+  projection = None
+  features = data_scaled
+  if args.projection != 'none':
+      projection = fit_projection(data_scaled, variance=args.variance, method=args.projection)
+      print(projection.report().round(3))
+      features = projection.transform(data_scaled)
+
+  # Sweep the number of clusters, each k warm-started from the previous centres
+  k_report = sweep_k(features, range(2, 9))
+  print(k_report.round(3))
+
+  # Perform K-Means clustering with the best scoring number of clusters
+  n_clusters = choose_k(k_report)
+  kmeans = k_report.attrs['models'][n_clusters]
+  clusters = kmeans.labels_
+
+  # Silhouette score of the chosen clustering, with cheaper companion indices
+  scores = cluster_scores(features, clusters)
+  silhouette_avg = scores['silhouette']
+  print(f"Silhouette Score: {round(silhouette_avg, 2)}")
+  print(f"Davies-Bouldin Index: {round(scores['davies_bouldin'], 2)}")
+  print(f"Calinski-Harabasz Index: {round(scores['calinski_harabasz'], 2)}")
+
+  if args.save_artifact:
+      # Keep the fitted scaler and centres so that a new World Bank release can be
+      # folded in with cluster_state.update(...) instead of re-clustering from scratch
+      cluster_state = IncrementalClusters.from_model(data, scaler, kmeans)
+      os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+      cluster_state.save(os.path.join(DEFAULT_CACHE_DIR, 'renewable_clusters.pkl'))
+
+      # Store the scaler and centres as a versioned artifact for scoring new
+      # countries (energy_analysis.scoring) without sklearn
+      save_clusters(DEFAULT_STORE, 'renewable_clusters', scaler, kmeans.cluster_centers_,
+                    data.columns, labels=clusters, index=data.index, projection=projection)
+
+  # Round cluster center values
+  cluster_centers_rounded = np.round(kmeans.cluster_centers_, 2)
+
+  # Visualize the results on the first two principal components of the
+  # scaled data, centres mapped back from the space they were found in
+  centers_scaled = kmeans.cluster_centers_
+  if projection is not None:
+      centers_scaled = projection.inverse_transform(centers_scaled)
+  view = plot_projection(data_scaled, projection)
+  xlabel, ylabel = view.axis_labels()
+  show_chart('renewable_clusters', 'cluster_scatter', points=view.transform(data_scaled),
+             labels=clusters, centers=view.transform(centers_scaled),
+             title="K-Means Clustering of Countries based on Renewable Energy Consumption",
+             xlabel=f"Renewable Energy Consumption, {xlabel}", ylabel=ylabel)
+
+  # Cluster countries on all indicators and years at once: the indicator x
+  # year columns are projected onto the components explaining --variance of
+  # them before k-means, which then works on a few columns instead of
+  # hundreds. Only 1990-2015 is used; countries without data for some
+  # indicator are left out, and of the rest only the indicator-year columns
+  # all of them have are kept, since years outside a series stay NaN.
+  wide = cube.wide_frame(first_year='1990', last_year='2015')
+  wide = wide.loc[wide.notna().T.groupby(level=0).any().all()]
+  wide = wide.loc[:, wide.notna().all()]
+  wide_scaled = MinMaxScaler().fit_transform(wide.to_numpy())
+  wide_projection = fit_projection(
+      wide_scaled, variance=args.variance,
+      method='auto' if args.projection == 'none' else args.projection)
+  print(f"{wide.shape[1]} indicator-year columns -> {wide_projection.n_components} "
+        f"components ({wide_projection.method}), "
+        f"{wide_projection.explained_variance_ratio.sum():.1%} of the variance")
+  wide_features = wide_projection.transform(wide_scaled)
+  wide_report = sweep_k(wide_features, range(2, 9))
+  wide_kmeans = wide_report.attrs['models'][choose_k(wide_report)]
+  print(wide_report.round(3))
+  wide_view = plot_projection(wide_scaled, wide_projection)
+  xlabel, ylabel = wide_view.axis_labels()
+  show_chart('all_indicator_clusters', 'cluster_scatter', points=wide_view.transform(wide_scaled),
+             labels=wide_kmeans.labels_,
+             centers=wide_view.transform(wide_projection.inverse_transform(wide_kmeans.cluster_centers_)),
+             title="K-Means Clustering of Countries on All Indicators", xlabel=xlabel,
+             ylabel=ylabel)
+
+  TRACER.stage('fitting')
+
+  # Choose a specific country, indicator, and years for curve fitting
+  country_name = args.country
+  indicator_name = 'Renewable energy consumption (% of total final energy consumption)'
+  years = ['2010', '2011', '2012', '2013', '2014', '2015', '2016', '2017', '2018', '2019', '2020']
+
+  # Extract relevant data from the cube: x is the year position, y the indicator
+  x_data = np.arange(len(years))
+  y_data = np.full(len(years), np.nan)
+  if country_name in raw_cube.countries:
+      y_data = raw_cube.series(indicator_name, country_name)[raw_cube.year_slice(years[0], years[-1])]
+
+  # Only years observed in the raw data are fitted; the quadratic needs at
+  # least three of them
+  observed = np.isfinite(y_data)
+  fit_country = observed.sum() >= 3
+  if not fit_country:
+      print(f"Skipping the curve fit for {country_name}: {observed.sum()} of "
+            f"{len(years)} years have data")
+  else:
+      # Fit the model to the data using curve_fit
+      params, covariance = curve_fit(simple_model, x_data[observed], y_data[observed])
+
+      # Generate data for plotting the fitted curve and its confidence range
+      x_fit = np.linspace(min(x_data), max(x_data), 1000)
+      y_fit, lower_band, upper_band = err_bands(params, covariance, x_data[observed],
+                                                simple_model, x_eval=x_fit)
+
+      # Plot the data, the fitted curve, and the confidence range
+      show_chart('fit_iceland_renewable', 'fit_chart', x=x_data, y=y_data, x_fit=x_fit, y_fit=y_fit,
+                 lower=lower_band, upper=upper_band, title=f'Curve Fitting for {country_name}: {indicator_name}',
+                 xlabel='Year', ylabel=indicator_name)
+
+  # Fit the same model to every indicator and country over the same years
+  all_fits = fit_cube(raw_cube, simple_model, years[0], years[-1])
+  print(f"Fitted {len(all_fits)} indicator/country series")
+  if fit_country:
+      print(all_fits.loc[(indicator_name, country_name), ['a', 'b', 'c']])
+
+  # Fit linear, quadratic, exponential and logistic models to every country's
+  # series, keep the best by AIC and forecast it out to 2030
+  panel, (forecast_fit, forecast_lower, forecast_upper) = fit_cube_panel(
+      raw_cube, years[0], years[-1], horizon=2030, indicators=[indicator_name])
+  print(panel.report)
+  print(panel.selection['model'].value_counts())
+  if args.save_artifact:
+      save_panel(DEFAULT_STORE, 'renewable_forecasts', panel, first_year=int(years[0]))
+  if fit_country:
+      best_model = panel.selection.loc[(indicator_name, country_name), 'model']
+      print(f"{country_name}: {best_model} model, 2030 forecast "
+            f"{forecast_fit.loc[(indicator_name, country_name), '2030']:.1f}")
+
+      # Plot the selected model's forecast with its confidence range
+      forecast_years = forecast_fit.columns.astype(int)
+      show_chart('forecast_iceland_renewable', 'fit_chart', x=forecast_years[:len(years)], y=y_data,
+                 x_fit=forecast_years, y_fit=forecast_fit.loc[(indicator_name, country_name)],
+                 lower=forecast_lower.loc[(indicator_name, country_name)],
+                 upper=forecast_upper.loc[(indicator_name, country_name)],
+                 title=f'{country_name}: {best_model} forecast to 2030', xlabel='Year',
+                 ylabel=indicator_name)
+
+  # Assuming 'Country' is the column containing country names
+  # Replace 'Country' with the actual column name if it's different
+
+  TRACER.stage('comparison')
+
+  # Choose one country from each cluster, the one nearest the cluster centre,
+  # and summarise every cluster over all years in one pass
+  summary = cluster_summary(data, clusters, features, kmeans.cluster_centers_)
+
+  # Print the selected countries
+  print("Selected Countries from Each Cluster:")
+  for i, country in summary['country'].items():
+      print(f"Cluster {i + 1}: {country}")
+  print(summary[['country', 'size', 'distance']].droplevel(1, axis=1).round(3))
+
+  # Choose a subset of years for visualization
+  selected_years = ['2010', '2012', '2015', '2018', '2020']
+
+  # Analyze and compare the selected countries within each cluster
+  representatives = summary['representative'][selected_years]
+  comparison_lines = {f'{country} - Cluster {i + 1}': representatives.loc[i]
+                      for i, country in summary['country'].items()}
+
+  # Plotting a line chart for the selected years, legend to the right outside the plot
+  show_chart('cluster_comparison', 'line_chart', x=selected_years, lines=comparison_lines,
+             xlabel="Year", ylabel="Renewable Energy Consumption \n(% of total final energy consumption)",
+             title="Comparison of Selected Countries within Clusters", figsize=None,
+             legend_kwargs=dict(title='Legend', bbox_to_anchor=(1.05, 1), loc='upper left'))
+
+  TRACER.stage('render')
+
+  # Render the queued charts, plus one line chart per indicator and selected country
+  if render_dir:
+      render_queue.extend(series_jobs(cube_countries, first_year='1990', last_year='2020'))
+      if world_geometry is not None:
+          render_maps(world_geometry, cube, ['Electric power consumption (kWh per capita)'],
+                      [str(year) for year in range(1990, 2021)], render_dir)
+      status = render_jobs(render_queue, render_dir, formats=('png', 'svg'))
+      rendered = sum(state == 'rendered' for state in status.values())
+      print(f"Rendered {rendered} charts to {render_dir}, {len(status) - rendered} unchanged")
+
+  # Write the trace (if enabled) and summarise where the time went
+  TRACER.finish()
+  if TRACER.enabled:
+      print(TRACER.summary())
@@ -0,0 +1,59 @@
+"""Throughput of fit_batch() against a per-series curve_fit loop.
+
+Run from the repository root:
+
+    python benchmarks/bench_fitting.py [n_series] [n_years]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.optimize import curve_fit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from energy_analysis.fitting import err_ranges, fit_batch, simple_model  # noqa: E402
+
+
+def make_series(n_series, n_years, seed=0):
+    """Noisy quadratic series shaped like the script's 2010-2020 window."""
+    rng = np.random.default_rng(seed)
+    x = np.arange(n_years, dtype=np.float64)
+    coef = rng.normal(size=(n_series, 3)) * [0.05, 1.0, 20.0]
+    Y = coef[:, :1] * x**2 + coef[:, 1:2] * x + coef[:, 2:]
+    return x, Y + rng.normal(scale=0.5, size=Y.shape)
+
+
+def loop_fit(x, Y):
+    """The script's approach: curve_fit and err_ranges once per series."""
+    out = []
+    for y in Y:
+        params, covariance = curve_fit(simple_model, x, y)
+        out.append((params, err_ranges(params, covariance, x, simple_model)))
+    return out
+
+
+def main(n_series=2000, n_years=11):
+    x, Y = make_series(n_series, n_years)
+
+    start = time.perf_counter()
+    loop = loop_fit(x, Y)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = fit_batch(x, Y, simple_model)
+    batch_time = time.perf_counter() - start
+
+    loop_params = np.array([params for params, _ in loop])
+    max_diff = np.abs(loop_params - batch[["a", "b", "c"]].to_numpy()).max()
+
+    print(f"{n_series} series x {n_years} years")
+    print(f"  curve_fit loop: {loop_time:8.3f} s  {n_series / loop_time:12.0f} fits/s")
+    print(f"  fit_batch:      {batch_time:8.3f} s  {n_series / batch_time:12.0f} fits/s")
+    print(f"  speed-up: {loop_time / batch_time:.1f}x, max |param diff| {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,82 @@
+"""Cold-start latency of a "load + cluster only" run.
+
+Each measurement runs in a fresh interpreter so nothing is cached in
+``sys.modules``. Compares importing everything the original script imported
+up front with importing only the energy_analysis modules the run needs, and
+optionally times the whole load + cluster run on a CSV.
+
+Run from the repository root:
+
+    python benchmarks/bench_import.py [path/to/API_19_DS2_en_csv_v2_6300757.csv]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEATS = 5
+
+# What the analysis script imported at the top before it was split up
+EAGER = """
+import importlib
+for name in ["numpy", "pandas", "seaborn", "matplotlib.pyplot", "scipy.stats",
+             "sklearn.preprocessing", "sklearn.cluster", "scipy.optimize",
+             "statsmodels.api", "sklearn.metrics", "geopandas"]:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+"""
+
+SLIM = """
+from energy_analysis.loading import readFile
+from energy_analysis.preprocessing import extract_data, indicators_list, preprocess
+from energy_analysis.clustering import choose_k, sweep_k
+"""
+
+LOAD_AND_CLUSTER = SLIM + """
+from sklearn.preprocessing import MinMaxScaler
+df, _ = readFile({csv!r})
+df = preprocess(extract_data(df, indicators_list))
+renewable = df[df["Indicator Name"] == "Renewable energy consumption (% of total final energy consumption)"]
+data = MinMaxScaler().fit_transform(renewable.loc[:, "2010":"2020"].values)
+choose_k(sweep_k(data, range(2, 9)))
+"""
+
+TIMED = """
+import sys, time
+start = time.perf_counter()
+exec(compile({code!r}, "bench", "exec"))
+heavy = [m for m in ("sklearn", "scipy", "matplotlib", "geopandas", "seaborn", "statsmodels")
+         if m in sys.modules]
+print(time.perf_counter() - start, ",".join(heavy))
+"""
+
+
+def cold_run(code):
+    """Run ``code`` in a fresh interpreter; return (seconds, heavy modules)."""
+    out = subprocess.run([sys.executable, "-c", TIMED.format(code=code)], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), out[1] if len(out) > 1 else "-"
+
+
+def report(label, code):
+    runs = [cold_run(code) for _ in range(REPEATS)]
+    median = statistics.median(seconds for seconds, _ in runs)
+    print(f"  {label:<22} {median * 1000:8.0f} ms   loaded: {runs[0][1]}")
+
+
+def main(csv=None):
+    print(f"median of {REPEATS} cold starts")
+    report("eager imports", EAGER)
+    report("slim imports", SLIM)
+    if csv:
+        # One warm-up run so the parsed-CSV cache exists
+        cold_run(LOAD_AND_CLUSTER.format(csv=os.path.abspath(csv)))
+        report("load + cluster", LOAD_AND_CLUSTER.format(csv=os.path.abspath(csv)))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
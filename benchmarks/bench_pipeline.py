@@ -0,0 +1,280 @@
+"""Stage timings of the analysis on synthetic World Bank files of growing size.
+
+Generates World-Bank-shaped CSVs at several multiples of the real file
+(countries, indicators and years each grow by the cube root of the scale),
+then times each stage of the analysis separately:
+
+- read:        readFile() parsing the CSV (no cache)
+- read_cached: readFile() from a warm on-disk cache
+- extract:     extract_data() + preprocess() on the DataFrame
+- pipeline:    the script's float32 block pipeline and IndicatorCube
+- cluster:     MinMaxScaler + KMeans k-sweep + cluster scores
+- fit:         curve_fit/err_ranges over every series (fit_cube + table_bands)
+- render:      the cluster, fit and comparison charts on the Agg backend
+
+Wall time is the best of ``--repeat`` untraced runs; peak memory comes from a
+separate run under tracemalloc. Every run is appended to a JSON history file
+so regressions and the dominant stage can be followed across commits.
+
+Run from the repository root:
+
+    python benchmarks/bench_pipeline.py [--scales 1 10 100] [--repeat 3]
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from energy_analysis.preprocessing import indicators_list  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_DIR = os.path.join(HERE, "data")
+DEFAULT_HISTORY = os.path.join(DEFAULT_DATA_DIR, "history.json")
+
+# Shape of API_19_DS2_en_csv_v2_6300757.csv
+BASE_COUNTRIES, BASE_INDICATORS, BASE_YEARS = 266, 76, 63
+LAST_YEAR = 2022
+RENEWABLE = "Renewable energy consumption (% of total final energy consumption)"
+
+
+def scaled_shape(scale):
+    """(countries, indicators, years) of a file ``scale`` times the real one."""
+    factor = scale ** (1 / 3)
+    return (round(BASE_COUNTRIES * factor), round(BASE_INDICATORS * factor),
+            round(BASE_YEARS * factor))
+
+
+def write_synthetic_csv(path, scale, seed=0, chunk_countries=50):
+    """
+    Write a CSV in the World Bank bulk download layout.
+
+    Series start in a random year, have 5% scattered gaps and 3% of them are
+    empty, roughly like the real file. Values are non-negative, as the
+    script's shares and totals are. The script's indicators and the
+    'World' and 'Iceland' rows are always present.
+    """
+    n_countries, n_indicators, n_years = scaled_shape(scale)
+    rng = np.random.default_rng(seed)
+    countries = ["World", "Iceland"] + [f"Country {i}" for i in range(n_countries - 2)]
+    indicators = (indicators_list + [f"Synthetic indicator {i}" for i in
+                                     range(n_indicators - len(indicators_list))])
+    years = [str(year) for year in range(LAST_YEAR - n_years + 1, LAST_YEAR + 1)]
+    t = np.arange(n_years)
+
+    with open(path, "w", newline="") as fh:
+        fh.write('"Data Source","World Development Indicators",\n\n'
+                 f'"Last Updated Date","{datetime.date.today()}",\n\n')
+        csv.writer(fh, quoting=csv.QUOTE_ALL).writerow(
+            ["Country Name", "Country Code", "Indicator Name", "Indicator Code"] + years + [""])
+        for start in range(0, n_countries, chunk_countries):
+            chunk = countries[start:start + chunk_countries]
+            n = len(chunk) * n_indicators
+            base = rng.uniform(1, 100, size=(n, 1))
+            values = base + rng.normal(0, 0.05, size=(n, 1)) * base * t \
+                + rng.normal(0, 1, size=(n, n_years))
+            np.clip(values, 0, None, out=values)
+            values[t < rng.integers(0, n_years, size=(n, 1))] = np.nan
+            values[rng.random((n, n_years)) < 0.05] = np.nan
+            values[rng.random(n) < 0.03] = np.nan
+            frame = pd.DataFrame(values, columns=years)
+            frame.insert(0, "Country Name", np.repeat(chunk, n_indicators))
+            frame.insert(1, "Country Code", np.repeat([f"C{start + i:05d}" for i in
+                                                      range(len(chunk))], n_indicators))
+            frame.insert(2, "Indicator Name", np.tile(indicators, len(chunk)))
+            frame.insert(3, "Indicator Code", np.tile([f"IND.{i}" for i in
+                                                       range(n_indicators)], len(chunk)))
+            frame[""] = np.nan
+            frame.to_csv(fh, header=False, index=False, float_format="%.4g",
+                         quoting=csv.QUOTE_ALL)
+
+
+def synthetic_csv(data_dir, scale, seed=0):
+    """Path of the synthetic file for ``scale``, generated on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, "synthetic_x{:g}_{}x{}x{}_seed{}.csv".format(
+        scale, *scaled_shape(scale), seed))
+    if not os.path.exists(path):
+        write_synthetic_csv(path + ".tmp", scale, seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def stage_read(state):
+    from energy_analysis.loading import readFile
+    state["df"], _ = readFile(state["csv"], use_cache=False)
+    return len(state["df"])
+
+
+def stage_read_cached(state):
+    from energy_analysis.loading import readFile
+    df, _ = readFile(state["csv"], cache_dir=state["cache_dir"])
+    return len(df)
+
+
+def stage_extract(state):
+    from energy_analysis.preprocessing import extract_data, preprocess
+    return len(preprocess(extract_data(state["df"], indicators_list)))
+
+
+def stage_pipeline(state):
+    from energy_analysis.cube import IndicatorCube
+    from energy_analysis.preprocessing import (DEFAULT_PIPELINE, read_block,
+                                               run_pipeline)
+    block = read_block(state["csv"], cache_dir=state["cache_dir"])
+    block, _ = run_pipeline(block, DEFAULT_PIPELINE)
+    state["cube"] = IndicatorCube.from_block(block)
+    return len(block.rows)
+
+
+def stage_cluster(state):
+    from sklearn.preprocessing import MinMaxScaler
+    from energy_analysis.clustering import choose_k, sweep_k
+    from energy_analysis.evaluation import cluster_scores
+    data = state["cube"].frame(RENEWABLE).loc[:, "2010":"2020"].dropna()
+    data_scaled = MinMaxScaler().fit_transform(data.values)
+    report = sweep_k(data_scaled, range(2, 9))
+    kmeans = report.attrs["models"][choose_k(report)]
+    cluster_scores(data_scaled, kmeans.labels_)
+    state["cluster"] = (data_scaled, kmeans)
+    return len(data)
+
+
+def stage_fit(state):
+    from energy_analysis.fitting import fit_cube, simple_model, table_bands
+    fits = fit_cube(state["cube"], simple_model, "2010", "2020")
+    state["bands"] = table_bands(fits, simple_model, np.linspace(0, 10, 50))
+    state["fits"] = fits
+    return len(fits)
+
+
+def stage_render(state):
+    from energy_analysis.fitting import simple_model
+    from energy_analysis.plotting import RenderJob, render_jobs
+    cube, (data_scaled, kmeans) = state["cube"], state["cluster"]
+    years = cube.year_slice("2010", "2020")
+    y = cube.series(RENEWABLE, "Iceland")[years]
+    x = np.arange(len(y))
+    params = state["fits"].loc[(RENEWABLE, "Iceland"), ["a", "b", "c"]].to_numpy(float)
+    x_fit = np.linspace(0, len(y) - 1, 1000)
+    y_fit = simple_model(x_fit, *params)
+    jobs = [
+        RenderJob("cluster", "cluster_scatter", dict(
+            points=data_scaled, labels=kmeans.labels_, centers=kmeans.cluster_centers_,
+            title="Clusters", xlabel="2010", ylabel="2011")),
+        RenderJob("fit", "fit_chart", dict(
+            x=x, y=y, x_fit=x_fit, y_fit=y_fit, lower=y_fit - 1, upper=y_fit + 1,
+            title="Fit", xlabel="Year", ylabel=RENEWABLE)),
+        RenderJob("comparison", "line_chart", dict(
+            x=list(cube.years[years]), xlabel="Year", ylabel=RENEWABLE, title="Comparison",
+            lines={country: cube.series(RENEWABLE, country)[years]
+                   for country in cube.countries[:10]}, legend_kwargs={})),
+    ]
+    out_dir = os.path.join(state["cache_dir"], "render")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    render_jobs(jobs, out_dir, workers=1)
+    return len(jobs)
+
+
+STAGES = [("read", stage_read), ("read_cached", stage_read_cached),
+          ("extract", stage_extract), ("pipeline", stage_pipeline),
+          ("cluster", stage_cluster), ("fit", stage_fit), ("render", stage_render)]
+
+
+def run_stages(csv_path, traced):
+    """Run every stage once; return {stage: (seconds, peak_mb, rows)}."""
+    from energy_analysis.cache import cached_table
+    from energy_analysis.loading import _parse_csv
+
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Warm the parsed-CSV cache outside the timed stages
+        cached_table(csv_path, _parse_csv, cache_dir)
+        state = {"csv": csv_path, "cache_dir": cache_dir}
+        for name, stage in STAGES:
+            if traced:
+                tracemalloc.start()
+            start = time.perf_counter()
+            rows = stage(state)
+            seconds = time.perf_counter() - start
+            peak_mb = None
+            if traced:
+                peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+            results[name] = (seconds, peak_mb, rows)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(scale, data_dir, repeat):
+    """Time every stage on the synthetic file for ``scale``."""
+    csv_path = synthetic_csv(data_dir, scale)
+    memory = run_stages(csv_path, traced=True)
+    timings = [run_stages(csv_path, traced=False) for _ in range(repeat)]
+    stages = {name: {"seconds": min(run[name][0] for run in timings),
+                     "peak_mb": memory[name][1], "rows": memory[name][2]}
+              for name, _ in STAGES}
+    n_countries, n_indicators, n_years = scaled_shape(scale)
+    return {"scale": scale, "countries": n_countries, "indicators": n_indicators,
+            "years": n_years, "file_mb": os.path.getsize(csv_path) / 2**20,
+            "stages": stages}
+
+
+def append_history(path, record):
+    try:
+        with open(path) as fh:
+            history = json.load(fh)
+    except (FileNotFoundError, ValueError):
+        history = []
+    history.append(record)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as fh:
+        json.dump(history, fh, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    args = parser.parse_args(argv)
+
+    record = {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+              "commit": git_commit(), "python": platform.python_version(),
+              "machine": platform.machine(), "repeat": args.repeat, "runs": []}
+    for scale in args.scales:
+        run = benchmark(scale, args.data_dir, args.repeat)
+        record["runs"].append(run)
+        print(f"x{scale:g}: {run['countries']} countries x {run['indicators']} "
+              f"indicators x {run['years']} years, {run['file_mb']:.1f} MB")
+        for name, stage in run["stages"].items():
+            print(f"  {name:<12} {stage['seconds']:9.3f} s  {stage['peak_mb']:9.1f} MB"
+                  f"  {stage['rows']:>9} rows")
+    append_history(args.history, record)
+    print(f"appended to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
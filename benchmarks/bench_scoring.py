@@ -0,0 +1,101 @@
+"""Latency of the NumPy-only scorers per 1k predictions.
+
+Writes a temporary artifact store with a MinMaxScaler + KMeans model and
+fitted curves for many series, then times batches of 1000 predictions:
+cluster assignment (against sklearn's transform + predict) and curve
+evaluation by series key and by row position. The cold start (import +
+memory-mapping the store) is measured in a fresh interpreter.
+
+Run from the repository root:
+
+    python benchmarks/bench_scoring.py [n_series]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from energy_analysis.artifacts import save_clusters, save_curves  # noqa: E402
+from energy_analysis.curves import CURVES  # noqa: E402
+from energy_analysis.scoring import ClusterScorer, CurveScorer  # noqa: E402
+
+BATCH = 1000
+REPEATS = 200
+
+COLD = """
+import sys, time
+start = time.perf_counter()
+from energy_analysis.scoring import ClusterScorer, CurveScorer
+ClusterScorer.load({root!r}, "clusters")
+CurveScorer.load({root!r}, "curves")
+heavy = [m for m in ("pandas", "sklearn", "scipy") if m in sys.modules]
+print(time.perf_counter() - start, ",".join(heavy) or "-")
+"""
+
+
+def per_batch(func):
+    """Median seconds of ``func()`` over REPEATS calls."""
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def build_store(root, n_series, rng):
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import MinMaxScaler
+
+    data = rng.uniform(0, 100, size=(266, 11))
+    scaler = MinMaxScaler().fit(data)
+    kmeans = KMeans(n_clusters=5, n_init="auto", random_state=42).fit(scaler.transform(data))
+    save_clusters(root, "clusters", scaler, kmeans.cluster_centers_,
+                  [str(year) for year in range(2010, 2021)])
+
+    index = pd.MultiIndex.from_product([[f"Indicator {i}" for i in range(n_series // 250)],
+                                        [f"Country {c}" for c in range(250)]])
+    models = rng.choice(list(CURVES), size=len(index))
+    params = rng.uniform(0.01, 1, size=(len(index), 3))
+    save_curves(root, "curves", index, models, params, first_year=2010)
+    return scaler, kmeans, index
+
+
+def main(n_series=20000):
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as root:
+        scaler, kmeans, index = build_store(root, n_series, rng)
+        clusters = ClusterScorer.load(root, "clusters")
+        curves = CurveScorer.load(root, "curves")
+
+        X = rng.uniform(0, 100, size=(BATCH, 11))
+        assert (clusters.predict(X) == kmeans.predict(scaler.transform(X))).all()
+        keys = [index[i] for i in rng.integers(0, len(index), BATCH)]
+        positions = curves.positions(keys)
+        years = rng.integers(2010, 2031, BATCH)
+
+        out = subprocess.run([sys.executable, "-c", COLD.format(root=root)], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.split()
+
+        print(f"{len(index)} stored series, batches of {BATCH}, median of {REPEATS}")
+        print(f"  cold start (import + mmap)  {float(out[0]) * 1000:8.1f} ms   loaded: {out[1]}")
+        for label, func in [
+            ("clusters, sklearn", lambda: kmeans.predict(scaler.transform(X))),
+            ("clusters, scoring", lambda: clusters.predict(X)),
+            ("curves by key", lambda: curves.predict(keys, years)),
+            ("curves by position", lambda: curves.predict_positions(positions, years)),
+        ]:
+            print(f"  {label:<26} {per_batch(func) * 1e6:8.0f} us / 1k")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
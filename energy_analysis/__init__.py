@@ -0,0 +1,38 @@
+"""Support package for the ADS1 clustering and fitting analysis.
+
+The analysis itself lives in ``22081557_ASD1_CODE.py``; the modules in this
+package hold the reusable pieces it is built on:
+
+- ``loading``: reading the World Bank CSV (cached or streamed)
+- ``preprocessing``: indicator selection and cleaning
+- ``cube``: the indicator x country x year array
+- ``clustering`` / ``evaluation``: k-means and cluster scores
+- ``projection``: PCA-style projection before clustering
+- ``curves`` / ``fitting``: curve models, fitting and confidence bands
+- ``panel``: model selection and forecasts for many series
+- ``correlation``: cached pairwise-complete correlation matrices
+- ``ranking``: top/bottom-N country rankings
+- ``plotting`` / ``geometry``: charts and maps
+- ``artifacts`` / ``scoring``: stored models and NumPy-only scoring
+- ``tracing``: opt-in timing/memory trace and per-stage profiling
+- ``driver``: spec-driven batch runs with checkpoints
+- ``outofcore``: partitioned, bounded-memory runs over many topic files
+
+Submodules are imported on first attribute access, and the heavy libraries
+(sklearn, scipy, matplotlib, geopandas) only when a function needs them.
+"""
+
+import importlib
+
+_SUBMODULES = {
+    "cache", "loading", "preprocessing", "cube", "clustering", "evaluation",
+    "projection", "correlation", "curves", "fitting", "panel", "ranking",
+    "plotting", "geometry", "artifacts", "scoring", "tracing", "driver",
+    "outofcore",
+}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
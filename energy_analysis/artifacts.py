@@ -0,0 +1,181 @@
+"""Versioned store of fitted models for scoring outside the analysis.
+
+Each artifact is a directory ``<root>/<name>/v<version>/`` holding one
+``.npy`` file per array and a ``manifest.json`` with the format version, the
+artifact kind, array dtypes/shapes and metadata. Arrays are plain numeric or
+fixed-width string dtypes, so ``energy_analysis.scoring`` can memory-map
+them with NumPy alone. Versions are never overwritten; saving again writes
+the next version.
+
+Two kinds are stored:
+
+- ``clusters``: a fitted MinMaxScaler (as ``scale``/``offset``) and the
+  k-means centres in scaled space (or in the space of an optional
+  ``projection.Projection``, stored as ``projection_mean`` and
+  ``projection_components``), with the feature (year) names and,
+  optionally, the training rows' labels.
+- ``curves``: one fitted curve per series, as a model code into
+  ``curves.CURVES`` and its parameters (NaN-padded to the widest model),
+  with the series keys and the year that x = 0 stands for.
+"""
+
+import datetime
+import json
+import os
+import shutil
+
+import numpy as np
+
+from energy_analysis.curves import CURVES, param_names
+
+FORMAT_VERSION = 1
+DEFAULT_STORE = "artifacts"
+MANIFEST_FILE = "manifest.json"
+
+
+def versions(root, name):
+    """Saved versions of artifact ``name``, oldest first."""
+    try:
+        entries = os.listdir(os.path.join(root, name))
+    except FileNotFoundError:
+        return []
+    return sorted(int(entry[1:]) for entry in entries
+                  if entry.startswith("v") and entry[1:].isdigit())
+
+
+def artifact_dir(root, name, version=None):
+    """Directory of a version of ``name``, the latest if ``version`` is None."""
+    if version is None:
+        saved = versions(root, name)
+        if not saved:
+            raise FileNotFoundError(f"No artifact {name!r} in {root}")
+        version = saved[-1]
+    return os.path.join(root, name, f"v{version}")
+
+
+def write_artifact(root, name, kind, arrays, meta=None):
+    """
+    Write ``arrays`` as the next version of artifact ``name``.
+
+    Parameters:
+    - root (str): Store directory.
+    - name (str): Artifact name.
+    - kind (str): 'clusters' or 'curves'.
+    - arrays (dict): Array name -> numeric or string array.
+    - meta (dict): JSON-serialisable metadata.
+
+    Returns:
+    - int: The version written.
+    """
+    saved = versions(root, name)
+    version = saved[-1] + 1 if saved else 1
+    final = artifact_dir(root, name, version)
+    tmp = final + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    manifest = {"format": FORMAT_VERSION, "kind": kind, "name": name, "version": version,
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "arrays": {}, "meta": meta or {}}
+    for key, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype == object:
+            array = array.astype(str)
+        np.save(os.path.join(tmp, f"{key}.npy"), array)
+        manifest["arrays"][key] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+    with open(os.path.join(tmp, MANIFEST_FILE), "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp, final)
+    return version
+
+
+def _index_arrays(index):
+    """One string array per level of a (Multi)Index, and the level names."""
+    levels = [index.get_level_values(i) for i in range(index.nlevels)]
+    arrays = {f"key_{i}": np.asarray(level.astype(str)) for i, level in enumerate(levels)}
+    return arrays, [str(name) if name is not None else None for name in index.names]
+
+
+def save_clusters(root, name, scaler, centers, feature_names, labels=None, index=None,
+                  projection=None):
+    """
+    Save a fitted MinMaxScaler and cluster centres.
+
+    Parameters:
+    - root (str): Store directory.
+    - name (str): Artifact name.
+    - scaler (MinMaxScaler): Fitted scaler; only its ``scale_``, ``min_``,
+      ``data_min_`` and ``data_max_`` are stored.
+    - centers (np.ndarray): Centres in scaled space, shape (k, d), or in
+      the projected space, shape (k, p), when ``projection`` is given.
+    - feature_names (list): The d input columns (e.g. years).
+    - labels (np.ndarray): Optional training labels, stored with ``index``.
+    - index (pd.Index): Row labels of the training data.
+    - projection (Projection): Projection applied after scaling, if any.
+
+    Returns:
+    - int: The version written.
+    """
+    arrays = {"scale": np.asarray(scaler.scale_, dtype=np.float64),
+              "offset": np.asarray(scaler.min_, dtype=np.float64),
+              "data_min": np.asarray(scaler.data_min_, dtype=np.float64),
+              "data_max": np.asarray(scaler.data_max_, dtype=np.float64),
+              "centers": np.asarray(centers, dtype=np.float64),
+              "features": np.asarray(feature_names, dtype=str)}
+    meta = {"n_clusters": int(len(centers))}
+    if projection is not None:
+        arrays["projection_mean"] = np.asarray(projection.mean, dtype=np.float64)
+        arrays["projection_components"] = np.asarray(projection.components, dtype=np.float64)
+        meta["projection"] = projection.method
+    if labels is not None:
+        arrays["labels"] = np.asarray(labels, dtype=np.int32)
+        if index is not None:
+            keys, meta["key_names"] = _index_arrays(index)
+            arrays.update(keys)
+    return write_artifact(root, name, "clusters", arrays, meta)
+
+
+def save_curves(root, name, index, models, params, first_year):
+    """
+    Save one fitted curve per series.
+
+    Parameters:
+    - root (str): Store directory.
+    - name (str): Artifact name.
+    - index (pd.Index): Series keys, e.g. (indicator, country).
+    - models (array-like): ``curves.CURVES`` name per series; None/NaN for
+      series without a fit.
+    - params (np.ndarray): Parameters per series, NaN-padded to the widest
+      model, shape (series, p_max).
+    - first_year (int): The year that x = 0 stands for.
+
+    Returns:
+    - int: The version written.
+    """
+    names = list(CURVES)
+    codes = np.array([names.index(m) if isinstance(m, str) else -1 for m in models],
+                     dtype=np.int8)
+    arrays, key_names = _index_arrays(index)
+    arrays.update(model=codes, params=np.asarray(params, dtype=np.float64))
+    return write_artifact(root, name, "curves", arrays,
+                          {"models": names, "first_year": int(first_year),
+                           "key_names": key_names})
+
+
+def save_fit_table(root, name, fits, model, first_year):
+    """``save_curves`` for a ``fit_batch`` / ``fit_cube`` table of one model."""
+    params = fits[param_names(CURVES[model])].to_numpy(dtype=np.float64)
+    return save_curves(root, name, fits.index, [model] * len(fits), params, first_year)
+
+
+def save_panel(root, name, panel, first_year):
+    """``save_curves`` for the selected model of every series of a ``PanelFit``."""
+    selection = panel.selection
+    p_max = max(len(param_names(CURVES[model])) for model in panel.fits)
+    params = np.full((len(selection), p_max), np.nan)
+    for model, table in panel.fits.items():
+        rows = np.flatnonzero((selection["model"] == model).to_numpy())
+        names = param_names(CURVES[model])
+        params[rows, :len(names)] = table[names].to_numpy()[rows]
+    return save_curves(root, name, selection.index, selection["model"].to_numpy(),
+                       params, first_year)
@@ -0,0 +1,171 @@
+"""On-disk columnar cache for the parsed World Bank CSV.
+
+The parsed long table (one row per country/indicator, one column per year) is
+stored as plain NumPy arrays so that later runs can memory-map it instead of
+parsing the CSV again. Entries are keyed by the SHA-1 of the source file; the
+file's size and mtime are remembered so the hash only has to be recomputed
+when the file has actually been touched.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_DIR = ".wb_cache"
+_INDEX_FILE = "index.json"
+_CHUNK_SIZE = 1 << 20
+
+
+def file_digest(filename):
+    """
+    Compute the SHA-1 digest of a file, reading it in 1 MiB chunks.
+
+    Parameters:
+    - filename (str): Path to the file.
+
+    Returns:
+    - str: Hex digest of the file contents.
+    """
+    sha = hashlib.sha1()
+    with open(filename, "rb") as fh:
+        for block in iter(lambda: fh.read(_CHUNK_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _load_index(cache_dir):
+    path = os.path.join(cache_dir, _INDEX_FILE)
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_index(cache_dir, index):
+    path = os.path.join(cache_dir, _INDEX_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(index, fh, indent=2)
+    os.replace(tmp, path)
+
+
+def source_digest(filename, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Return the content digest of ``filename``, rehashing only if its size or
+    mtime differ from what the cache index last recorded.
+
+    Parameters:
+    - filename (str): Path to the source CSV.
+    - cache_dir (str): Cache directory holding the index.
+
+    Returns:
+    - str: Hex digest of the file contents.
+    """
+    key = os.path.abspath(filename)
+    stat = os.stat(filename)
+    index = _load_index(cache_dir)
+    entry = index.get(key)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["digest"]
+
+    digest = file_digest(filename)
+    old_digest = entry["digest"] if entry else None
+    index[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest}
+    os.makedirs(cache_dir, exist_ok=True)
+    _save_index(cache_dir, index)
+
+    # Drop the stale entry, and the ones derived from it and keyed
+    # "<digest>-..." (e.g. cached geometry), unless another source file
+    # still points at it
+    if old_digest and old_digest != digest and all(
+            e["digest"] != old_digest for e in index.values()):
+        for name in os.listdir(cache_dir):
+            if name == old_digest or name.startswith(old_digest + "-"):
+                shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    return digest
+
+
+def write_table(df, entry_dir):
+    """
+    Store a long-format table in ``entry_dir`` as memory-mappable arrays.
+
+    Parameters:
+    - df (pd.DataFrame): Table with 'Country Name', 'Indicator Name' and one
+      float column per year.
+    - entry_dir (str): Directory to write the arrays into.
+    """
+    tmp_dir = entry_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    years = [c for c in df.columns if c not in ("Country Name", "Indicator Name")]
+    np.save(os.path.join(tmp_dir, "values.npy"),
+            np.ascontiguousarray(df[years].to_numpy(dtype=np.float64)))
+    np.save(os.path.join(tmp_dir, "countries.npy"), df["Country Name"].to_numpy(dtype=str))
+    np.save(os.path.join(tmp_dir, "indicators.npy"), df["Indicator Name"].to_numpy(dtype=str))
+    np.save(os.path.join(tmp_dir, "years.npy"), np.asarray(years, dtype=str))
+
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    os.replace(tmp_dir, entry_dir)
+
+
+def read_table(entry_dir):
+    """
+    Load a table written by ``write_table``.
+
+    The year values are memory-mapped copy-on-write, so pages are only read
+    when touched and in-place edits (e.g. ``fillna(inplace=True)``) never
+    reach the cache file.
+
+    Parameters:
+    - entry_dir (str): Directory written by ``write_table``.
+
+    Returns:
+    - pd.DataFrame: The cached long-format table.
+    """
+    values = np.load(os.path.join(entry_dir, "values.npy"), mmap_mode="c")
+    years = np.load(os.path.join(entry_dir, "years.npy")).tolist()
+    df = pd.DataFrame(values, columns=years, copy=False)
+    df.insert(0, "Indicator Name", np.load(os.path.join(entry_dir, "indicators.npy")).astype(object))
+    df.insert(0, "Country Name", np.load(os.path.join(entry_dir, "countries.npy")).astype(object))
+    return df
+
+
+def cached_entry(filename, parse, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Return the cache entry directory for ``filename``, calling ``parse`` and
+    writing the entry only when none exists for the file's current contents.
+
+    Parameters:
+    - filename (str): Path to the source CSV.
+    - parse (callable): ``parse(filename)`` returning the long-format table.
+    - cache_dir (str): Directory holding the cache entries.
+
+    Returns:
+    - str: Directory holding the arrays written by ``write_table``.
+    """
+    entry_dir = os.path.join(cache_dir, source_digest(filename, cache_dir))
+    if not os.path.isfile(os.path.join(entry_dir, "values.npy")):
+        write_table(parse(filename), entry_dir)
+    return entry_dir
+
+
+def cached_table(filename, parse, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Return the parsed table for ``filename``, calling ``parse`` only when no
+    valid cache entry exists for the file's current contents.
+
+    Parameters:
+    - filename (str): Path to the source CSV.
+    - parse (callable): ``parse(filename)`` returning the long-format table.
+    - cache_dir (str): Directory holding the cache entries.
+
+    Returns:
+    - pd.DataFrame: The parsed long-format table.
+    """
+    return read_table(cached_entry(filename, parse, cache_dir))
@@ -0,0 +1,395 @@
+"""K-means clustering with selectable backends and k sweeps.
+
+``sweep_k`` fits a range of cluster counts and reports inertia and
+silhouette for each. With ``warm_start=True`` every k starts from the
+centres found for k - 1 plus one new centre drawn k-means++ style, so each
+fit needs a single short run instead of several fresh restarts.
+
+sklearn is imported on first use, so importing this module stays cheap.
+"""
+
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from energy_analysis.evaluation import DEFAULT_MEMORY_LIMIT_MB, MAX_EXACT_ROWS, silhouette
+from energy_analysis.tracing import traced
+
+BACKENDS = ("full", "elkan", "minibatch")
+
+
+def make_kmeans(n_clusters, backend="full", init="k-means++", random_state=42,
+                **kwargs):
+    """
+    Create an unfitted k-means estimator for the given backend.
+
+    Parameters:
+    - n_clusters (int): Number of clusters.
+    - backend (str): 'full' (Lloyd KMeans), 'elkan' (Elkan KMeans) or
+      'minibatch' (MiniBatchKMeans).
+    - init (str or np.ndarray): Initialisation method or initial centres.
+    - random_state (int): Seed for reproducible clusters.
+    - **kwargs: Passed on to the estimator.
+
+    Returns:
+    - The sklearn estimator.
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    n_init = 1 if isinstance(init, np.ndarray) else "auto"
+    if backend == "minibatch":
+        return MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=n_init,
+                               random_state=random_state, **kwargs)
+    if backend in ("full", "elkan"):
+        algorithm = "lloyd" if backend == "full" else "elkan"
+        return KMeans(n_clusters=n_clusters, init=init, n_init=n_init,
+                      algorithm=algorithm, random_state=random_state, **kwargs)
+    raise ValueError(f"Unknown clustering backend {backend!r}, expected one of {BACKENDS}")
+
+
+def add_center(data, centers, rng, n_candidates=None):
+    """
+    Extend ``centers`` by one point of ``data`` using the greedy k-means++
+    seeding step: draw candidates with probability proportional to their
+    squared distance from the nearest existing centre and keep the one that
+    lowers the inertia most.
+
+    Parameters:
+    - data (np.ndarray): Samples, shape (n, d).
+    - centers (np.ndarray): Current centres, shape (k, d).
+    - rng (np.random.Generator): Random generator.
+    - n_candidates (int): Candidates to draw; 2 + log(k + 1) if None, as in
+      sklearn's own seeding.
+
+    Returns:
+    - np.ndarray: Centres of shape (k + 1, d).
+    """
+    if n_candidates is None:
+        n_candidates = 2 + int(np.log(len(centers) + 1))
+    sq_dist = ((data[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+    total = sq_dist.sum()
+    if total == 0:
+        return np.vstack([centers, data[rng.integers(len(data))]])
+
+    candidates = rng.choice(len(data), size=n_candidates, p=sq_dist / total)
+    cand_dist = ((data[None, :, :] - data[candidates, None, :]) ** 2).sum(axis=2)
+    best = np.minimum(cand_dist, sq_dist[None, :]).sum(axis=1).argmin()
+    return np.vstack([centers, data[candidates[best]]])
+
+
+@traced
+def sweep_k(data, k_values, backend="full", warm_start=True, random_state=42,
+            n_jobs=None, max_exact=MAX_EXACT_ROWS):
+    """
+    Fit k-means for every k in ``k_values`` and score each fit.
+
+    Parameters:
+    - data (np.ndarray): Scaled samples, shape (n, d).
+    - k_values (iterable): Cluster counts to try, e.g. range(2, 9).
+    - backend (str): See ``make_kmeans``.
+    - warm_start (bool): Seed each k from the previous k's centres. The fits
+      then run one after another; otherwise they run in parallel.
+    - random_state (int): Seed for reproducible clusters.
+    - n_jobs (int): Worker threads for independent fits and for scoring.
+    - max_exact (int): Largest input given the exact silhouette; larger
+      inputs get the stratified-sample estimate (see ``evaluation``).
+
+    Returns:
+    - pd.DataFrame: One row per k with inertia, silhouette and n_iter,
+      indexed by k; the fitted models are kept in ``attrs['models']``.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    k_values = sorted(int(k) for k in k_values if 1 < k < len(data))
+
+    if warm_start:
+        rng = np.random.default_rng(random_state)
+        models = []
+        for k in k_values:
+            if models and models[-1].n_clusters == k - 1:
+                init = add_center(data, models[-1].cluster_centers_, rng)
+            else:
+                init = "k-means++"
+            models.append(make_kmeans(k, backend, init, random_state).fit(data))
+    else:
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            models = list(pool.map(
+                lambda k: make_kmeans(k, backend, random_state=random_state).fit(data),
+                k_values))
+
+    def score(model):
+        return silhouette(data, model.labels_, max_exact=max_exact,
+                          random_state=random_state)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        silhouettes = list(pool.map(score, models))
+
+    report = pd.DataFrame({
+        "inertia": [model.inertia_ for model in models],
+        "silhouette": silhouettes,
+        "n_iter": [model.n_iter_ for model in models],
+    }, index=pd.Index(k_values, name="k"))
+    report.attrs["models"] = dict(zip(k_values, models))
+    return report
+
+
+def choose_k(report):
+    """
+    Pick the number of clusters with the highest silhouette in a
+    ``sweep_k`` report (the smallest such k on ties).
+    """
+    return int(report["silhouette"].idxmax())
+
+
+REPRESENTATIVES = ("centroid", "medoid")
+SUMMARY_STATS = ("mean", "std", "min", "max")
+
+
+def _medoid_scores(features, codes, k, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+    """Mean distance of every row to the rows of its own cluster, computed
+    in row blocks like ``evaluation.chunked_silhouette``."""
+    n = len(features)
+    onehot = np.zeros((n, k))
+    onehot[np.arange(n), codes] = 1.0
+    sq_norms = np.einsum("ij,ij->i", features, features)
+    block = max(1, int(memory_limit_mb * 2**20 // (16 * n)))
+    own = np.empty(n)
+    for start in range(0, n, block):
+        rows = slice(start, min(start + block, n))
+        sq_dist = sq_norms[rows, None] + sq_norms[None, :] - 2.0 * features[rows] @ features.T
+        np.maximum(sq_dist, 0.0, out=sq_dist)
+        sums = np.sqrt(sq_dist, out=sq_dist) @ onehot
+        own[rows] = sums[np.arange(len(sums)), codes[rows]]
+    return own / np.bincount(codes, minlength=k)[codes]
+
+
+@traced
+def cluster_summary(data, labels, features=None, centers=None, method="centroid",
+                    stats=SUMMARY_STATS, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+    """
+    One representative country and the statistics over all years of every
+    cluster, in a single table.
+
+    The representatives of all clusters come from one distance computation
+    (rows to centres, or rows to rows in blocks for the medoid) followed by
+    one sort, and the statistics from one groupby, so the cost does not grow
+    with a loop over the clusters.
+
+    Parameters:
+    - data (pd.DataFrame): Unscaled rows indexed by country, one column per
+      year.
+    - labels (np.ndarray): Cluster of each row.
+    - features (np.ndarray): The rows in the space they were clustered in
+      (scaled and possibly projected); ``data`` if None.
+    - centers (np.ndarray): Cluster centres in that space; the mean feature
+      row of each cluster if None.
+    - method (str): 'centroid' picks the row nearest the centre, 'medoid'
+      the row with the least mean distance to the rest of its cluster.
+    - stats (tuple): Aggregations computed per cluster and year.
+    - memory_limit_mb (float): Memory cap for the medoid distance blocks.
+
+    Returns:
+    - pd.DataFrame: One row per cluster label with 'country', 'size' and
+      'distance' (to the centre, or mean distance for the medoid), then one
+      column per year under 'representative' (the country's values) and
+      under each of ``stats``. ``summary['representative'][years]`` is ready
+      to plot.
+    """
+    if method not in REPRESENTATIVES:
+        raise ValueError(f"Unknown representative {method!r}, expected one of {REPRESENTATIVES}")
+    labels = np.asarray(labels)
+    features = np.asarray(data if features is None else features, dtype=np.float64)
+    clusters, codes = np.unique(labels, return_inverse=True)
+    k = len(clusters)
+    sizes = np.bincount(codes, minlength=k)
+
+    if method == "medoid":
+        score = _medoid_scores(features, codes, k, memory_limit_mb)
+    else:
+        if centers is None:
+            centers = np.zeros((k, features.shape[1]))
+            np.add.at(centers, codes, features)
+            centers /= sizes[:, None]
+        else:
+            centers = np.asarray(centers, dtype=np.float64)[clusters]
+        diff = features - centers[codes]
+        score = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+
+    # Sort by cluster, then score: the first row of every cluster is its pick
+    order = np.lexsort((score, codes))
+    first = order[np.r_[True, codes[order][1:] != codes[order][:-1]]]
+
+    years = data.columns
+    agg = data.groupby(labels).agg(list(stats))
+    agg = agg.swaplevel(axis=1).reindex(columns=pd.MultiIndex.from_product([stats, years]))
+    head = pd.DataFrame({("country", ""): data.index[first], ("size", ""): sizes,
+                         ("distance", ""): score[first]}, index=clusters)
+    representative = pd.DataFrame(data.to_numpy()[first], index=clusters,
+                                  columns=pd.MultiIndex.from_product([["representative"], years]))
+    summary = pd.concat([head, representative, agg], axis=1)
+    summary.index.name = "cluster"
+    return summary
+
+
+class IncrementalClusters:
+    """
+    Fitted scaler and cluster centres that can absorb new or revised data.
+
+    Centres are kept as per-cluster sums and counts of the scaled rows, so
+    moving a row between clusters only touches that row. ``update`` takes the
+    latest countries x years table, folds in added or revised countries and
+    added year columns, reassigns the affected countries to their nearest
+    centre and reports whose cluster changed.
+
+    Attributes:
+    - raw (pd.DataFrame): Unscaled data the state was built from.
+    - scaler (MinMaxScaler): Fitted scaler.
+    - scaled (np.ndarray): Scaled rows of ``raw``.
+    - labels (np.ndarray): Cluster of each row.
+    - sums (np.ndarray), counts (np.ndarray): Per-cluster sums and sizes.
+    """
+
+    def __init__(self, raw, scaler, labels, n_clusters):
+        self.raw = raw
+        self.scaler = scaler
+        self.scaled = scaler.transform(raw.to_numpy())
+        self.labels = np.asarray(labels)
+        self._recount(n_clusters)
+
+    @classmethod
+    def from_model(cls, frame, scaler, kmeans):
+        """
+        Wrap an already fitted scaler and k-means model.
+
+        Parameters:
+        - frame (pd.DataFrame): Unscaled data indexed by country, one column
+          per year, as passed to the scaler.
+        - scaler (MinMaxScaler): Scaler fitted on ``frame``.
+        - kmeans: Fitted k-means estimator.
+
+        Returns:
+        - IncrementalClusters: State matching the fitted model.
+        """
+        return cls(frame, scaler, kmeans.labels_, kmeans.n_clusters)
+
+    @classmethod
+    def fit(cls, frame, n_clusters=5, backend="full", random_state=42):
+        """
+        Scale ``frame`` and cluster it from scratch.
+        """
+        from sklearn.preprocessing import MinMaxScaler
+
+        scaler = MinMaxScaler().fit(frame.to_numpy())
+        kmeans = make_kmeans(n_clusters, backend, random_state=random_state)
+        kmeans.fit(scaler.transform(frame.to_numpy()))
+        return cls.from_model(frame, scaler, kmeans)
+
+    @property
+    def centers(self):
+        """Cluster centres in scaled space, shape (k, d)."""
+        with np.errstate(invalid="ignore"):
+            return self.sums / self.counts[:, None]
+
+    def _recount(self, n_clusters):
+        self.counts = np.bincount(self.labels, minlength=n_clusters).astype(np.float64)
+        self.sums = np.zeros((n_clusters, self.scaled.shape[1]))
+        np.add.at(self.sums, self.labels, self.scaled)
+
+    def _nearest(self, rows, centers):
+        sq_dist = ((rows[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        return np.nan_to_num(sq_dist, nan=np.inf).argmin(axis=1)
+
+    def update(self, frame):
+        """
+        Bring the state in line with ``frame`` and reassign affected rows.
+
+        Only added, revised or dropped countries are touched, unless the
+        scaler's range changed or year columns were added. In that case
+        every scaled row moves, so all countries are reassigned against the
+        carried-over centres. No k-means iterations are run either way.
+
+        Parameters:
+        - frame (pd.DataFrame): Latest unscaled data indexed by country; may
+          add rows and append year columns but not drop columns.
+
+        Returns:
+        - pd.DataFrame: 'old_cluster' and 'new_cluster' for every country
+          that was added, dropped or moved (NaN where absent).
+        """
+        from sklearn.preprocessing import MinMaxScaler
+
+        missing = self.raw.columns.difference(frame.columns)
+        if len(missing):
+            raise ValueError(f"Columns {list(missing)} were dropped, re-fit instead")
+        new_cols = frame.columns.difference(self.raw.columns, sort=False)
+        frame = frame[list(self.raw.columns) + list(new_cols)]
+
+        k = len(self.counts)
+        old_labels = pd.Series(self.labels, index=self.raw.index)
+        kept = self.raw.index.intersection(frame.index, sort=False)
+        dropped = self.raw.index.difference(frame.index, sort=False)
+        added = frame.index.difference(self.raw.index, sort=False)
+
+        old = self.raw.loc[kept].to_numpy()
+        cur = frame.loc[kept, self.raw.columns].to_numpy()
+        same = (old == cur) | (np.isnan(old) & np.isnan(cur))
+        revised = kept[~same.all(axis=1)]
+        delta = revised.append(added)
+
+        # Centres in original units; min-max scaling is affine, so they stay
+        # the cluster means under any new scaling
+        centers_raw = self.scaler.inverse_transform(self.centers)
+        if len(new_cols):
+            extra = (frame.loc[kept, new_cols].groupby(old_labels.loc[kept].to_numpy())
+                     .mean().reindex(range(k)).to_numpy())
+            centers_raw = np.hstack([centers_raw, extra])
+            self.scaler = MinMaxScaler().fit(frame.to_numpy())
+            rescaled = True
+        else:
+            data_min = self.scaler.data_min_.copy()
+            data_max = self.scaler.data_max_.copy()
+            if len(delta):
+                self.scaler.partial_fit(frame.loc[delta].to_numpy())
+            rescaled = not (np.array_equal(data_min, self.scaler.data_min_)
+                            and np.array_equal(data_max, self.scaler.data_max_))
+
+        if rescaled:
+            self.raw = frame
+            self.scaled = self.scaler.transform(frame.to_numpy())
+            self.labels = self._nearest(self.scaled, self.scaler.transform(centers_raw))
+            self._recount(k)
+        else:
+            # Move only the delta rows' contributions to the centres
+            for pos in self.raw.index.get_indexer(revised.append(dropped)):
+                self.sums[self.labels[pos]] -= self.scaled[pos]
+                self.counts[self.labels[pos]] -= 1
+
+            # Rows of the new table: carried over, then delta rows replaced
+            old_pos = self.raw.index.get_indexer(frame.index)
+            self.labels = self.labels[old_pos]
+            self.scaled = self.scaled[old_pos]
+            self.raw = frame
+            if len(delta):
+                delta_pos = frame.index.get_indexer(delta)
+                delta_scaled = self.scaler.transform(frame.loc[delta].to_numpy())
+                delta_labels = self._nearest(delta_scaled, self.centers)
+                np.add.at(self.sums, delta_labels, delta_scaled)
+                np.add.at(self.counts, delta_labels, 1)
+                self.labels[delta_pos] = delta_labels
+                self.scaled[delta_pos] = delta_scaled
+
+        changes = pd.DataFrame({"old_cluster": old_labels,
+                                "new_cluster": pd.Series(self.labels, index=frame.index)})
+        return changes[changes["old_cluster"].ne(changes["new_cluster"])]
+
+    def save(self, path):
+        """Write the state to ``path`` with pickle."""
+        with open(path, "wb") as fh:
+            pickle.dump(self, fh)
+
+    @staticmethod
+    def load(path):
+        """Read a state written by ``save``."""
+        with open(path, "rb") as fh:
+            return pickle.load(fh)
@@ -0,0 +1,268 @@
+"""Correlation matrices over many indicators, cached between calls.
+
+``pairwise_corr`` computes Pearson or Spearman correlations from pairwise
+complete observations with a few matrix products per block of columns,
+instead of pandas' loop over column pairs. Spearman ranks depend on the
+rows a pair shares, so only pairs whose columns have the same missing rows
+take the matrix path; the others are re-ranked over their shared rows.
+``CorrelationEngine`` keeps the matrices it has computed keyed by method,
+row index and column set, with a digest of every column: a repeated
+request is a lookup, and when only some columns changed just their rows
+and columns of the matrix are recomputed.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+METHODS = ("pearson", "spearman")
+
+
+def _corr_block(X, M, cols):
+    """Correlations of columns ``cols`` against all columns (pairwise complete)."""
+    Xc, Mc = X[:, cols], M[:, cols]
+    n = Mc.T @ M
+    sum_c = Xc.T @ M          # sum of column c over rows where the other is valid
+    sum_o = Mc.T @ X          # sum of the other column over rows where c is valid
+    sq_c = (Xc * Xc).T @ M
+    sq_o = Mc.T @ (X * X)
+    cross = Xc.T @ X
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = cross - sum_c * sum_o / n
+        var_c = sq_c - sum_c**2 / n
+        var_o = sq_o - sum_o**2 / n
+        corr = cov / np.sqrt(var_c * var_o)
+    corr[(n < 2) | (var_c <= 0) | (var_o <= 0)] = np.nan
+    return np.clip(corr, -1, 1, out=corr)
+
+
+def _prepared(values, method):
+    """Float64 values with NaN -> 0 and the validity mask, ranked for Spearman."""
+    values = np.asarray(values, dtype=np.float64)
+    if method == "spearman":
+        values = pd.DataFrame(values).rank(method="average").to_numpy()
+    valid = ~np.isnan(values)
+    # Centre each column; correlations are unchanged and the sums stay small
+    X = np.where(valid, values, 0.0)
+    X -= X.sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    X[~valid] = 0.0
+    return X, valid.astype(np.float64)
+
+
+def _missing_patterns(valid):
+    """Code per column; columns with equal codes have the same valid rows."""
+    packed = np.packbits(valid, axis=0).T
+    return np.unique(packed, axis=0, return_inverse=True)[1].ravel()
+
+
+def _tie_runs(values):
+    """
+    Per column (rows of the result): row order by value with NaN last, its
+    inverse, and for each sorted position the start and end (exclusive) of
+    its run of tied values.
+    """
+    order = np.argsort(values.T, axis=1, kind="stable")
+    ordered = np.take_along_axis(values.T, order, axis=1)
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    ends = np.ones(ordered.shape, dtype=bool)
+    ends[:, :-1] = starts[:, 1:]
+    position = np.arange(ordered.shape[1])
+    lo = np.maximum.accumulate(np.where(starts, position, 0), axis=1)
+    hi = np.minimum.accumulate(np.where(ends, position, len(position) - 1)[:, ::-1], axis=1)[:, ::-1] + 1
+    inverse = np.empty_like(order)
+    np.put_along_axis(inverse, order, position[None, :], axis=1)
+    return order, inverse, lo, hi
+
+
+def _counts(keep):
+    """Running count of ``keep`` along each row, with a leading zero."""
+    counts = np.zeros((keep.shape[0], keep.shape[1] + 1), dtype=np.int32)
+    np.cumsum(keep, axis=1, out=counts[:, 1:])
+    return counts
+
+
+def _rerank_pairs(values, out, columns, chunk_size=256):
+    """
+    Replace the Spearman entries of ``out`` whose two columns have different
+    missing rows by ranks over the rows both columns share, as pandas does.
+
+    Every column is sorted once. The average rank of an entry among the rows
+    of a mask is then the count of masked rows before its run of ties plus
+    half the masked rows within it, so column ``c`` and a block of other
+    columns are ranked over their shared rows with a cumulative count in
+    sorted order, for the whole block at once. Pairs whose columns share
+    their missing rows are already exact and skipped, and a pair with both
+    columns in ``columns`` is computed once.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values.T)
+    n_valid = valid.sum(axis=1)
+    patterns = _missing_patterns(valid.T)
+    order, inverse, lo, hi = _tie_runs(values)
+    row_of = {c: r for r, c in enumerate(columns)}
+    width = values.shape[0] + 1
+    for r, c in enumerate(columns):
+        others = np.flatnonzero(patterns != patterns[c])
+        others = others[[row_of.get(j, len(columns)) > r for j in others]]
+        # Rows column c has, in the order of its values
+        rows_c = order[c, :n_valid[c]]
+        lo_c, hi_c = lo[c, :n_valid[c]], hi[c, :n_valid[c]]
+        for start in range(0, len(others), chunk_size):
+            js = others[start:start + chunk_size]
+            shared = valid[np.ix_(js, rows_c)]
+            # Ranks of column c over the rows each other column has ...
+            counts = _counts(shared)
+            ranks_c = (counts[:, lo_c] + counts[:, hi_c] + 1) * 0.5
+            # ... and of each other column over the rows column c has, at the
+            # sorted positions of column c's rows
+            counts = _counts(valid[c][order[js]]).ravel()
+            at = inverse[np.ix_(js, rows_c)]
+            base = (np.arange(len(js)) * width)[:, None]
+            ranks_o = (counts[np.take_along_axis(lo[js], at, axis=1) + base]
+                       + counts[np.take_along_axis(hi[js], at, axis=1) + base] + 1) * 0.5
+            ranks_c *= shared
+            ranks_o *= shared
+            n = shared.sum(axis=1)
+            centre = n * ((n + 1) / 2) ** 2
+            cov = np.einsum("ij,ij->i", ranks_c, ranks_o) - centre
+            var_c = np.einsum("ij,ij->i", ranks_c, ranks_c) - centre
+            var_o = np.einsum("ij,ij->i", ranks_o, ranks_o) - centre
+            with np.errstate(invalid="ignore", divide="ignore"):
+                corr = cov / np.sqrt(var_c * var_o)
+            corr[(n < 2) | (var_c <= 0) | (var_o <= 0)] = np.nan
+            np.clip(corr, -1, 1, out=corr)
+            out[r, js] = corr
+            for j, value in zip(js, corr):
+                if j in row_of:
+                    out[row_of[j], c] = value
+    return out
+
+
+def pairwise_corr(values, method="pearson", columns=None, chunk_size=256):
+    """
+    Correlation matrix from pairwise complete observations.
+
+    Parameters:
+    - values (np.ndarray): (observations, variables) array with NaN gaps.
+    - method (str): 'pearson' or 'spearman'. Spearman ranks every column
+      once over its own observations, which equals pandas' per-pair ranking
+      when two columns share their missing rows; every other pair is
+      re-ranked over the rows both columns have.
+    - columns (array-like): Only compute these rows of the matrix.
+    - chunk_size (int): Columns per block; bounds the temporaries to about
+      6 * chunk_size * n_variables floats.
+
+    Returns:
+    - np.ndarray: (len(columns), n_variables) correlations, NaN where fewer
+      than two pairs or no variance.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+    X, M = _prepared(values, method)
+    columns = np.arange(X.shape[1]) if columns is None else np.asarray(columns)
+    out = np.empty((len(columns), X.shape[1]))
+    for start in range(0, len(columns), chunk_size):
+        block = columns[start:start + chunk_size]
+        out[start:start + len(block)] = _corr_block(X, M, block)
+    if method == "spearman":
+        _rerank_pairs(values, out, columns, chunk_size)
+    return out
+
+
+def column_digests(values):
+    """SHA-1 of every column of a 2-D array."""
+    columns = np.ascontiguousarray(np.asarray(values, dtype=np.float64).T)
+    return [hashlib.sha1(column.tobytes()).hexdigest() for column in columns]
+
+
+def index_digest(index):
+    """SHA-1 of a row index, so different country subsets get separate entries."""
+    return hashlib.sha1(pd.util.hash_pandas_object(index, index=False).to_numpy()).hexdigest()
+
+
+class CorrelationEngine:
+    """
+    Memoized correlation matrices.
+
+    Entries are keyed by (method, row index digest, column names) and hold
+    the matrix and the digest of every column. Up to ``max_entries`` are
+    kept, least recently used first out.
+    """
+
+    def __init__(self, chunk_size=256, max_entries=32):
+        self.chunk_size = chunk_size
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.stats = {"hits": 0, "updates": 0, "misses": 0}
+
+    def corr(self, df, method="pearson"):
+        """
+        Correlation matrix of the columns of ``df``, like ``df.corr(method)``.
+
+        Returns:
+        - pd.DataFrame: Square matrix indexed by the column names.
+        """
+        columns = tuple(df.columns)
+        values = df.to_numpy(dtype=np.float64, na_value=np.nan)
+        digests = column_digests(values)
+        key = (method, index_digest(df.index), columns)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            changed = [i for i, (old, new) in enumerate(zip(entry[0], digests)) if old != new]
+            if not changed:
+                self.stats["hits"] += 1
+                return self._frame(entry[1], columns)
+        if entry is not None and len(changed) <= len(columns) // 2:
+            # Only the changed columns' rows (and, by symmetry, columns)
+            matrix = entry[1].copy()
+            rows = pairwise_corr(values, method, changed, self.chunk_size)
+            matrix[changed, :] = rows
+            matrix[:, changed] = rows.T
+            self.stats["updates"] += 1
+        else:
+            matrix = pairwise_corr(values, method, chunk_size=self.chunk_size)
+            self.stats["misses"] += 1
+
+        self._entries[key] = (digests, matrix)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return self._frame(matrix, columns)
+
+    @staticmethod
+    def _frame(matrix, columns):
+        return pd.DataFrame(matrix, index=list(columns), columns=list(columns))
+
+    def clear(self):
+        self._entries.clear()
+
+
+ENGINE = CorrelationEngine()
+
+
+def indicator_corr(cube, countries=None, indicators=None, method="pearson", engine=None):
+    """
+    Correlation between indicators of a cube over all (country, year) pairs.
+
+    Parameters:
+    - cube (IndicatorCube): Data to correlate.
+    - countries, indicators (list): Optional subsets of the cube.
+    - method (str): 'pearson' or 'spearman'.
+    - engine (CorrelationEngine): Cache to use, the module's ``ENGINE`` by
+      default.
+
+    Returns:
+    - pd.DataFrame: Indicator x indicator correlation matrix.
+    """
+    if indicators is not None or countries is not None:
+        cube = cube.select(indicators, countries)
+    n_indicators, n_countries, n_years = cube.shape
+    frame = pd.DataFrame(
+        cube.values.reshape(n_indicators, n_countries * n_years).T,
+        index=pd.MultiIndex.from_product([cube.countries, cube.years]),
+        columns=cube.indicators)
+    return (engine or ENGINE).corr(frame, method)
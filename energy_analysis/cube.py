@@ -0,0 +1,198 @@
+"""Dense indicator x country x year cube.
+
+The chart sections of the script used to find their data with boolean masks
+over the whole long table (``df[df["Indicator Name"] == ...]``), which is an
+O(rows) string comparison per lookup. ``IndicatorCube`` builds a single
+3-D array once and resolves names to integer positions through hash-based
+indexes, so every slice below is a constant-time NumPy view.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from energy_analysis.loading import ID_COLUMNS
+
+
+class IndicatorCube:
+    """
+    Indicator x country x year array with name indexes for each axis.
+
+    Attributes:
+    - values (np.ndarray): Array of shape (indicators, countries, years);
+      combinations missing from the source table are NaN.
+    - indicators (pd.Index): Indicator names, in order of first appearance.
+    - countries (pd.Index): Country names, in order of first appearance.
+    - years (pd.Index): Year column labels.
+    """
+
+    def __init__(self, values, indicators, countries, years):
+        self.values = values
+        self.indicators = pd.Index(indicators, name="Indicator Name")
+        self.countries = pd.Index(countries, name="Country Name")
+        self.years = pd.Index(years)
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build a cube from a long table as returned by ``readFile()``.
+
+        Parameters:
+        - df (pd.DataFrame): Table with 'Country Name', 'Indicator Name' and
+          one column per year.
+
+        Returns:
+        - IndicatorCube: The cube holding every row of ``df``.
+        """
+        ind_codes, indicators = pd.factorize(df["Indicator Name"])
+        ctry_codes, countries = pd.factorize(df["Country Name"])
+        years = [c for c in df.columns if c not in ID_COLUMNS]
+
+        values = np.full((len(indicators), len(countries), len(years)), np.nan)
+        values[ind_codes, ctry_codes] = df[years].to_numpy(dtype=np.float64)
+        return cls(values, indicators, countries, years)
+
+    @classmethod
+    def from_block(cls, block, observed=None):
+        """
+        Build a cube from the selected rows of a preprocessing ``Block``,
+        reusing its integer codes and keeping its dtype.
+
+        Parameters:
+        - block (Block): Output of ``preprocessing.run_pipeline``.
+        - observed (np.ndarray): Optional boolean mask over
+          ``block.values`` of the cells observed before imputation, e.g.
+          ``~np.isnan(block.values)`` taken before ``run_pipeline``; the
+          other cells are NaN in the cube.
+
+        Returns:
+        - IndicatorCube: The cube holding the block's selected rows.
+        """
+        rows = block.rows
+        ind_used, ind_codes = np.unique(block.indicator_codes[rows], return_inverse=True)
+        ctry_used, ctry_codes = np.unique(block.country_codes[rows], return_inverse=True)
+
+        values = np.full((len(ind_used), len(ctry_used), len(block.years)), np.nan,
+                         dtype=block.values.dtype)
+        if observed is None:
+            values[ind_codes, ctry_codes] = block.values[rows]
+        else:
+            values[ind_codes, ctry_codes] = np.where(observed[rows], block.values[rows], np.nan)
+        return cls(values, block.indicators[ind_used], block.countries[ctry_used],
+                   block.years)
+
+    def save(self, directory):
+        """Write the cube as .npy files (values and the three axis labels)."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "values.npy"), self.values)
+        for name in ("indicators", "countries", "years"):
+            np.save(os.path.join(directory, f"{name}.npy"),
+                    np.asarray(getattr(self, name), dtype=str))
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """
+        Read a cube written by ``save``, memory-mapping its values so that
+        processes loading the same cube share its pages.
+        """
+        values = np.load(os.path.join(directory, "values.npy"), mmap_mode=mmap_mode)
+        labels = [np.load(os.path.join(directory, f"{name}.npy"))
+                  for name in ("indicators", "countries", "years")]
+        return cls(values, *labels)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def year_slice(self, first=None, last=None):
+        """
+        Positional slice of the year axis covering ``first`` to ``last``
+        inclusive.
+
+        Parameters:
+        - first (str): First year label, or None to start at the beginning.
+        - last (str): Last year label, or None to run to the end.
+
+        Returns:
+        - slice: Slice usable on the last axis of ``values``.
+        """
+        return self.years.slice_indexer(first, last)
+
+    def series(self, indicator, country):
+        """
+        Return one country's series for one indicator (view, shape (years,)).
+        """
+        return self.values[self.indicators.get_loc(indicator),
+                           self.countries.get_loc(country)]
+
+    def indicator(self, indicator):
+        """
+        Return one indicator across all countries (view, shape
+        (countries, years)).
+        """
+        return self.values[self.indicators.get_loc(indicator)]
+
+    def cross_section(self, year):
+        """
+        Return every indicator for every country in one year (view, shape
+        (indicators, countries)).
+        """
+        return self.values[:, :, self.years.get_loc(year)]
+
+    def frame(self, indicator):
+        """
+        Return one indicator as a DataFrame indexed by country with one column
+        per year. The frame shares memory with the cube.
+
+        Parameters:
+        - indicator (str): Indicator name.
+
+        Returns:
+        - pd.DataFrame: Countries x years table for the indicator.
+        """
+        return pd.DataFrame(self.indicator(indicator), index=self.countries,
+                            columns=self.years, copy=False)
+
+    def wide_frame(self, indicators=None, first_year=None, last_year=None):
+        """
+        Return every country as one row of all its indicator-year values,
+        e.g. to cluster countries on several indicators at once.
+
+        Parameters:
+        - indicators (list): Indicator names to include, or None for all.
+        - first_year, last_year (str): Inclusive year range, None for all.
+
+        Returns:
+        - pd.DataFrame: Countries x (indicator, year) table; NaN where a
+          country has no data for an indicator.
+        """
+        cube = self if indicators is None else self.select(indicators)
+        years = cube.year_slice(first_year, last_year)
+        values = cube.values[:, :, years]
+        columns = pd.MultiIndex.from_product([cube.indicators, cube.years[years]])
+        return pd.DataFrame(values.transpose(1, 0, 2).reshape(len(cube.countries), -1),
+                            index=cube.countries, columns=columns)
+
+    def select(self, indicators=None, countries=None):
+        """
+        Return a smaller cube holding only the given indicators and countries.
+        Names that are not present are ignored, like ``Series.isin``.
+
+        Parameters:
+        - indicators (list): Indicator names to keep, or None for all.
+        - countries (list): Country names to keep, or None for all.
+
+        Returns:
+        - IndicatorCube: The sub-cube (a copy, in cube order).
+        """
+        ind_pos = np.arange(len(self.indicators))
+        ctry_pos = np.arange(len(self.countries))
+        if indicators is not None:
+            ind_pos = np.flatnonzero(self.indicators.isin(indicators))
+        if countries is not None:
+            ctry_pos = np.flatnonzero(self.countries.isin(countries))
+
+        values = self.values[np.ix_(ind_pos, ctry_pos)]
+        return IndicatorCube(values, self.indicators[ind_pos],
+                             self.countries[ctry_pos], self.years)
@@ -0,0 +1,42 @@
+"""The curve models that can be fitted to a series, as plain NumPy functions.
+
+Kept free of pandas and scipy so the scoring module can evaluate stored fits
+with nothing but NumPy. ``CURVES`` names every model for storage.
+"""
+
+import inspect
+
+import numpy as np
+
+
+def simple_model(x, a, b, c):
+    """Quadratic trend ``a * x**2 + b * x + c``."""
+    return a * x**2 + b * x + c
+
+
+def linear_model(x, a, b):
+    """Straight line ``a * x + b``."""
+    return a * x + b
+
+
+def exp_model(x, a, b):
+    """Exponential growth or decay ``a * exp(b * x)``."""
+    return a * np.exp(b * x)
+
+
+def logistic_model(x, k, r, x0):
+    """Logistic curve with ceiling ``k``, rate ``r`` and midpoint ``x0``."""
+    return k / (1 + np.exp(-r * (x - x0)))
+
+
+def param_names(func):
+    """Names of the fitted parameters of ``func`` (all but the first)."""
+    return list(inspect.signature(func).parameters)[1:]
+
+
+CURVES = {
+    "linear": linear_model,
+    "quadratic": simple_model,
+    "exponential": exp_model,
+    "logistic": logistic_model,
+}
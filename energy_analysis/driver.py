@@ -0,0 +1,419 @@
+"""Config-driven batch runs of many analyses.
+
+A spec file (TOML, or YAML when PyYAML is installed) names the input CSV,
+the preprocessing pipeline and any number of analyses::
+
+    [data]
+    csv = "API_19_DS2_en_csv_v2_6300757.csv"
+    # Optional; the stages of preprocessing.STAGES, default DEFAULT_PIPELINE
+    pipeline = [{stage = "select_indicators", indicators = ["..."]},
+                {stage = "drop_empty"}, {stage = "impute", method = "linear"}]
+
+    [run]
+    out_dir = "runs"
+    workers = 4
+
+    [[analysis]]
+    name = "renewable_clusters"
+    kind = "cluster"
+    indicator = "Renewable energy consumption (% of total final energy consumption)"
+    first_year = "2010"
+    last_year = "2020"
+
+The spec becomes a DAG: the shared data step (load, preprocess, build the
+cube) runs once and is checkpointed as a memory-mapped cube, then every
+analysis whose dependencies (the data step plus its optional ``after`` list)
+are done runs in a process pool. Each job writes its results and a
+checkpoint holding a hash of its parameters and inputs to
+``<out_dir>/<name>/``; re-running a spec skips jobs whose checkpoint still
+matches, so an interrupted run resumes where it stopped.
+
+Run with ``python -m energy_analysis.driver spec.toml``.
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from energy_analysis.cache import source_digest
+from energy_analysis.cube import IndicatorCube
+
+DATA_JOB = "_data"
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def load_spec(path):
+    """Read a TOML or YAML spec into a dict."""
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("YAML specs need PyYAML (pip install pyyaml); "
+                              "use a TOML spec instead") from None
+        with open(path) as fh:
+            return yaml.safe_load(fh)
+    import tomllib
+
+    with open(path, "rb") as fh:
+        return tomllib.load(fh)
+
+
+def _columns(cube, first_year, last_year):
+    return cube.years[cube.year_slice(first_year, last_year)]
+
+
+def run_cluster(cube, params, out_dir):
+    """MinMaxScaler (+ optional projection) + k-means k-sweep on one
+    indicator, as in the script."""
+    from sklearn.preprocessing import MinMaxScaler
+    from energy_analysis.artifacts import save_clusters
+    from energy_analysis.clustering import choose_k, cluster_summary, sweep_k
+    from energy_analysis.evaluation import cluster_scores
+
+    frame = cube.frame(params["indicator"])
+    data = frame.loc[:, _columns(cube, params.get("first_year"), params.get("last_year"))]
+    if params.get("countries"):
+        data = data[data.index.isin(params["countries"])]
+    data = data.dropna()
+    scaler = MinMaxScaler()
+    data_scaled = scaler.fit_transform(data.to_numpy())
+    projection = None
+    if params.get("projection"):
+        from energy_analysis.projection import fit_projection
+
+        projection = fit_projection(data_scaled, variance=params.get("variance", 0.9),
+                                    method=params["projection"])
+        projection.report().to_csv(os.path.join(out_dir, "projection.csv"))
+        data_scaled = projection.transform(data_scaled)
+
+    k = params.get("k", [2, 8])
+    k_values = range(k[0], k[1] + 1) if isinstance(k, list) else [k]
+    report = sweep_k(data_scaled, k_values, backend=params.get("backend", "full"), n_jobs=1)
+    kmeans = report.attrs["models"][choose_k(report)]
+    report.to_csv(os.path.join(out_dir, "k_report.csv"))
+    pd.Series(kmeans.labels_, index=data.index, name="cluster").to_csv(
+        os.path.join(out_dir, "labels.csv"))
+    cluster_summary(data, kmeans.labels_, data_scaled, kmeans.cluster_centers_).to_csv(
+        os.path.join(out_dir, "summary.csv"))
+    save_clusters(os.path.join(out_dir, "artifacts"), "clusters", scaler,
+                  kmeans.cluster_centers_, data.columns, labels=kmeans.labels_,
+                  index=data.index, projection=projection)
+    scores = cluster_scores(data_scaled, kmeans.labels_)
+    return {"n_clusters": int(kmeans.n_clusters), "rows": len(data),
+            **{name: value for name, value in scores.items() if np.isscalar(value)}}
+
+
+def run_fit(cube, params, out_dir):
+    """One curve model fitted to every selected series (``fit_cube``)."""
+    from energy_analysis.curves import CURVES
+    from energy_analysis.fitting import fit_cube
+
+    model = params.get("model", "quadratic")
+    fits = fit_cube(cube, CURVES[model], params.get("first_year"), params.get("last_year"),
+                    indicators=params.get("indicators"), countries=params.get("countries"),
+                    workers=1)
+    fits.to_csv(os.path.join(out_dir, "fits.csv"))
+    return {"model": model, "series": len(fits), "fitted": int(fits["n_obs"].gt(0).sum())}
+
+
+def run_forecast(cube, params, out_dir):
+    """Model selection and forecasts for every selected series (``fit_cube_panel``)."""
+    from energy_analysis.artifacts import save_panel
+    from energy_analysis.panel import fit_cube_panel
+
+    first_year = params.get("first_year", cube.years[0])
+    panel, (fitted, lower, upper) = fit_cube_panel(
+        cube, first_year, params.get("last_year"), horizon=params.get("horizon", 2030),
+        indicators=params.get("indicators"), countries=params.get("countries"),
+        criterion=params.get("criterion", "aic"), workers=1)
+    panel.selection.to_csv(os.path.join(out_dir, "selection.csv"))
+    panel.report.to_csv(os.path.join(out_dir, "report.csv"))
+    pd.concat({"fitted": fitted, "lower": lower, "upper": upper}, axis=1).to_csv(
+        os.path.join(out_dir, "forecast.csv"))
+    save_panel(os.path.join(out_dir, "artifacts"), "curves", panel, int(first_year))
+    return {"series": len(panel.selection),
+            "models": panel.selection["model"].value_counts().to_dict()}
+
+
+def run_ranking(cube, params, out_dir):
+    """Top or bottom N countries of one indicator in one year."""
+    from energy_analysis.ranking import Rankings
+
+    if params.get("countries"):
+        cube = cube.select(countries=params["countries"])
+    n = params.get("n", 10)
+    rankings = Rankings(cube.select(indicators=[params["indicator"]]), n=n)
+    which = params.get("which", "top")
+    ranking = getattr(rankings, which)(params["indicator"], str(params["year"]), n)
+    ranking.to_csv(os.path.join(out_dir, "ranking.csv"))
+    return {"which": which, "countries": list(ranking.index)}
+
+
+def run_correlation(cube, params, out_dir):
+    """Indicator correlation matrix over all country-year pairs."""
+    from energy_analysis.correlation import indicator_corr
+
+    corr = indicator_corr(cube, params.get("countries"), params.get("indicators"),
+                          method=params.get("method", "pearson"))
+    corr.to_csv(os.path.join(out_dir, "correlation.csv"))
+    return {"indicators": len(corr)}
+
+
+def run_charts(cube, params, out_dir):
+    """One line chart per selected indicator x country series."""
+    from energy_analysis.plotting import render_jobs, series_jobs
+
+    jobs = series_jobs(cube, params.get("indicators"), params.get("countries"),
+                       params.get("first_year"), params.get("last_year"))
+    status = render_jobs(jobs, out_dir, formats=tuple(params.get("formats", ["png"])),
+                         workers=1)
+    return {"charts": len(status)}
+
+
+def run_maps(cube, params, out_dir):
+    """One choropleth per indicator and year; skipped with a warning when
+    no country shapes are available (set ``shapes`` to a shape file)."""
+    import warnings
+
+    from energy_analysis.geometry import WorldGeometry, render_maps
+
+    try:
+        geometry = WorldGeometry.load(params.get("shapes"))
+    except FileNotFoundError as exc:
+        warnings.warn(f"Skipping the maps: {exc}")
+        return {"maps": 0, "skipped": str(exc)}
+    years = [str(year) for year in params["years"]]
+    written = render_maps(geometry, cube, params["indicators"], years, out_dir,
+                          formats=tuple(params.get("formats", ["png"])))
+    return {"maps": len(written)}
+
+
+HANDLERS = {
+    "cluster": run_cluster,
+    "fit": run_fit,
+    "forecast": run_forecast,
+    "ranking": run_ranking,
+    "correlation": run_correlation,
+    "charts": run_charts,
+    "maps": run_maps,
+}
+
+
+def _digest(*parts):
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def build_dag(spec):
+    """
+    Validate the analyses of a spec and order them.
+
+    Returns:
+    - list: (name, kind, params, dependencies) in a topological order;
+      every analysis depends on the data step.
+    """
+    analyses = spec.get("analysis", [])
+    jobs = {}
+    for entry in analyses:
+        entry = dict(entry)
+        name, kind = entry.pop("name", None), entry.pop("kind", None)
+        if not name or name in jobs or name == DATA_JOB:
+            raise ValueError(f"Analysis names must be unique and non-empty, got {name!r}")
+        if kind not in HANDLERS:
+            raise ValueError(f"Analysis {name!r} has unknown kind {kind!r}, "
+                             f"expected one of {sorted(HANDLERS)}")
+        jobs[name] = (kind, entry, [DATA_JOB] + list(entry.pop("after", [])))
+
+    order, done = [], {DATA_JOB}
+    while len(order) < len(jobs):
+        ready = [name for name, (_, _, deps) in jobs.items()
+                 if name not in done and all(dep in done for dep in deps)]
+        if not ready:
+            pending = sorted(set(jobs) - done)
+            unknown = {dep for name in pending for dep in jobs[name][2]} - set(jobs) - done
+            raise ValueError(f"Unknown dependencies {sorted(unknown)}" if unknown
+                             else f"Dependency cycle among {pending}")
+        for name in ready:
+            order.append((name, *jobs[name]))
+            done.add(name)
+    return order
+
+
+def _read_checkpoint(job_dir):
+    try:
+        with open(os.path.join(job_dir, CHECKPOINT_FILE)) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_checkpoint(job_dir, checkpoint):
+    tmp = os.path.join(job_dir, CHECKPOINT_FILE + ".tmp")
+    with open(tmp, "w") as fh:
+        json.dump(checkpoint, fh, indent=2, default=str)
+    os.replace(tmp, os.path.join(job_dir, CHECKPOINT_FILE))
+
+
+def prepare_data(data_spec, out_dir, force=False):
+    """
+    Run the shared load + preprocess step once and checkpoint the cube.
+
+    Returns:
+    - The cube directory and the hash of the data step.
+    """
+    from energy_analysis.preprocessing import DEFAULT_PIPELINE
+
+    csv = data_spec["csv"]
+    pipeline = [(stage.pop("stage"), stage) for stage in
+                (dict(entry) for entry in data_spec.get("pipeline", []))] or DEFAULT_PIPELINE
+    data_hash = _digest(source_digest(csv), pipeline)
+    job_dir = os.path.join(out_dir, DATA_JOB)
+    cube_dir = os.path.join(job_dir, "cube")
+    checkpoint = _read_checkpoint(job_dir)
+    if not force and checkpoint and checkpoint["hash"] == data_hash:
+        return cube_dir, data_hash
+
+    from energy_analysis.preprocessing import read_block, run_pipeline
+
+    start = time.perf_counter()
+    block = read_block(csv)
+    block, stage_report = run_pipeline(block, pipeline)
+    cube = IndicatorCube.from_block(block)
+    cube.save(cube_dir)
+    stage_report.to_csv(os.path.join(job_dir, "stages.csv"), index=False)
+    _write_checkpoint(job_dir, {"hash": data_hash, "seconds": time.perf_counter() - start,
+                                "shape": list(cube.shape)})
+    return cube_dir, data_hash
+
+
+def run_job(kind, params, cube_dir, job_dir, job_hash):
+    """Run one analysis on the checkpointed cube and write its checkpoint."""
+    os.makedirs(job_dir, exist_ok=True)
+    start = time.perf_counter()
+    summary = HANDLERS[kind](IndicatorCube.load(cube_dir), params, job_dir)
+    seconds = time.perf_counter() - start
+    _write_checkpoint(job_dir, {
+        "hash": job_hash, "kind": kind, "seconds": seconds, "summary": summary,
+        "finished": datetime.datetime.now().isoformat(timespec="seconds")})
+    return seconds
+
+
+def run_spec(spec, out_dir=None, workers=None, force=False, only=None):
+    """
+    Run the analyses of a spec, skipping jobs with a matching checkpoint.
+
+    Parameters:
+    - spec (dict): Parsed spec, see the module docstring.
+    - out_dir (str): Output directory; the spec's run.out_dir by default.
+    - workers (int): Process pool size; 1 runs the jobs in this process.
+    - force (bool): Re-run every job even if its checkpoint matches.
+    - only (list): Run just these analyses and the ones they depend on.
+
+    Returns:
+    - pd.DataFrame: Per analysis kind, status ('done', 'cached', 'failed' or
+      'blocked'), seconds and error.
+    """
+    run = spec.get("run", {})
+    out_dir = out_dir or run.get("out_dir", "runs")
+    workers = workers or run.get("workers")
+    order = build_dag(spec)
+    if only:
+        # Add the dependencies of the selected analyses, in reverse order
+        keep = set(only)
+        for name, _, _, deps in reversed(order):
+            if name in keep:
+                keep.update(deps)
+        order = [job for job in order if job[0] in keep]
+
+    cube_dir, data_hash = prepare_data(spec["data"], out_dir, force)
+    # A job's hash covers its parameters and its dependencies' hashes, so a
+    # changed input invalidates everything downstream of it
+    hashes = {DATA_JOB: data_hash}
+    for name, kind, params, deps in order:
+        hashes[name] = _digest(kind, params, [hashes[dep] for dep in deps])
+    kinds = {name: kind for name, kind, _, _ in order}
+    status = {DATA_JOB: "done"}
+    rows = {}
+
+    def finish(name, state, seconds=None, error=None):
+        status[name] = state
+        rows[name] = {"kind": kinds[name], "status": state, "seconds": seconds,
+                      "error": error}
+
+    pending = []
+    for name, kind, params, deps in order:
+        checkpoint = _read_checkpoint(os.path.join(out_dir, name))
+        if not force and checkpoint and checkpoint["hash"] == hashes[name]:
+            finish(name, "cached", checkpoint.get("seconds"))
+        else:
+            pending.append((name, kind, params, deps))
+
+    def ready():
+        jobs = []
+        for job in list(pending):
+            deps_state = [status.get(dep) for dep in job[3]]
+            if any(state in ("failed", "blocked") for state in deps_state):
+                pending.remove(job)
+                finish(job[0], "blocked")
+            elif all(state in ("done", "cached") for state in deps_state):
+                pending.remove(job)
+                jobs.append(job)
+        return jobs
+
+    if workers == 1:
+        while pending:
+            batch = ready()
+            if not batch:
+                break
+            for name, kind, params, _ in batch:
+                try:
+                    seconds = run_job(kind, params, cube_dir, os.path.join(out_dir, name),
+                                      hashes[name])
+                    finish(name, "done", seconds)
+                except Exception as exc:  # noqa: BLE001 - recorded, other jobs go on
+                    finish(name, "failed", error=repr(exc))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            while pending or running:
+                for name, kind, params, _ in ready():
+                    future = pool.submit(run_job, kind, params, cube_dir,
+                                         os.path.join(out_dir, name), hashes[name])
+                    running[future] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        finish(name, "done", future.result())
+                    except Exception as exc:  # noqa: BLE001
+                        finish(name, "failed", error=repr(exc))
+
+    return pd.DataFrame.from_dict(rows, orient="index").reindex(
+        [name for name, _, _, _ in order])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the analyses of a TOML/YAML spec.")
+    parser.add_argument("spec", help="Spec file (.toml, .yaml or .yml)")
+    parser.add_argument("--out-dir", help="Output directory (default: run.out_dir)")
+    parser.add_argument("--workers", type=int, help="Process pool size")
+    parser.add_argument("--force", action="store_true", help="Ignore checkpoints")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="Run only these analyses")
+    args = parser.parse_args(argv)
+
+    result = run_spec(load_spec(args.spec), args.out_dir, args.workers, args.force, args.only)
+    with pd.option_context("display.max_colwidth", 60, "display.width", 120):
+        print(result)
+    return int((result["status"] == "failed").any())
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,392 @@
+"""Curve fitting for single series and for whole batches of series.
+
+``fit_batch`` fits one model to many series sampled at the same x points.
+Models that are linear in their parameters (such as the quadratic
+``simple_model``) are solved for every series at once as a single
+least-squares problem; any other model falls back to ``curve_fit`` per series,
+spread over a process pool, with the analytic Jacobian from ``JACOBIANS``
+when the model has one.
+
+scipy is imported on first use.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from energy_analysis.curves import (exp_model, linear_model, logistic_model, param_names,
+                                    simple_model)
+from energy_analysis.tracing import traced
+
+
+def _quadratic_basis(x):
+    return np.column_stack([x**2, x, np.ones_like(x)])
+
+
+def _linear_basis(x):
+    return np.column_stack([x, np.ones_like(x)])
+
+
+def _exp_jac(x, a, b):
+    e = np.exp(b * x)
+    return np.stack(np.broadcast_arrays(e, a * x * e), axis=-1)
+
+
+def _logistic_jac(x, k, r, x0):
+    e = np.exp(-r * (x - x0))
+    d = e / (1 + e) ** 2
+    return np.stack(np.broadcast_arrays(1 / (1 + e), k * (x - x0) * d, -k * r * d),
+                    axis=-1)
+
+
+# Design-matrix builders for models that are linear in their parameters,
+# columns in the same order as the model's parameters
+LINEAR_BASES = {simple_model: _quadratic_basis, linear_model: _linear_basis}
+
+# Analytic Jacobians ``jac(x, *params)`` of non-linear models, shape
+# x.shape + (p,); they broadcast like the models themselves
+JACOBIANS = {exp_model: _exp_jac, logistic_model: _logistic_jac}
+
+
+@lru_cache(maxsize=None)
+def t_quantile(alpha, dof):
+    """Two-sided Student-t critical value, cached per (alpha, dof)."""
+    from scipy.stats import t
+
+    return abs(t.ppf(alpha / 2, dof))
+
+
+def _t_values(alpha, dof):
+    """``t_quantile`` for an array of dofs, one lookup per distinct value."""
+    distinct, inverse = np.unique(np.asarray(dof, dtype=int), return_inverse=True)
+    return np.array([t_quantile(alpha, int(d)) for d in distinct])[inverse]
+
+
+# Function to estimate confidence ranges
+@traced
+def err_ranges(fit_params, covariance_matrix, x_data, func, alpha=0.05):
+    """
+    Confidence ranges of fitted parameters from their covariance matrix.
+
+    Parameters:
+    - fit_params (np.ndarray): Fitted parameters.
+    - covariance_matrix (np.ndarray): Parameter covariance from the fit.
+    - x_data (np.ndarray): x points the parameters were fitted on.
+    - func (callable): The fitted model.
+    - alpha (float): Significance level of the two-sided range.
+
+    Returns:
+    - Lower and upper bounds of the parameters.
+    """
+    n = len(x_data)
+    p = len(fit_params)
+    dof = max(0, n - p)  # Degrees of freedom
+
+    t_value = t_quantile(alpha, dof)
+
+    err = np.sqrt(np.diag(covariance_matrix))
+
+    lower_bounds = fit_params - t_value * err
+    upper_bounds = fit_params + t_value * err
+
+    return lower_bounds, upper_bounds
+
+
+def _eval_batch(func, x, params):
+    """Evaluate ``func`` for every parameter row at once, shape (S, m)."""
+    return func(x[None, :], *(params[:, j, None] for j in range(params.shape[1])))
+
+
+def model_jacobian(func, x, params):
+    """
+    Derivatives of ``func`` with respect to its parameters.
+
+    Linear models use their design matrix, models in ``JACOBIANS`` their
+    analytic derivatives; other models use central differences evaluated
+    for all series together.
+
+    Parameters:
+    - func (callable): Model ``func(x, *params)``, broadcasting over arrays.
+    - x (np.ndarray): Evaluation points, shape (m,).
+    - params (np.ndarray): Parameters, shape (S, p).
+
+    Returns:
+    - np.ndarray: Jacobian of shape (m, p) for linear models, else (S, m, p).
+    """
+    basis = LINEAR_BASES.get(func)
+    if basis is not None:
+        return basis(x)
+    analytic = JACOBIANS.get(func)
+    if analytic is not None:
+        return analytic(x[None, :], *(params[:, j, None] for j in range(params.shape[1])))
+
+    jac = np.empty(params.shape[:1] + x.shape + params.shape[1:])
+    step = np.cbrt(np.finfo(np.float64).eps) * np.maximum(np.abs(params), 1.0)
+    for j in range(params.shape[1]):
+        up, down = params.copy(), params.copy()
+        up[:, j] += step[:, j]
+        down[:, j] -= step[:, j]
+        jac[:, :, j] = ((_eval_batch(func, x, up) - _eval_batch(func, x, down))
+                        / (2 * step[:, j, None]))
+    return jac
+
+
+@traced
+def err_bands(fit_params, covariance_matrix, x_data, func, alpha=0.05,
+              x_eval=None, resid_var=None, dof=None):
+    """
+    Delta-method confidence (or prediction) bands around fitted curves.
+
+    Takes the same arguments as ``err_ranges`` but propagates the full
+    covariance matrix through the model instead of plugging the parameter
+    bounds back in. Parameters may be stacked to get the bands of many
+    series in one call.
+
+    Parameters:
+    - fit_params (np.ndarray): Fitted parameters, shape (p,) or (S, p).
+    - covariance_matrix (np.ndarray): Covariances, shape (p, p) or (S, p, p).
+    - x_data (np.ndarray): x points the parameters were fitted on.
+    - func (callable): The fitted model.
+    - alpha (float): Significance level of the two-sided band.
+    - x_eval (np.ndarray): Points to evaluate the band at; x_data if None.
+    - resid_var (float or np.ndarray): Residual variance per series; when
+      given the band is a prediction band rather than a confidence band.
+    - dof (int or np.ndarray): Degrees of freedom per series; defaults to
+      ``len(x_data) - p`` as in ``err_ranges``.
+
+    Returns:
+    - Fitted values, lower and upper band, each of shape (m,) or (S, m).
+    """
+    params = np.asarray(fit_params, dtype=np.float64)
+    single = params.ndim == 1
+    params = np.atleast_2d(params)
+    cov = np.asarray(covariance_matrix, dtype=np.float64).reshape(
+        len(params), params.shape[1], params.shape[1])
+    x = np.asarray(x_data if x_eval is None else x_eval, dtype=np.float64)
+
+    if dof is None:
+        dof = max(0, len(x_data) - params.shape[1])
+    dof = np.broadcast_to(np.maximum(np.asarray(dof), 0), (len(params),))
+    t_value = _t_values(alpha, dof)
+
+    jac = model_jacobian(func, x, params)
+    if jac.ndim == 2:
+        var = np.einsum("mp,spq,mq->sm", jac, cov, jac)
+    else:
+        var = np.einsum("smp,spq,smq->sm", jac, cov, jac)
+    if resid_var is not None:
+        var = var + np.reshape(resid_var, (-1, 1))
+
+    fitted = _eval_batch(func, x, params)
+    half = t_value[:, None] * np.sqrt(var)
+    lower, upper = fitted - half, fitted + half
+    if single:
+        return fitted[0], lower[0], upper[0]
+    return fitted, lower, upper
+
+
+def table_bands(fits, func, x_eval, alpha=0.05, prediction=False):
+    """
+    Bands for every row of a ``fit_batch`` table.
+
+    Parameters:
+    - fits (pd.DataFrame): Output of ``fit_batch`` / ``fit_cube``.
+    - func (callable): The model the table was fitted with.
+    - x_eval (np.ndarray): Points to evaluate the bands at.
+    - alpha (float): Significance level of the two-sided band.
+    - prediction (bool): Add the residual variance (prediction band).
+
+    Returns:
+    - Fitted values, lower and upper band, each of shape (series, m).
+    """
+    names = param_names(func)
+    p = len(names)
+    params = fits[names].to_numpy()
+    cov = np.empty((len(fits), p, p))
+    for j, k in zip(*np.triu_indices(p)):
+        cov[:, j, k] = cov[:, k, j] = fits[f"cov_{names[j]}_{names[k]}"]
+    resid_var = fits["resid_var"].to_numpy() if prediction else None
+    return err_bands(params, cov, x_eval, func, alpha, x_eval=x_eval,
+                     resid_var=resid_var, dof=fits["n_obs"].to_numpy() - p)
+
+
+def _fit_linear(x, Y, basis):
+    """
+    Least-squares fit of every row of ``Y`` (no NaNs) on one design.
+
+    Returns the parameters, their covariances and per row whether the fit
+    is determined (full-rank design and finite parameters).
+    """
+    X = basis(x)
+    n, p = X.shape
+    params, _, rank, _ = np.linalg.lstsq(X, Y.T, rcond=None)
+    params = params.T
+    converged = (rank == p) & np.isfinite(params).all(axis=1)
+
+    resid = Y - params @ X.T
+    dof = n - p
+    # Same scaling as curve_fit with absolute_sigma=False
+    if dof > 0:
+        s_sq = np.einsum("ij,ij->i", resid, resid) / dof
+        cov = np.linalg.pinv(X.T @ X)[None, :, :] * s_sq[:, None, None]
+    else:
+        cov = np.full((len(Y), p, p), np.inf)
+    return params, cov, converged
+
+
+def _fit_series(func, x, y, p0, maxfev=5000, full_output=False):
+    """
+    curve_fit on the observed points of one series; NaNs if it fails.
+
+    With ``full_output`` also returns the number of function evaluations
+    and whether the fit converged: the solver reported success within
+    ``maxfev`` evaluations and the parameters are finite.
+    """
+    from scipy.optimize import curve_fit
+
+    p = len(param_names(func))
+    ok = np.isfinite(y)
+    failed = np.full(p, np.nan), np.full((p, p), np.nan)
+    if ok.sum() < p:
+        return failed + (0, False) if full_output else failed
+    try:
+        params, cov, info, _, ier = curve_fit(
+            func, x[ok], y[ok], p0=p0, jac=JACOBIANS.get(func), maxfev=maxfev,
+            full_output=True)
+    except (RuntimeError, ValueError):
+        return failed + (maxfev, False) if full_output else failed
+    if full_output:
+        nfev = int(info["nfev"])
+        converged = ier in (1, 2, 3, 4) and nfev < maxfev and bool(np.isfinite(params).all())
+        return params, cov, nfev, converged
+    return params, cov
+
+
+@traced
+def fit_batch(x, Y, func=simple_model, index=None, alpha=0.05, p0=None,
+              workers=None):
+    """
+    Fit ``func`` to every row of ``Y`` and return a tidy table of results.
+
+    Parameters:
+    - x (np.ndarray): Shared x points, shape (n,).
+    - Y (np.ndarray): One series per row, shape (series, n). NaNs mark
+      missing observations and are left out of that series' fit.
+    - func (callable): Model ``func(x, *params)``.
+    - index (pd.Index): Optional labels for the rows of ``Y``.
+    - alpha (float): Significance level of the parameter bounds.
+    - p0 (list): Initial guess for non-linear models.
+    - workers (int): Process pool size for non-linear models; 1 fits in
+      this process.
+
+    Returns:
+    - pd.DataFrame: One row per series with n_obs, whether the fit
+      converged, the residual variance (resid_var, NaN for failed fits),
+      the fitted parameters, the upper triangle of their covariance
+      (cov_<p>_<q>) and the err_ranges() bounds (<p>_lower, <p>_upper).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+    names = param_names(func)
+    p = len(names)
+    params = np.full((len(Y), p), np.nan)
+    cov = np.full((len(Y), p, p), np.nan)
+    converged = np.zeros(len(Y), dtype=bool)
+
+    complete = np.isfinite(Y).all(axis=1)
+    basis = LINEAR_BASES.get(func)
+    if basis is not None:
+        if complete.any():
+            params[complete], cov[complete], converged[complete] = _fit_linear(
+                x, Y[complete], basis)
+        # Series with gaps each get their own design matrix
+        for i in np.flatnonzero(~complete):
+            ok = np.isfinite(Y[i])
+            if ok.sum() >= p:
+                params[i], cov[i], converged[i] = _fit_linear(x[ok], Y[i:i + 1, ok], basis)
+    elif workers == 1 or len(Y) < 2:
+        for i, y in enumerate(Y):
+            params[i], cov[i], _, converged[i] = _fit_series(func, x, y, p0,
+                                                             full_output=True)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_fit_series, repeat(func), repeat(x), Y, repeat(p0),
+                               repeat(5000), repeat(True), chunksize=max(1, len(Y) // 64))
+            for i, (fit_params, fit_cov, _, fit_converged) in enumerate(results):
+                params[i], cov[i], converged[i] = fit_params, fit_cov, fit_converged
+
+    return fit_table(x, Y, func, params, cov, index, alpha, converged)
+
+
+def fit_table(x, Y, func, params, cov, index=None, alpha=0.05, converged=None):
+    """
+    Tidy table of fitted parameters, as returned by ``fit_batch``.
+
+    Parameters:
+    - x, Y (np.ndarray): The fitted x points and series, shapes (n,), (S, n).
+    - func (callable): The fitted model.
+    - params, cov (np.ndarray): Parameters (S, p) and covariances (S, p, p).
+    - index (pd.Index): Optional labels for the rows of ``Y``.
+    - alpha (float): Significance level of the parameter bounds.
+    - converged (np.ndarray): Solver status per series; None counts every
+      fit with finite parameters as converged.
+
+    Returns:
+    - pd.DataFrame: See ``fit_batch``.
+    """
+    names = param_names(func)
+    p = len(names)
+    ok = np.isfinite(params).all(axis=1)
+    if converged is not None:
+        ok &= np.asarray(converged, dtype=bool)
+
+    # err_ranges() for every series in one pass
+    n_obs = np.isfinite(Y).sum(axis=1)
+    dof = np.maximum(0, n_obs - p)
+    t_value = _t_values(alpha, dof)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rss = np.nansum((Y - _eval_batch(func, x, params)) ** 2, axis=1)
+        resid_var = np.where(ok & (dof > 0), rss / np.maximum(dof, 1), np.nan)
+    err = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+    lower = params - t_value[:, None] * err
+    upper = params + t_value[:, None] * err
+
+    table = {"n_obs": n_obs, "converged": ok, "resid_var": resid_var}
+    for j, name in enumerate(names):
+        table[name] = params[:, j]
+    for j, k in zip(*np.triu_indices(p)):
+        table[f"cov_{names[j]}_{names[k]}"] = cov[:, j, k]
+    for j, name in enumerate(names):
+        table[f"{name}_lower"] = lower[:, j]
+        table[f"{name}_upper"] = upper[:, j]
+    return pd.DataFrame(table, index=index)
+
+
+@traced
+def fit_cube(cube, func=simple_model, first_year=None, last_year=None,
+             indicators=None, countries=None, **kwargs):
+    """
+    Fit ``func`` to every indicator x country series of a cube.
+
+    As in the script's curve-fitting section, x is the position of each
+    year in the selected range (0, 1, 2, ...).
+
+    Parameters:
+    - cube (IndicatorCube): Data to fit.
+    - func (callable): Model ``func(x, *params)``.
+    - first_year, last_year (str): Inclusive year range, None for all.
+    - indicators, countries (list): Optional subsets of the cube.
+    - **kwargs: Passed on to ``fit_batch``.
+
+    Returns:
+    - pd.DataFrame: ``fit_batch`` table indexed by indicator and country.
+    """
+    if indicators is not None or countries is not None:
+        cube = cube.select(indicators, countries)
+    Y = cube.values[:, :, cube.year_slice(first_year, last_year)]
+    index = pd.MultiIndex.from_product([cube.indicators, cube.countries])
+    x = np.arange(Y.shape[-1], dtype=np.float64)
+    return fit_batch(x, Y.reshape(-1, Y.shape[-1]), func, index=index, **kwargs)
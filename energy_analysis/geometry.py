@@ -0,0 +1,236 @@
+"""Cached, simplified country geometry for the choropleth maps.
+
+``WorldGeometry.load`` reads the Natural Earth shapes once, simplifies them,
+splits multi-part countries into single polygons and stores the result as WKB
+arrays in the cache directory, keyed by the source file's content hash and
+the tolerance. World Bank country names are resolved to polygon rows once, so
+colouring the map for an indicator and year is an array lookup rather than a
+string merge. ``render_maps`` draws many indicator/year maps on one figure,
+updating the colours of the same polygon collection for every frame.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from energy_analysis.cache import DEFAULT_CACHE_DIR, source_digest
+
+# World Bank country names that Natural Earth spells differently
+WB_TO_NATURAL_EARTH = {
+    'United States': 'United States of America',
+    'Russian Federation': 'Russia',
+    'Korea, Rep.': 'South Korea',
+    "Korea, Dem. People's Rep.": 'North Korea',
+    'Iran, Islamic Rep.': 'Iran',
+    'Egypt, Arab Rep.': 'Egypt',
+    'Venezuela, RB': 'Venezuela',
+    'Turkiye': 'Turkey',
+    'Syrian Arab Republic': 'Syria',
+    'Yemen, Rep.': 'Yemen',
+    'Lao PDR': 'Laos',
+    'Viet Nam': 'Vietnam',
+    'Congo, Dem. Rep.': 'Dem. Rep. Congo',
+    'Congo, Rep.': 'Congo',
+    'Slovak Republic': 'Slovakia',
+    'Kyrgyz Republic': 'Kyrgyzstan',
+    'Gambia, The': 'Gambia',
+    'Bahamas, The': 'Bahamas',
+    'Central African Republic': 'Central African Rep.',
+    'South Sudan': 'S. Sudan',
+    'Bosnia and Herzegovina': 'Bosnia and Herz.',
+    'Dominican Republic': 'Dominican Rep.',
+    'Equatorial Guinea': 'Eq. Guinea',
+    'Solomon Islands': 'Solomon Is.',
+    "Cote d'Ivoire": "Côte d'Ivoire",
+    'Eswatini': 'eSwatini',
+    'Brunei Darussalam': 'Brunei',
+    'West Bank and Gaza': 'Palestine',
+}
+NATURAL_EARTH_TO_WB = {ne: wb for wb, ne in WB_TO_NATURAL_EARTH.items()}
+
+
+def natural_earth_path():
+    """
+    Path of geopandas' bundled low resolution Natural Earth shapes, or None
+    where geopandas no longer ships them (1.0 and later).
+    """
+    try:
+        return gpd.datasets.get_path('naturalearth_lowres')
+    except (AttributeError, ValueError):
+        return None
+
+
+def _name_column(frame):
+    """The country name column: 'name' in the bundled shapes, 'NAME' or
+    'ADMIN' in the Natural Earth downloads."""
+    for column in ("name", "NAME", "ADMIN"):
+        if column in frame.columns:
+            return column
+    raise ValueError(f"No country name column in {list(frame.columns)}")
+
+
+def _write_geometry(frame, entry_dir):
+    os.makedirs(entry_dir, exist_ok=True)
+    wkb = shapely.to_wkb(frame.geometry.to_numpy())
+    sizes = np.fromiter((len(blob) for blob in wkb), dtype=np.int64, count=len(wkb))
+    np.save(os.path.join(entry_dir, "wkb.npy"),
+            np.frombuffer(b"".join(wkb), dtype=np.uint8))
+    np.save(os.path.join(entry_dir, "offsets.npy"), np.concatenate([[0], np.cumsum(sizes)]))
+    np.save(os.path.join(entry_dir, "names.npy"), frame["name"].to_numpy(dtype=str))
+    with open(os.path.join(entry_dir, "crs.json"), "w") as fh:
+        json.dump({"crs": frame.crs.to_string() if frame.crs else None}, fh)
+
+
+def _read_geometry(entry_dir):
+    buffer = np.load(os.path.join(entry_dir, "wkb.npy"))
+    offsets = np.load(os.path.join(entry_dir, "offsets.npy"))
+    blobs = np.array([buffer[start:end].tobytes()
+                      for start, end in zip(offsets[:-1], offsets[1:])], dtype=object)
+    with open(os.path.join(entry_dir, "crs.json")) as fh:
+        crs = json.load(fh)["crs"]
+    return gpd.GeoDataFrame({"name": np.load(os.path.join(entry_dir, "names.npy")).astype(object)},
+                            geometry=shapely.from_wkb(blobs), crs=crs)
+
+
+class WorldGeometry:
+    """
+    Single-part country polygons with a World Bank name index.
+
+    Attributes:
+    - frame (gpd.GeoDataFrame): One row per polygon, with the Natural Earth
+      country 'name'.
+    - wb_names (pd.Index): World Bank name of each polygon's country.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.wb_names = pd.Index([NATURAL_EARTH_TO_WB.get(name, name)
+                                  for name in frame["name"]])
+        self._positions = {}
+
+    @classmethod
+    def load(cls, source=None, tolerance=0.05, cache_dir=DEFAULT_CACHE_DIR, crs=None):
+        """
+        Load the simplified geometry from the cache, building it if needed.
+
+        Parameters:
+        - source (str): Shape file to read, e.g. Natural Earth's 1:110m
+          admin 0 countries; geopandas' bundled copy if None, where the
+          installed geopandas still has it.
+        - tolerance (float): Simplification tolerance in the source units.
+        - cache_dir (str): Directory holding the cache entries.
+        - crs: Project the shapes to this CRS before caching.
+
+        Returns:
+        - WorldGeometry
+
+        Raises FileNotFoundError when no shape file is given or available.
+        """
+        source = source or natural_earth_path()
+        if source is None:
+            raise FileNotFoundError("No country shapes available: pass a shape file, e.g. "
+                                    "Natural Earth's 1:110m admin 0 countries")
+        key = f"{source_digest(source, cache_dir)}-geom-{tolerance}-{crs}"
+        entry_dir = os.path.join(cache_dir, key.replace(":", "_"))
+        if os.path.isfile(os.path.join(entry_dir, "offsets.npy")):
+            return cls(_read_geometry(entry_dir))
+
+        frame = gpd.read_file(source)
+        frame = frame[[_name_column(frame), "geometry"]].rename(
+            columns={_name_column(frame): "name"})
+        if crs is not None:
+            frame = frame.to_crs(crs)
+        frame["geometry"] = frame.geometry.simplify(tolerance, preserve_topology=True)
+        frame = frame.explode(index_parts=False).reset_index(drop=True)
+        _write_geometry(frame, entry_dir)
+        return cls(frame)
+
+    def positions(self, countries):
+        """
+        Position of each polygon's country in ``countries`` (-1 if absent).
+        Computed once per distinct country list.
+        """
+        key = tuple(countries)
+        if key not in self._positions:
+            self._positions[key] = pd.Index(countries).get_indexer(self.wb_names)
+        return self._positions[key]
+
+    def values(self, countries, country_values):
+        """
+        Spread one value per country onto the polygons (NaN where missing).
+
+        Parameters:
+        - countries (list): Country names, in the order of ``country_values``.
+        - country_values (np.ndarray): One value per country.
+
+        Returns:
+        - np.ndarray: One value per polygon.
+        """
+        pos = self.positions(countries)
+        out = np.asarray(country_values, dtype=np.float64)[pos]
+        out[pos < 0] = np.nan
+        return out
+
+    def with_values(self, column, values):
+        """Copy of the polygon frame with ``values`` in ``column``."""
+        return self.frame.assign(**{column: values})
+
+
+def render_maps(geometry, cube, indicators, years, out_dir, formats=("png",),
+                figsize=(15, 10), dpi=100, cmap="viridis"):
+    """
+    Render one choropleth per indicator and year, reusing one figure.
+
+    The polygons are drawn once; each frame only updates the colour array,
+    colour limits, colour bar and title before saving.
+
+    Parameters:
+    - geometry (WorldGeometry): Country polygons.
+    - cube (IndicatorCube): Data to map.
+    - indicators (list): Indicator names.
+    - years (list): Year labels.
+    - out_dir (str): Output directory, created if needed.
+    - formats (tuple): File formats to write.
+    - figsize (tuple): Figure size in inches.
+    - dpi (int): Resolution of raster formats.
+    - cmap (str): Colour map name.
+
+    Returns:
+    - list: Paths of the written files.
+    """
+    import matplotlib.pyplot as plt
+
+    from energy_analysis.plotting import slug
+
+    os.makedirs(out_dir, exist_ok=True)
+    fig, ax = plt.subplots(1, 1, figsize=figsize)
+    geometry.frame.boundary.plot(ax=ax, linewidth=0.3)
+    geometry.frame.plot(ax=ax, color="lightgrey")
+    polygons = ax.collections[-1]
+    colours = plt.get_cmap(cmap).copy()
+    colours.set_bad("lightgrey")
+    polygons.set_cmap(colours)
+    polygons.set_array(np.zeros(len(geometry.frame)))
+    colorbar = fig.colorbar(polygons, ax=ax)
+
+    written = []
+    for indicator in indicators:
+        matrix = cube.indicator(indicator)
+        for year in years:
+            values = geometry.values(cube.countries, matrix[:, cube.years.get_loc(year)])
+            polygons.set_array(np.ma.masked_invalid(values))
+            if np.isfinite(values).any():
+                polygons.set_clim(np.nanmin(values), np.nanmax(values))
+            colorbar.set_label(f"{indicator} - {year}")
+            colorbar.update_normal(polygons)
+            ax.set_title(f'Global {indicator} by Country - {year}')
+            for fmt in formats:
+                path = os.path.join(out_dir, f"map_{slug(indicator)}_{year}.{fmt}")
+                fig.savefig(path, dpi=dpi, bbox_inches="tight")
+                written.append(path)
+    plt.close(fig)
+    return written
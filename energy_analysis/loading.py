@@ -0,0 +1,153 @@
+"""Loading of World Bank bulk CSV files.
+
+``readFile()`` parses the whole file (through the on-disk cache). For large
+bulk files, ``read_filtered()`` reads the file in chunks instead and keeps
+only the requested indicators, countries and years, so peak memory follows
+the size of the selection rather than the size of the file.
+"""
+
+import pandas as pd
+
+from energy_analysis.cache import DEFAULT_CACHE_DIR, cached_table
+from energy_analysis.tracing import traced
+
+ID_COLUMNS = ["Country Name", "Indicator Name"]
+
+
+def _parse_csv(filename):
+    """
+    Parse the World Bank CSV into the long table used throughout the script.
+
+    Parameters:
+    - filename (str): Path to the CSV file.
+
+    Returns:
+    - pd.DataFrame: One row per country/indicator, one column per year.
+    """
+    # Load data into a Pandas DataFrame and drop the last column
+    df = pd.read_csv(filename, skiprows=4).iloc[:, :-1]
+
+    # Drop the code columns, only the names are used in the analysis
+    df.drop(["Country Code", "Indicator Code"], axis=1, inplace=True)
+
+    return df
+
+
+@traced
+def readFile(filename, use_cache=True, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Read data from a CSV file into a Pandas DataFrame, remove metadata, and
+    return two DataFrames.
+
+    The parsed table is cached on disk keyed by the file's content hash, so
+    later runs on the same file memory-map the cache instead of re-parsing.
+
+    Parameters:
+    - filename (str): Path to the CSV file.
+    - use_cache (bool): Load from / populate the on-disk cache.
+    - cache_dir (str): Directory holding the cache entries.
+
+    Returns:
+    - df and Transposed DataFrame as countries_data.
+    """
+    try:
+        if use_cache:
+            df = cached_table(filename, _parse_csv, cache_dir)
+        else:
+            df = _parse_csv(filename)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found at {filename}. Please provide a valid file path.")
+
+    # Create a dataset with countries as columns and drop unnecessary column
+    country_data = df.set_index(["Country Name", "Indicator Name"])
+
+
+    # Transpose the countries dataframe
+    country_data = country_data.T
+
+    return df, country_data
+
+
+def select_columns(filename, years=None):
+    """
+    Work out which columns of a World Bank CSV to parse.
+
+    Parameters:
+    - filename (str): Path to the CSV file.
+    - years (tuple): Optional inclusive ``(first, last)`` year range.
+
+    Returns:
+    - list: The id columns followed by the selected year columns.
+    """
+    header = pd.read_csv(filename, skiprows=4, nrows=0).columns
+    year_cols = [c for c in header if c.isdigit()]
+    if years is not None:
+        first, last = int(years[0]), int(years[1])
+        year_cols = [c for c in year_cols if first <= int(c) <= last]
+    return ID_COLUMNS + year_cols
+
+
+def iter_filtered(filename, indicators_list=None, countries=None, years=None,
+                  chunksize=20000):
+    """
+    Stream the rows of a World Bank CSV that match the given selection.
+
+    Year columns outside ``years`` are never parsed, and rows are filtered
+    chunk by chunk so at most ``chunksize`` unfiltered rows are held at once.
+
+    Parameters:
+    - filename (str): Path to the CSV file.
+    - indicators_list (list): Indicator names to keep, or None for all.
+    - countries (list): Country names to keep, or None for all.
+    - years (tuple): Optional inclusive ``(first, last)`` year range.
+    - chunksize (int): Number of CSV rows parsed per chunk.
+
+    Yields:
+    - pd.DataFrame: Matching rows of each chunk, indexed by their row
+      position in the file.
+    """
+    usecols = select_columns(filename, years)
+    dtype = {c: "float64" for c in usecols[2:]}
+    dtype.update({c: object for c in ID_COLUMNS})
+    indicators = None if indicators_list is None else set(indicators_list)
+    country_set = None if countries is None else set(countries)
+
+    reader = pd.read_csv(filename, skiprows=4, usecols=usecols, dtype=dtype,
+                         chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            mask = pd.Series(True, index=chunk.index)
+            if indicators is not None:
+                mask &= chunk["Indicator Name"].isin(indicators)
+            if country_set is not None:
+                mask &= chunk["Country Name"].isin(country_set)
+            if mask.any():
+                yield chunk.loc[mask, usecols]
+
+
+def read_filtered(filename, indicators_list=None, countries=None, years=None,
+                  chunksize=20000):
+    """
+    Load only the requested indicators, countries and years of a World Bank
+    CSV. Equivalent to ``extract_data(readFile(filename)[0], indicators_list)``
+    followed by a country filter, without holding the full file in memory.
+
+    Parameters:
+    - filename (str): Path to the CSV file.
+    - indicators_list (list): Indicator names to keep, or None for all.
+    - countries (list): Country names to keep, or None for all.
+    - years (tuple): Optional inclusive ``(first, last)`` year range.
+    - chunksize (int): Number of CSV rows parsed per chunk.
+
+    Returns:
+    - pd.DataFrame: The matching rows.
+    """
+    try:
+        chunks = list(iter_filtered(filename, indicators_list, countries, years,
+                                    chunksize))
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found at {filename}. Please provide a valid file path.")
+
+    if not chunks:
+        return pd.DataFrame(columns=select_columns(filename, years))
+    return pd.concat(chunks)
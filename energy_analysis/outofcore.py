@@ -0,0 +1,539 @@
+"""Out-of-core processing of several World Bank topic files.
+
+Each topic bulk download (energy, climate, economy, ...) is a CSV in the
+same long format. ``partition_files`` streams them chunk by chunk through
+``iter_filtered`` and scatters the rows over ``n_partitions`` partition
+directories on disk, keyed by indicator or by country, with the year
+columns aligned to the union of all files' years. No file is ever held in
+memory whole, only one chunk of it.
+
+``map_partitions`` then runs a function over the partitions in a process
+pool that only admits a partition while the estimated memory of the
+partitions in flight stays under a budget, largest partitions first.
+``process_partition`` is the standard step: it loads the partition as a
+``Block``, runs the preprocessing pipeline and streams its results to disk:
+
+- ``aggregates/``: count, sum, sum of squares, min and max of the
+  observed (not imputed) values per indicator and year, merged by
+  ``combine_aggregates``;
+- ``features/``: the country x year rows of the cluster indicator, which
+  ``cluster_features`` scales and clusters batch by batch
+  (MinMaxScaler.partial_fit, MiniBatchKMeans.partial_fit);
+- ``fits/``: a ``fit_batch`` table for every series of the partition.
+
+``run_out_of_core`` chains the steps. Run from the command line with
+``python -m energy_analysis.outofcore TOPIC.csv [TOPIC.csv ...]``.
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from energy_analysis.cache import source_digest
+from energy_analysis.loading import iter_filtered, select_columns
+from energy_analysis.preprocessing import DEFAULT_PIPELINE, STAGES, Block, run_pipeline
+from energy_analysis.tracing import traced
+
+MANIFEST_FILE = "manifest.json"
+# Directories ``process_partition`` writes its results to
+OUTPUT_KINDS = ("aggregates", "features", "fits")
+PARTITION_KEYS = {"indicator": "Indicator Name", "country": "Country Name"}
+# A partition's working set relative to its float32 values: the float64
+# copies made for fitting and the features, plus the pipeline's temporaries
+MEMORY_FACTOR = 4
+# The script's pipeline without its energy indicator selection: every topic
+# file's indicators are kept unless a selection is asked for
+PARTITION_PIPELINE = [(name, kwargs) for name, kwargs in DEFAULT_PIPELINE
+                      if name != "select_indicators"]
+
+
+def _part_dir(out_dir, part):
+    return os.path.join(out_dir, f"part-{part:04d}")
+
+
+def _is_own_entry(name):
+    """Whether a name in the output directory is one this module writes."""
+    return (name == MANIFEST_FILE or name in OUTPUT_KINDS
+            or (name.startswith("part-") and name[5:].isdigit()))
+
+
+def _clear_partitions(out_dir):
+    """
+    Remove the partitions and manifest of an earlier ``partition_files``
+    run, leaving every other file in ``out_dir`` alone. A directory that
+    has no manifest but holds anything else is refused rather than
+    overwritten.
+    """
+    if not os.path.isdir(out_dir):
+        return
+    names = os.listdir(out_dir)
+    foreign = [name for name in names if not _is_own_entry(name)]
+    if foreign and MANIFEST_FILE not in names:
+        raise FileExistsError(f"{out_dir} is not empty and holds no partitions "
+                              f"(found {', '.join(sorted(foreign)[:3])}); use a new directory")
+    for name in names:
+        if name.startswith("part-") and _is_own_entry(name):
+            shutil.rmtree(os.path.join(out_dir, name))
+    if MANIFEST_FILE in names:
+        os.remove(os.path.join(out_dir, MANIFEST_FILE))
+
+
+def _clear_outputs(out_dir):
+    """Remove the per-partition results of an earlier ``process_partition`` run."""
+    for kind in OUTPUT_KINDS:
+        for path in glob.glob(os.path.join(out_dir, kind, "part-*.*")):
+            os.remove(path)
+
+
+def partition_of(keys, n_partitions):
+    """Partition number of every key; stable across processes and runs."""
+    codes, uniques = pd.factorize(pd.Index(keys))
+    parts = np.array([zlib.crc32(key.encode()) % n_partitions for key in uniques],
+                     dtype=np.int32)
+    return parts[codes]
+
+
+def union_years(filenames, years=None):
+    """Year columns present in any of the files, in order."""
+    found = {column for filename in filenames
+             for column in select_columns(filename, years)[2:]}
+    return sorted(found, key=int)
+
+
+def read_manifest(out_dir):
+    """The manifest written by ``partition_files``, None if missing."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILE)) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+@traced
+def partition_files(filenames, out_dir, by="indicator", n_partitions=16,
+                    indicators_list=None, countries=None, years=None, chunksize=20000):
+    """
+    Scatter the rows of several World Bank CSVs over partitions on disk.
+
+    Every chunk of ``chunksize`` rows is split by partition and written as
+    one piece per partition, so memory stays at one chunk whatever the
+    total size. A partition is reused as is when a manifest for the same
+    file contents and options exists; otherwise the earlier partitions are
+    replaced. Other files in ``out_dir`` are kept, and a non-empty
+    directory without a manifest raises FileExistsError.
+
+    Parameters:
+    - filenames (list): Paths of the topic CSV files.
+    - out_dir (str): Directory for the partitions and the manifest.
+    - by (str): 'indicator' or 'country'; all rows of one key end up in the
+      same partition.
+    - n_partitions (int): Number of partitions.
+    - indicators_list, countries (list): Optional selection, as in
+      ``iter_filtered``.
+    - years (tuple): Optional inclusive ``(first, last)`` year range.
+    - chunksize (int): Number of CSV rows parsed per chunk.
+
+    Returns:
+    - dict: The manifest: options, years, and rows and bytes per partition.
+    """
+    if by not in PARTITION_KEYS:
+        raise ValueError(f"Unknown partition key {by!r}, expected one of {list(PARTITION_KEYS)}")
+    try:
+        sources = [source_digest(filename) for filename in filenames]
+    except FileNotFoundError as exc:
+        raise FileNotFoundError(f"File not found at {exc.filename}. Please provide a valid file path.")
+    options = {"sources": sources, "by": by, "n_partitions": n_partitions,
+               "indicators": indicators_list, "countries": countries,
+               "years": list(years) if years is not None else None}
+    manifest = read_manifest(out_dir)
+    if manifest is not None and manifest["options"] == options:
+        return manifest
+
+    _clear_partitions(out_dir)
+    year_cols = union_years(filenames, years)
+    rows = np.zeros(n_partitions, dtype=np.int64)
+    for f, filename in enumerate(filenames):
+        chunks = iter_filtered(filename, indicators_list, countries, years, chunksize)
+        for c, chunk in enumerate(chunks):
+            parts = partition_of(chunk[PARTITION_KEYS[by]], n_partitions)
+            values = chunk.reindex(columns=year_cols).to_numpy(dtype=np.float32)
+            for part in np.unique(parts):
+                sel = parts == part
+                os.makedirs(_part_dir(out_dir, part), exist_ok=True)
+                np.savez(os.path.join(_part_dir(out_dir, part), f"f{f:03d}-c{c:05d}.npz"),
+                         values=values[sel],
+                         countries=chunk["Country Name"].to_numpy(dtype=str)[sel],
+                         indicators=chunk["Indicator Name"].to_numpy(dtype=str)[sel])
+                rows[part] += sel.sum()
+
+    manifest = {"options": options, "files": list(filenames), "years": year_cols,
+                "rows": rows.tolist(),
+                "bytes": (rows * len(year_cols) * np.dtype(np.float32).itemsize).tolist()}
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    return manifest
+
+
+def read_partition(out_dir, part, years):
+    """
+    Load one partition as a ``Block``.
+
+    A series present in several topic files is kept once, from the first
+    file listing it.
+    """
+    pieces = []
+    for path in sorted(glob.glob(os.path.join(_part_dir(out_dir, part), "*.npz"))):
+        with np.load(path) as piece:
+            pieces.append((piece["values"], piece["countries"], piece["indicators"]))
+    if not pieces:
+        values = np.empty((0, len(years)), dtype=np.float32)
+        return Block(values, np.empty(0, np.int32), np.empty(0, np.int32), [], [], years)
+
+    values = np.concatenate([p[0] for p in pieces])
+    country_codes, country_names = pd.factorize(np.concatenate([p[1] for p in pieces]))
+    indicator_codes, indicator_names = pd.factorize(np.concatenate([p[2] for p in pieces]))
+    keys = country_codes.astype(np.int64) * len(indicator_names) + indicator_codes
+    _, first = np.unique(keys, return_index=True)
+    if len(first) < len(values):
+        keep = np.sort(first)
+        values, country_codes, indicator_codes = (
+            values[keep], country_codes[keep], indicator_codes[keep])
+    return Block(np.ascontiguousarray(values), country_codes.astype(np.int32),
+                 indicator_codes.astype(np.int32), country_names, indicator_names, years)
+
+
+@traced
+def map_partitions(func, out_dir, args=(), workers=None, memory_budget_mb=None):
+    """
+    Run ``func(out_dir, part, *args)`` for every non-empty partition with
+    bounded memory.
+
+    Partitions start largest first; a new one is only submitted while the
+    estimated memory of the running ones (``MEMORY_FACTOR`` times their
+    values) plus its own stays within ``memory_budget_mb``, so at most
+    ``workers`` run at once and fewer when they are large.
+
+    Parameters:
+    - func (callable): Picklable top-level function.
+    - out_dir (str): Directory written by ``partition_files``.
+    - args (tuple): Extra arguments for ``func``.
+    - workers (int): Process pool size; 1 runs the partitions in this process.
+    - memory_budget_mb (float): Budget for the partitions in flight, no
+      limit if None. Raises MemoryError if one partition alone exceeds it.
+
+    Returns:
+    - dict: Partition number -> ``func``'s return value.
+    """
+    manifest = read_manifest(out_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No partitions in {out_dir}, run partition_files first")
+    estimate = {part: MEMORY_FACTOR * size / 2**20
+                for part, size in enumerate(manifest["bytes"]) if manifest["rows"][part]}
+    queue = sorted(estimate, key=estimate.get, reverse=True)
+    if memory_budget_mb is not None and queue and estimate[queue[0]] > memory_budget_mb:
+        raise MemoryError(f"Partition {queue[0]} needs ~{estimate[queue[0]]:.1f} MB, "
+                          f"budget is {memory_budget_mb} MB; use more partitions")
+
+    results = {}
+    if workers == 1:
+        for part in queue:
+            results[part] = func(out_dir, part, *args)
+        return dict(sorted(results.items()))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while queue or running:
+            in_flight = sum(estimate[part] for part in running.values())
+            while queue and (not running or memory_budget_mb is None
+                             or in_flight + estimate[queue[0]] <= memory_budget_mb):
+                part = queue.pop(0)
+                running[pool.submit(func, out_dir, part, *args)] = part
+                in_flight += estimate[part]
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                results[running.pop(future)] = future.result()
+    return dict(sorted(results.items()))
+
+
+def _write_npz(out_dir, kind, part, **arrays):
+    directory = os.path.join(out_dir, kind)
+    os.makedirs(directory, exist_ok=True)
+    np.savez(os.path.join(directory, f"part-{part:04d}.npz"), **arrays)
+
+
+def process_partition(out_dir, part, pipeline=PARTITION_PIPELINE, cluster=None, fit=None):
+    """
+    Preprocess one partition and stream its aggregates, cluster features
+    and fits to disk.
+
+    Parameters:
+    - out_dir (str): Directory written by ``partition_files``.
+    - part (int): Partition number.
+    - pipeline (list): ``run_pipeline`` stages.
+    - cluster (dict): 'indicator' and optional 'first_year'/'last_year' of
+      the cluster features; none written if None.
+    - fit (dict): Optional 'model' (a ``curves.CURVES`` name, default
+      'quadratic') and 'first_year'/'last_year'; no fits if None.
+
+    Returns:
+    - dict: Rows read and kept, and seconds taken.
+    """
+    start = time.perf_counter()
+    years = pd.Index(read_manifest(out_dir)["years"])
+    block = read_partition(out_dir, part, years)
+    n_read = len(block.values)
+    # Imputing only fills gaps, so this mask recovers the raw values
+    observed = ~np.isnan(block.values)
+    block, _ = run_pipeline(block, pipeline)
+    rows = block.rows
+    values = block.values[rows]
+    codes = block.indicator_codes[rows]
+
+    # Partial aggregates per indicator and year over the observed values,
+    # merged by combine_aggregates
+    used, inverse = np.unique(codes, return_inverse=True)
+    ok = observed[rows]
+    filled = np.where(ok, values, 0).astype(np.float64)
+
+    def per_indicator(array):
+        out = np.zeros((len(used), len(years)))
+        np.add.at(out, inverse, array)
+        return out
+
+    minimum = np.full((len(used), len(years)), np.inf)
+    maximum = np.full((len(used), len(years)), -np.inf)
+    np.minimum.at(minimum, inverse, np.where(ok, values, np.inf))
+    np.maximum.at(maximum, inverse, np.where(ok, values, -np.inf))
+    _write_npz(out_dir, "aggregates", part,
+               indicators=np.asarray(block.indicators[used], dtype=str),
+               count=per_indicator(ok), sum=per_indicator(filled),
+               sumsq=per_indicator(filled ** 2), min=minimum, max=maximum)
+
+    if cluster is not None:
+        columns = _year_range(years, cluster.get("first_year"), cluster.get("last_year"))
+        code = block.indicators.get_indexer([cluster["indicator"]])[0]
+        sel = (codes == code) if code >= 0 else np.zeros(len(rows), dtype=bool)
+        features = values[sel][:, columns].astype(np.float64)
+        complete = np.isfinite(features).all(axis=1)
+        _write_npz(out_dir, "features", part,
+                   countries=np.asarray(block.countries[block.country_codes[rows][sel]],
+                                        dtype=str)[complete],
+                   values=features[complete], years=np.asarray(years[columns], dtype=str))
+
+    if fit is not None:
+        from energy_analysis.curves import CURVES
+        from energy_analysis.fitting import fit_batch
+
+        columns = _year_range(years, fit.get("first_year"), fit.get("last_year"))
+        index = pd.MultiIndex.from_arrays(
+            [block.indicators[codes], block.countries[block.country_codes[rows]]],
+            names=["Indicator Name", "Country Name"])
+        table = fit_batch(np.arange(columns.stop - columns.start, dtype=np.float64),
+                          values[:, columns], CURVES[fit.get("model", "quadratic")],
+                          index=index, workers=1)
+        os.makedirs(os.path.join(out_dir, "fits"), exist_ok=True)
+        table.to_csv(os.path.join(out_dir, "fits", f"part-{part:04d}.csv"))
+
+    return {"rows_read": n_read, "rows_kept": len(rows),
+            "seconds": time.perf_counter() - start}
+
+
+def _year_range(years, first_year=None, last_year=None):
+    """Slice of ``years`` between two inclusive year labels."""
+    start = 0 if first_year is None else years.get_loc(str(first_year))
+    stop = len(years) if last_year is None else years.get_loc(str(last_year)) + 1
+    return slice(start, stop)
+
+
+def _parts(out_dir, kind):
+    return sorted(glob.glob(os.path.join(out_dir, kind, "part-*.npz")))
+
+
+def combine_aggregates(out_dir):
+    """
+    Merge the partial aggregates of all partitions.
+
+    Returns:
+    - pd.DataFrame: count, mean, std, min and max indexed by indicator and
+      year, over every country-year value of that indicator.
+    """
+    totals = {}
+    for path in _parts(out_dir, "aggregates"):
+        with np.load(path) as part:
+            for i, indicator in enumerate(part["indicators"].tolist()):
+                stats = [part[key][i] for key in ("count", "sum", "sumsq", "min", "max")]
+                if indicator in totals:
+                    old = totals[indicator]
+                    stats = [old[0] + stats[0], old[1] + stats[1], old[2] + stats[2],
+                             np.minimum(old[3], stats[3]), np.maximum(old[4], stats[4])]
+                totals[indicator] = stats
+
+    years = read_manifest(out_dir)["years"]
+    if not totals:
+        return pd.DataFrame(columns=["count", "mean", "std", "min", "max"])
+    count, total, sumsq, minimum, maximum = (np.stack(s) for s in zip(*totals.values()))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        std = np.sqrt(np.maximum(sumsq / count - mean ** 2, 0) * count / (count - 1))
+    empty = count == 0
+    minimum[empty], maximum[empty] = np.nan, np.nan
+    index = pd.MultiIndex.from_product([list(totals), years], names=["Indicator Name", "year"])
+    return pd.DataFrame({name: array.ravel() for name, array in [
+        ("count", count.astype(np.int64)), ("mean", mean), ("std", std),
+        ("min", minimum), ("max", maximum)]}, index=index)
+
+
+def _feature_batches(out_dir, batch_rows):
+    """Feature rows of all partitions, regrouped into batches of ``batch_rows``."""
+    buffer, size = [], 0
+    for path in _parts(out_dir, "features"):
+        with np.load(path) as part:
+            values = part["values"]
+        if len(values):
+            buffer.append(values)
+            size += len(values)
+        if size >= batch_rows:
+            yield np.concatenate(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield np.concatenate(buffer)
+
+
+@traced
+def cluster_features(out_dir, n_clusters=5, batch_rows=4096, n_epochs=3, random_state=42):
+    """
+    Scale and cluster the streamed features without loading them at once.
+
+    A first pass fits the MinMaxScaler with ``partial_fit``, then
+    ``n_epochs`` passes feed the scaled batches to MiniBatchKMeans and a
+    last pass assigns every country.
+
+    Returns:
+    - The fitted scaler and k-means model, and the cluster of every
+      country as a Series.
+    """
+    from sklearn.preprocessing import MinMaxScaler
+
+    from energy_analysis.clustering import make_kmeans
+
+    scaler = MinMaxScaler()
+    n_rows = 0
+    for batch in _feature_batches(out_dir, batch_rows):
+        scaler.partial_fit(batch)
+        n_rows += len(batch)
+    if n_rows < n_clusters:
+        raise ValueError(f"{n_rows} feature rows in {out_dir}, need at least {n_clusters}")
+
+    kmeans = make_kmeans(n_clusters, "minibatch", random_state=random_state,
+                         batch_size=min(batch_rows, n_rows))
+    for _ in range(n_epochs):
+        for batch in _feature_batches(out_dir, max(batch_rows, n_clusters)):
+            kmeans.partial_fit(scaler.transform(batch))
+
+    labels = []
+    for path in _parts(out_dir, "features"):
+        with np.load(path) as part:
+            if len(part["values"]):
+                labels.append(pd.Series(kmeans.predict(scaler.transform(part["values"])),
+                                        index=part["countries"].astype(object)))
+    return scaler, kmeans, pd.concat(labels).rename("cluster")
+
+
+def read_fits(out_dir):
+    """The fit tables of all partitions as one DataFrame."""
+    paths = sorted(glob.glob(os.path.join(out_dir, "fits", "part-*.csv")))
+    return pd.concat([pd.read_csv(path, index_col=[0, 1]) for path in paths])
+
+
+@traced
+def run_out_of_core(filenames, out_dir, by="indicator", n_partitions=16,
+                    pipeline=PARTITION_PIPELINE, cluster=None, fit=None, n_clusters=5,
+                    workers=None, memory_budget_mb=None, chunksize=20000):
+    """
+    Partition the topic files, process every partition and cluster the
+    streamed features.
+
+    Parameters are those of ``partition_files``, ``process_partition``
+    and ``map_partitions``. The default pipeline keeps every indicator;
+    when ``pipeline`` has a select_indicators stage, the selection is also
+    applied while partitioning, so unused indicators never reach the disk.
+
+    Returns:
+    - dict: 'partitions' (per-partition report), 'aggregates' (from
+      ``combine_aggregates``) and, with ``cluster``, 'scaler', 'kmeans'
+      and 'labels'.
+    """
+    indicators = dict(pipeline).get("select_indicators", {}).get("indicators")
+    partition_files(filenames, out_dir, by, n_partitions, indicators, chunksize=chunksize)
+    _clear_outputs(out_dir)
+    report = map_partitions(process_partition, out_dir, (pipeline, cluster, fit),
+                            workers, memory_budget_mb)
+    result = {"partitions": pd.DataFrame.from_dict(report, orient="index"),
+              "aggregates": combine_aggregates(out_dir)}
+    if cluster is not None:
+        result["scaler"], result["kmeans"], result["labels"] = cluster_features(
+            out_dir, n_clusters)
+    return result
+
+
+def load_pipeline(path):
+    """
+    Read ``run_pipeline`` stages from a JSON file holding a list of
+    ``{"stage": name, **kwargs}`` objects, as in a driver spec.
+    """
+    with open(path) as fh:
+        entries = json.load(fh)
+    pipeline = [(entry.pop("stage"), entry) for entry in map(dict, entries)]
+    unknown = [name for name, _ in pipeline if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown pipeline stages {unknown}, expected some of {list(STAGES)}")
+    return pipeline
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Aggregate, cluster and fit several World Bank topic files out of core.")
+    parser.add_argument("files", nargs="+", help="Topic CSV files")
+    parser.add_argument("--out-dir", default="outofcore")
+    parser.add_argument("--by", choices=list(PARTITION_KEYS), default="indicator")
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--memory-mb", type=float, help="Budget for partitions in flight")
+    parser.add_argument("--cluster-indicator",
+                        default="Renewable energy consumption (% of total final energy consumption)")
+    parser.add_argument("--years", nargs=2, default=["2010", "2020"], metavar=("FIRST", "LAST"))
+    parser.add_argument("--clusters", type=int, default=5)
+    parser.add_argument("--fit-model", help="curves.CURVES model fitted to every series")
+    parser.add_argument("--indicators", nargs="+", metavar="NAME",
+                        help="Only keep these indicators (default: all)")
+    parser.add_argument("--pipeline", metavar="JSON",
+                        help="Preprocessing stages, a JSON list of {\"stage\": ..., ...}")
+    args = parser.parse_args(argv)
+
+    pipeline = load_pipeline(args.pipeline) if args.pipeline else PARTITION_PIPELINE
+    if args.indicators:
+        pipeline = [("select_indicators", {"indicators": args.indicators}),
+                    *((name, kwargs) for name, kwargs in pipeline
+                      if name != "select_indicators")]
+    span = {"first_year": args.years[0], "last_year": args.years[1]}
+    result = run_out_of_core(
+        args.files, args.out_dir, args.by, args.partitions, pipeline,
+        cluster={"indicator": args.cluster_indicator, **span},
+        fit={"model": args.fit_model, **span} if args.fit_model else None,
+        n_clusters=args.clusters, workers=args.workers, memory_budget_mb=args.memory_mb)
+    print(result["partitions"].sum().to_string())
+    print(result["aggregates"].xs(args.years[1], level="year"))
+    print(result["labels"].value_counts().sort_index())
+
+
+if __name__ == "__main__":
+    main()
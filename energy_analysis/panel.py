@@ -0,0 +1,261 @@
+"""Model selection and forecasts for a panel of yearly series.
+
+``fit_panel`` fits several model families (straight line, quadratic,
+exponential, logistic) to every series, picks each series' model by AIC or
+BIC and reports per model how many fits converged, how many function
+evaluations they needed and how long they took. ``forecast`` evaluates the
+selected models, with confidence bands, at any x points, e.g. out to 2030.
+
+Polynomial models are solved for all series at once by ``fit_batch``; the
+others go through ``curve_fit`` per series with analytic Jacobians and
+initial guesses computed for all series together, spread over a process pool.
+"""
+
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from energy_analysis.curves import CURVES
+from energy_analysis.fitting import (LINEAR_BASES, _eval_batch, _fit_series, fit_batch,
+                                     fit_table, param_names, table_bands)
+from energy_analysis.tracing import traced
+
+Model = namedtuple("Model", ["name", "func", "guess"])
+
+PanelFit = namedtuple("PanelFit", ["fits", "selection", "report"])
+
+CRITERIA = ("aic", "bic")
+
+
+def _line_stats(x, Y):
+    """Least-squares slope and intercept of every row of ``Y``, NaN-aware."""
+    ok = np.isfinite(Y)
+    n = ok.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = np.where(ok, x, 0).sum(axis=1) / n
+        y_mean = np.where(ok, Y, 0).sum(axis=1) / n
+        dx = np.where(ok, x - x_mean[:, None], 0)
+        slope = (dx * np.where(ok, Y - y_mean[:, None], 0)).sum(axis=1) / (dx**2).sum(axis=1)
+    slope = np.where(np.isfinite(slope), slope, 0.0)
+    return slope, y_mean - slope * x_mean
+
+
+def guess_exp(x, Y):
+    """Initial (a, b) from a line through log(y), for all series at once."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_y = np.log(np.where(Y > 0, Y, np.nan))
+    b, log_a = _line_stats(x, log_y)
+    # Series without positive values start from a flat line at their mean
+    _, mean = _line_stats(x, Y)
+    a = np.where(np.isfinite(log_a), np.exp(log_a), mean)
+    return np.column_stack([np.nan_to_num(a, nan=1.0), b])
+
+
+def guess_logistic(x, Y):
+    """Initial (k, r, x0): ceiling above the maximum, midpoint where the
+    series is nearest half of it and the rate from the overall slope."""
+    finite = np.isfinite(Y)
+    top = np.nanmax(np.where(finite, np.abs(Y), np.nan), axis=1, initial=0.0)
+    k = np.where(top > 0, 1.2 * top, 1.0)
+    distance = np.where(finite, np.abs(Y - k[:, None] / 2), np.inf)
+    x0 = x[np.argmin(distance, axis=1)]
+    slope, _ = _line_stats(x, Y)
+    r = np.clip(4 * slope / k, -2, 2)
+    r = np.where(r == 0, 0.1, r)
+    return np.column_stack([k, r, x0.astype(np.float64)])
+
+
+# Model families tried by fit_panel; guess is None for linear models
+_GUESSES = {"exponential": guess_exp, "logistic": guess_logistic}
+MODELS = {name: Model(name, func, _GUESSES.get(name)) for name, func in CURVES.items()}
+
+
+def _fit_chunk(name, x, Y, P0, maxfev):
+    """curve_fit every row of ``Y``; returns params, cov, nfev, converged, seconds."""
+    func = MODELS[name].func
+    p = len(param_names(func))
+    params, cov = np.full((len(Y), p), np.nan), np.full((len(Y), p, p), np.nan)
+    nfev = np.zeros(len(Y), dtype=int)
+    converged = np.zeros(len(Y), dtype=bool)
+    seconds = np.zeros(len(Y))
+    for i, (y, p0) in enumerate(zip(Y, P0)):
+        start = time.perf_counter()
+        params[i], cov[i], nfev[i], converged[i] = _fit_series(
+            func, x, y, p0, maxfev, full_output=True)
+        seconds[i] = time.perf_counter() - start
+    return params, cov, nfev, converged, seconds
+
+
+def fit_model(model, x, Y, index=None, alpha=0.05, workers=None, maxfev=2000):
+    """
+    Fit one model family to every row of ``Y``.
+
+    Returns:
+    - pd.DataFrame: ``fit_table`` columns plus nfev, converged and seconds
+      per series.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+    if model.func in LINEAR_BASES:
+        start = time.perf_counter()
+        table = fit_batch(x, Y, model.func, index=index, alpha=alpha)
+        # One least-squares solve per series
+        table["nfev"] = table["converged"].astype(int)
+        table["seconds"] = (time.perf_counter() - start) / max(len(Y), 1)
+        return table
+
+    P0 = model.guess(x, Y)
+    if workers == 1 or len(Y) < 64:
+        results = [_fit_chunk(model.name, x, Y, P0, maxfev)]
+    else:
+        chunks = np.array_split(np.arange(len(Y)), min(len(Y), 64))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_fit_chunk, repeat(model.name), repeat(x),
+                                    (Y[c] for c in chunks), (P0[c] for c in chunks),
+                                    repeat(maxfev)))
+    params, cov, nfev, converged, seconds = (np.concatenate(part) for part in zip(*results))
+    table = fit_table(x, Y, model.func, params, cov, index, alpha, converged)
+    table["nfev"] = nfev
+    table["seconds"] = seconds
+    return table
+
+
+def information_criteria(x, Y, func, params):
+    """
+    Gaussian AIC and BIC of fitted parameters, inf where a fit failed.
+
+    Counts the residual variance as a parameter; with equal n the ranking of
+    models is the same either way.
+    """
+    n = np.isfinite(Y).sum(axis=1)
+    k = len(param_names(func)) + 1
+    rss = np.nansum((Y - _eval_batch(func, x, params)) ** 2, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_lik = n * np.log(np.maximum(rss, np.finfo(np.float64).tiny) / n)
+        aic = log_lik + 2 * k
+        bic = log_lik + k * np.log(n)
+    bad = ~np.isfinite(params).all(axis=1) | (n <= k)
+    aic[bad | ~np.isfinite(aic)] = np.inf
+    bic[bad | ~np.isfinite(bic)] = np.inf
+    return aic, bic
+
+
+@traced
+def fit_panel(x, Y, models=tuple(MODELS), index=None, criterion="aic", alpha=0.05,
+              workers=None, maxfev=2000):
+    """
+    Fit every model family to every series and select one per series.
+
+    Parameters:
+    - x (np.ndarray): Shared x points, shape (n,).
+    - Y (np.ndarray): One series per row, shape (series, n), NaN for gaps.
+    - models (tuple): Names of ``MODELS`` to try.
+    - index (pd.Index): Optional labels for the rows of ``Y``.
+    - criterion (str): 'aic' or 'bic'.
+    - alpha (float): Significance level of the parameter bounds.
+    - workers (int): Process pool size for non-linear models; 1 fits in
+      this process.
+    - maxfev (int): Function evaluation limit per curve_fit call.
+
+    Returns:
+    - PanelFit: ``fits`` (model name -> fit table), ``selection`` (best
+      model and every model's AIC/BIC per series) and ``report`` (per model
+      series, fitted, converged, mean_nfev, fit_seconds and wall_seconds).
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"Unknown criterion {criterion!r}, expected one of {CRITERIA}")
+    x = np.asarray(x, dtype=np.float64)
+    Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+    index = pd.RangeIndex(len(Y)) if index is None else index
+
+    fits, scores, report = {}, {}, []
+    for name in models:
+        model = MODELS[name]
+        start = time.perf_counter()
+        table = fit_model(model, x, Y, index, alpha, workers, maxfev)
+        wall = time.perf_counter() - start
+        params = table[param_names(model.func)].to_numpy()
+        scores[f"aic_{name}"], scores[f"bic_{name}"] = information_criteria(
+            x, Y, model.func, params)
+        fits[name] = table
+        report.append({"model": name, "series": len(table),
+                       "fitted": int(np.isfinite(params).all(axis=1).sum()),
+                       "converged": int(table["converged"].sum()),
+                       "mean_nfev": table["nfev"].mean(),
+                       "fit_seconds": table["seconds"].sum(),
+                       "wall_seconds": wall})
+
+    selection = pd.DataFrame(scores, index=index)
+    ranked = selection[[f"{criterion}_{name}" for name in models]].to_numpy()
+    best = np.argmin(ranked, axis=1)
+    chosen = np.array(models, dtype=object)[best]
+    chosen[~np.isfinite(ranked[np.arange(len(ranked)), best])] = None
+    selection.insert(0, "model", chosen)
+    selection.insert(1, "n_obs", np.isfinite(Y).sum(axis=1))
+    return PanelFit(fits, selection, pd.DataFrame(report).set_index("model"))
+
+
+def forecast(panel, x_eval, columns=None, alpha=0.05, prediction=False):
+    """
+    Evaluate every series' selected model with its confidence band.
+
+    Parameters:
+    - panel (PanelFit): Output of ``fit_panel``.
+    - x_eval (np.ndarray): Points to evaluate at, on the fitted x scale.
+    - columns (list): Labels for the points (e.g. years), x_eval if None.
+    - alpha (float): Significance level of the two-sided band.
+    - prediction (bool): Prediction instead of confidence band.
+
+    Returns:
+    - Fitted values, lower and upper band as DataFrames indexed like the
+      panel, NaN for series without a usable fit.
+    """
+    x_eval = np.asarray(x_eval, dtype=np.float64)
+    selection = panel.selection
+    shape = (len(selection), len(x_eval))
+    fitted, lower, upper = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+    for name, table in panel.fits.items():
+        rows = np.flatnonzero((selection["model"] == name).to_numpy())
+        if len(rows):
+            fitted[rows], lower[rows], upper[rows] = table_bands(
+                table.iloc[rows], MODELS[name].func, x_eval, alpha, prediction)
+    columns = list(x_eval) if columns is None else list(columns)
+    return tuple(pd.DataFrame(values, index=selection.index, columns=columns)
+                 for values in (fitted, lower, upper))
+
+
+def fit_cube_panel(cube, first_year=None, last_year=None, horizon=2030,
+                   indicators=None, countries=None, **kwargs):
+    """
+    ``fit_panel`` over the indicator x country series of a cube, and
+    forecasts from the first fitted year out to ``horizon``.
+
+    x is the number of years since ``first_year``, so parameters read as
+    in the script's curve-fitting section.
+
+    Parameters:
+    - cube (IndicatorCube): Data to fit.
+    - first_year, last_year (str): Inclusive year range, None for all.
+    - horizon (int): Last forecast year.
+    - indicators, countries (list): Optional subsets of the cube.
+    - **kwargs: Passed on to ``fit_panel``.
+
+    Returns:
+    - PanelFit and the (fitted, lower, upper) forecast DataFrames, one
+      column per year.
+    """
+    if indicators is not None or countries is not None:
+        cube = cube.select(indicators, countries)
+    years = cube.year_slice(first_year, last_year)
+    year_numbers = cube.years[years].astype(int)
+    Y = cube.values[:, :, years].reshape(-1, len(year_numbers))
+    index = pd.MultiIndex.from_product([cube.indicators, cube.countries])
+    panel = fit_panel(year_numbers - year_numbers[0], Y, index=index, **kwargs)
+    eval_years = np.arange(year_numbers[0], max(horizon, year_numbers[-1]) + 1)
+    bands = forecast(panel, eval_years - year_numbers[0], [str(y) for y in eval_years],
+                     kwargs.get("alpha", 0.05))
+    return panel, bands
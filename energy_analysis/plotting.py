@@ -0,0 +1,304 @@
+"""Chart functions and a headless batch renderer.
+
+Each chart of the analysis is a function that takes its data and labels and
+returns a new matplotlib Figure, so a chart can be described as a
+``RenderJob`` (name, chart function name, keyword arguments) and drawn either
+interactively or by ``render_jobs`` on the Agg backend in a process pool.
+Rendered files are recorded in a manifest with the hash of their inputs, and
+jobs whose inputs have not changed since the last run are skipped.
+
+matplotlib is only imported when a chart is drawn.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from energy_analysis.tracing import traced
+
+MANIFEST_FILE = "manifest.json"
+
+RenderJob = namedtuple("RenderJob", ["name", "chart", "kwargs"])
+
+
+def line_chart(x, lines, xlabel, ylabel, title, figsize=(14, 5),
+               title_fontsize=None, xtick_step=None, legend_kwargs=None,
+               **plot_kwargs):
+    """
+    Line chart with one line per entry of ``lines``.
+
+    Parameters:
+    - x (list): x labels shared by all lines (e.g. years).
+    - lines (dict): Line label -> y values; use None as the label for an
+      unlabelled line.
+    - xlabel, ylabel, title (str): Axis labels and title.
+    - figsize (tuple): Figure size in inches, None for the default.
+    - title_fontsize (int): Title font size.
+    - xtick_step (int): Label only every n-th x value.
+    - legend_kwargs (dict): Draw a legend with these options.
+    - **plot_kwargs: Passed to ``Axes.plot`` (marker, color, ...).
+
+    Returns:
+    - matplotlib.figure.Figure
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=figsize)
+    for label, y in lines.items():
+        ax.plot(list(x), np.asarray(y), label=label, **plot_kwargs)
+    if xtick_step:
+        ax.set_xticks(np.arange(0, len(x), xtick_step), labels=list(x)[::xtick_step])
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title, fontsize=title_fontsize)
+    if legend_kwargs is not None:
+        ax.legend(**legend_kwargs)
+    return fig
+
+
+def bar_chart(labels, values, xlabel, ylabel, title, figsize=(13, 8),
+              color=None, horizontal=False):
+    """
+    Vertical (or horizontal) bar chart of ``values`` per label.
+
+    Returns:
+    - matplotlib.figure.Figure
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=figsize)
+    draw = ax.barh if horizontal else ax.bar
+    draw(list(labels), np.asarray(values), color=color)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    return fig
+
+
+def pie_chart(sizes, labels, title, figsize=(10, 8), colors=None):
+    """
+    Pie chart with percentage labels.
+
+    Returns:
+    - matplotlib.figure.Figure
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.pie(np.asarray(sizes), labels=list(labels), autopct='%1.1f%%',
+           startangle=140, colors=colors)
+    ax.set_title(title)
+    return fig
+
+
+def choropleth(world, column, title, legend_label, figsize=(15, 10)):
+    """
+    World map coloured by ``column`` of a GeoDataFrame, with boundaries.
+
+    Returns:
+    - matplotlib.figure.Figure
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(1, 1, figsize=figsize)
+    world.boundary.plot(ax=ax)
+    world.plot(column=column, ax=ax, legend=True, legend_kwds={'label': legend_label})
+    ax.set_title(title)
+    return fig
+
+
+def cluster_scatter(points, labels, centers, title, xlabel, ylabel,
+                    markers=('o', 's', '^', 'D', 'v')):
+    """
+    Scatter of the first two columns of ``points`` by cluster, with the
+    cluster centres marked.
+
+    Returns:
+    - matplotlib.figure.Figure
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    labels = np.asarray(labels)
+    for i in range(labels.max() + 1):
+        cluster_data = points[labels == i]
+        ax.scatter(cluster_data[:, 0], cluster_data[:, 1], label=f'Cluster {i + 1}',
+                   marker=markers[i % len(markers)])
+    ax.scatter(centers[:, 0], centers[:, 1], s=300, c='red', marker='X')
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.legend(title='Clusters')
+    return fig
+
+
+def fit_chart(x, y, x_fit, y_fit, lower, upper, title, xlabel, ylabel):
+    """
+    Data points with a fitted curve and its confidence band.
+
+    Returns:
+    - matplotlib.figure.Figure
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ax.scatter(x, y, label='Data')
+    ax.plot(x_fit, y_fit, color='red', label='Fitted Curve')
+    ax.fill_between(x_fit, lower, upper, color='orange', alpha=0.3,
+                    label='Confidence Range')
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.legend()
+    return fig
+
+
+@traced
+def map_corr(df, size=6, method='pearson', engine=None):
+    """Function creates a heatmap of the correlation matrix for each pair of
+    columns in the DataFrame.
+
+    Input:
+        df: pandas DataFrame
+        size: vertical and horizontal size of the plot (in inch)
+        method: 'pearson' or 'spearman'
+        engine: CorrelationEngine caching the matrices, the shared
+            ``correlation.ENGINE`` by default
+
+    The matrix comes from the correlation cache, so drawing the same data
+    again does not recompute it. The function does not have a plt.show() at
+    the end so that the user can save the figure.
+    """
+    import matplotlib.pyplot as plt
+    from energy_analysis.correlation import ENGINE
+
+    corr = (engine or ENGINE).corr(df, method)
+    fig = plt.figure(figsize=(size, size))
+    plt.matshow(corr, fignum=fig.number, cmap='coolwarm', aspect='auto')
+
+    # setting ticks to column names
+    plt.xticks(range(len(corr.columns)), corr.columns, rotation=90)
+    plt.yticks(range(len(corr.columns)), corr.columns)
+
+    plt.colorbar()
+
+
+CHARTS = {chart.__name__: chart for chart in (
+    line_chart, bar_chart, pie_chart, choropleth, cluster_scatter, fit_chart)}
+
+
+def draw(job):
+    """Draw a ``RenderJob`` on the current backend and return its Figure."""
+    return CHARTS[job.chart](**job.kwargs)
+
+
+def job_hash(job):
+    """SHA-1 of a job's chart name and inputs."""
+    return hashlib.sha1(pickle.dumps((job.chart, job.kwargs), protocol=4)).hexdigest()
+
+
+def _init_worker():
+    import matplotlib.pyplot as plt
+    plt.switch_backend("Agg")
+
+
+def _render_one(job, out_dir, formats, dpi):
+    import matplotlib.pyplot as plt
+    fig = draw(job)
+    for fmt in formats:
+        fig.savefig(os.path.join(out_dir, f"{job.name}.{fmt}"), dpi=dpi,
+                    bbox_inches="tight")
+    plt.close(fig)
+    return job.name
+
+
+@traced
+def render_jobs(jobs, out_dir, formats=("png",), workers=None, dpi=100):
+    """
+    Render jobs to ``out_dir`` on the Agg backend, skipping unchanged ones.
+
+    Parameters:
+    - jobs (list): ``RenderJob`` instances with unique names.
+    - out_dir (str): Output directory, created if needed.
+    - formats (tuple): File formats to write, e.g. ('png', 'svg').
+    - workers (int): Process pool size; 1 renders in this process.
+    - dpi (int): Resolution of raster formats.
+
+    Returns:
+    - dict: Job name -> 'rendered' or 'unchanged'.
+    """
+    import matplotlib.pyplot as plt
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_path) as fh:
+            manifest = json.load(fh)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+
+    hashes = {job.name: job_hash(job) for job in jobs}
+    pending = [job for job in jobs
+               if manifest.get(job.name) != hashes[job.name]
+               or not all(os.path.exists(os.path.join(out_dir, f"{job.name}.{fmt}"))
+                          for fmt in formats)]
+
+    if workers == 1 or len(pending) < 2:
+        backend = plt.get_backend()
+        plt.switch_backend("Agg")
+        try:
+            done = [_render_one(job, out_dir, formats, dpi) for job in pending]
+        finally:
+            plt.switch_backend(backend)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            done = list(pool.map(_render_one, pending, repeat(out_dir),
+                                 repeat(formats), repeat(dpi)))
+
+    for name in done:
+        manifest[name] = hashes[name]
+    with open(manifest_path, "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+
+    rendered = set(done)
+    return {job.name: "rendered" if job.name in rendered else "unchanged" for job in jobs}
+
+
+def slug(text):
+    """File-name friendly form of an indicator or country name."""
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def series_jobs(cube, indicators=None, countries=None, first_year=None,
+                last_year=None):
+    """
+    One line chart job per indicator x country series of a cube.
+
+    Parameters:
+    - cube (IndicatorCube): Data to chart.
+    - indicators, countries (list): Optional subsets of the cube.
+    - first_year, last_year (str): Inclusive year range, None for all.
+
+    Returns:
+    - list: ``RenderJob`` instances named '<indicator>__<country>' (both
+      reduced to lowercase letters, digits and underscores).
+    """
+    if indicators is not None or countries is not None:
+        cube = cube.select(indicators, countries)
+    years = cube.year_slice(first_year, last_year)
+    x = list(cube.years[years])
+    jobs = []
+    for i, indicator in enumerate(cube.indicators):
+        for c, country in enumerate(cube.countries):
+            jobs.append(RenderJob(f"{slug(indicator)}__{slug(country)}", "line_chart", dict(
+                x=x, lines={None: cube.values[i, c, years]}, xlabel='Year',
+                ylabel=indicator, title=f'{country}: {indicator}',
+                xtick_step=5)))
+    return jobs
@@ -0,0 +1,395 @@
+"""Indicator selection and cleaning of the long World Bank table.
+
+Besides the DataFrame helpers used by the script, this module has a
+declarative pipeline over a ``Block``: the year values as one float32 array
+with integer country/indicator codes. Stages narrow a row mask or edit the
+array in place, and ``run_pipeline`` reports each stage's time and peak
+allocation. Missing years are interpolated per series by
+``interpolate_years``, which works on an array of any shape (a block's rows or
+a whole indicator x country x year cube) in one vectorized pass.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from energy_analysis.tracing import traced
+
+# Rows converted or imputed per step, so temporaries stay a few MB
+CHUNK_ROWS = 4096
+
+#define the list of indicators relevant to the analysis
+indicators_list = [
+
+    'Electricity production from coal sources (% of total)',
+    'Electricity production from oil sources (% of total)',
+    'Electricity production from natural gas sources (% of total)',
+    'Electricity production from nuclear sources (% of total)',
+    'Electricity production from hydroelectric sources (% of total)',
+    'Electricity production from renewable sources, excluding hydroelectric (% of total)',
+    'Electric power consumption (kWh per capita)',
+    'CO2 emissions (kt)',
+    'Total greenhouse gas emissions (kt of CO2 equivalent)',
+    'Access to electricity (% of population)',
+    'Renewable energy consumption (% of total final energy consumption)',
+    'Renewable electricity output (% of total electricity output)',
+]
+
+
+#To describe data and dipslay statistics
+def describe_Data(df):
+
+    df.head()
+    df.info()
+    df.columns
+    df.describe()
+
+    #Display categorical features
+    categorical_features = (df.select_dtypes(include=['object']).columns.values)
+    categorical_features
+
+    #Display numerical features
+    numerical_features = df.select_dtypes(include = ['float64', 'int64']).columns.values
+    numerical_features
+
+
+# Extracting data for relevant indicators
+@traced
+def extract_data(df, indicators_list):
+    """
+    Extract data from a DataFrame based on a list of relevant indicators.
+
+    Parameters:
+    - df (pd.DataFrame): Input DataFrame containing the data.
+    - indicator_list (list): List of indicator names to extract.
+
+    Returns:
+    - pd.DataFrame: DataFrame with data only for the specified indicators.
+
+    """
+    filtered_df = df[df["Indicator Name"].isin(indicators_list)]
+
+    return filtered_df
+
+
+# Handle missing values (Replace missing values with 0 )
+@traced
+def preprocess(df):
+
+    df.fillna(0, inplace=True)
+
+    return df
+
+
+# Dropping all world records
+@traced
+def drop_world(df):
+
+    index = df[df["Country Name"] == "World"].index
+    df.drop(index, axis=0, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    return df
+
+
+def _factorize_chunks(names):
+    """
+    ``pd.factorize`` of a (memory-mapped) array of names, ``CHUNK_ROWS`` at
+    a time, so only one chunk of it is ever converted to Python strings.
+    """
+    codes = np.empty(len(names), dtype=np.int32)
+    seen = {}
+    for start in range(0, len(names), CHUNK_ROWS):
+        chunk_codes, uniques = pd.factorize(names[start:start + CHUNK_ROWS])
+        lookup = np.array([seen.setdefault(name, len(seen)) for name in uniques],
+                          dtype=np.int32)
+        codes[start:start + CHUNK_ROWS] = lookup[chunk_codes]
+    return codes, pd.Index(list(seen))
+
+
+class Block:
+    """
+    The long World Bank table as one float32 array plus integer codes.
+
+    Rows are never removed while the pipeline runs: filters only narrow
+    ``mask`` and value stages work in place, so no stage copies the table.
+
+    Attributes:
+    - values (np.ndarray): float32 array of shape (rows, years).
+    - country_codes, indicator_codes (np.ndarray): int32 code of each row.
+    - countries, indicators (pd.Index): Names behind the codes.
+    - years (pd.Index): Year column labels.
+    - mask (np.ndarray): Rows still selected.
+    """
+
+    def __init__(self, values, country_codes, indicator_codes, countries,
+                 indicators, years, mask=None):
+        self.values = values
+        self.country_codes = country_codes
+        self.indicator_codes = indicator_codes
+        self.countries = pd.Index(countries)
+        self.indicators = pd.Index(indicators)
+        self.years = pd.Index(years)
+        self.mask = np.ones(len(values), dtype=bool) if mask is None else mask
+
+    @classmethod
+    def from_frame(cls, df, dtype=np.float32):
+        """
+        Build a block from a long table as returned by ``readFile()``. The
+        year columns are cast one by one into a preallocated array of
+        ``dtype``, without a full-width float64 copy of the table.
+        """
+        country_codes, countries = pd.factorize(df["Country Name"])
+        indicator_codes, indicators = pd.factorize(df["Indicator Name"])
+        years = [c for c in df.columns if c not in ("Country Name", "Indicator Name")]
+        values = np.empty((len(df), len(years)), dtype=dtype)
+        for j, year in enumerate(years):
+            values[:, j] = df[year].to_numpy()
+        return cls(values, country_codes.astype(np.int32),
+                   indicator_codes.astype(np.int32), countries, indicators, years)
+
+    @classmethod
+    def from_cache(cls, entry_dir, dtype=np.float32, memory_budget_mb=None):
+        """
+        Build a block from a ``cache.write_table`` entry. The float64 values
+        are memory-mapped and cast ``CHUNK_ROWS`` rows at a time into a
+        preallocated array of ``dtype``, so no DataFrame is built.
+        """
+        source = np.load(os.path.join(entry_dir, "values.npy"), mmap_mode="r")
+        estimate = source.shape[0] * source.shape[1] * np.dtype(dtype).itemsize / 2**20
+        if memory_budget_mb is not None and estimate > memory_budget_mb:
+            raise MemoryError(f"{entry_dir} needs ~{estimate:.0f} MB as a block, "
+                              f"budget is {memory_budget_mb} MB")
+        values = np.empty(source.shape, dtype=dtype)
+        for start in range(0, len(source), CHUNK_ROWS):
+            values[start:start + CHUNK_ROWS] = source[start:start + CHUNK_ROWS]
+        country_codes, countries = _factorize_chunks(
+            np.load(os.path.join(entry_dir, "countries.npy"), mmap_mode="r"))
+        indicator_codes, indicators = _factorize_chunks(
+            np.load(os.path.join(entry_dir, "indicators.npy"), mmap_mode="r"))
+        years = np.load(os.path.join(entry_dir, "years.npy")).tolist()
+        return cls(values, country_codes, indicator_codes, countries, indicators, years)
+
+    @property
+    def rows(self):
+        """Positions of the selected rows."""
+        return np.flatnonzero(self.mask)
+
+    @property
+    def nbytes(self):
+        return (self.values.nbytes + self.country_codes.nbytes
+                + self.indicator_codes.nbytes + self.mask.nbytes)
+
+    def to_frame(self):
+        """
+        The selected rows as a long DataFrame (a copy of the selection only).
+        """
+        rows = self.rows
+        df = pd.DataFrame(self.values[rows], columns=self.years)
+        df.insert(0, "Indicator Name", self.indicators[self.indicator_codes[rows]])
+        df.insert(0, "Country Name", self.countries[self.country_codes[rows]])
+        return df
+
+
+@traced
+def read_block(filename, use_cache=True, memory_budget_mb=None,
+               cache_dir=None):
+    """
+    Load a World Bank CSV as a float32 ``Block``.
+
+    With the cache, the block is filled straight from the memory-mapped
+    cache entry (see ``Block.from_cache``); without it, from the parsed
+    table column by column.
+
+    Parameters:
+    - filename (str): Path to the CSV file.
+    - use_cache (bool): Go through the ``readFile()`` cache.
+    - memory_budget_mb (float): Raise MemoryError if the block would be
+      larger than this.
+    - cache_dir (str): Cache directory, None for readFile()'s default.
+
+    Returns:
+    - Block
+    """
+    from energy_analysis.cache import DEFAULT_CACHE_DIR, cached_entry
+    from energy_analysis.loading import _parse_csv
+
+    try:
+        if use_cache:
+            entry_dir = cached_entry(filename, _parse_csv, cache_dir or DEFAULT_CACHE_DIR)
+            return Block.from_cache(entry_dir, memory_budget_mb=memory_budget_mb)
+        df = _parse_csv(filename)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found at {filename}. Please provide a valid file path.")
+    estimate = len(df) * (df.shape[1] - 2) * np.dtype(np.float32).itemsize / 2**20
+    if memory_budget_mb is not None and estimate > memory_budget_mb:
+        raise MemoryError(f"{filename} needs ~{estimate:.0f} MB as a block, "
+                          f"budget is {memory_budget_mb} MB")
+    return Block.from_frame(df)
+
+
+def select_indicators(block, indicators):
+    """Keep only rows of the given indicators."""
+    block.mask &= np.isin(block.indicator_codes, block.indicators.get_indexer(indicators))
+    return block
+
+
+def select_countries(block, countries):
+    """Keep only rows of the given countries."""
+    block.mask &= np.isin(block.country_codes, block.countries.get_indexer(countries))
+    return block
+
+
+def drop_countries(block, countries):
+    """Drop the rows of the given countries (e.g. the 'World' aggregate)."""
+    block.mask &= ~np.isin(block.country_codes, block.countries.get_indexer(countries))
+    return block
+
+
+def fill_missing(block, value=0):
+    """Replace missing values in place, as ``preprocess()`` does."""
+    np.copyto(block.values, value, where=np.isnan(block.values))
+    return block
+
+
+def interpolate_years(values, method="linear", edges="keep", inplace=False):
+    """
+    Fill missing values along the last (year) axis of an array of any shape,
+    for every series at once.
+
+    Parameters:
+    - values (np.ndarray): Float array, e.g. (rows, years) or
+      (indicators, countries, years).
+    - method (str): 'linear' interpolates between the surrounding observed
+      years; 'ffill' carries the last observation forward.
+    - edges (str): 'keep' leaves gaps before the first (and, for
+      'linear', after the last) observation NaN, since nothing bounds
+      them; 'nearest' fills them with the nearest observation, which
+      turns a single observation into a constant series.
+    - inplace (bool): Write into ``values`` instead of a new array.
+
+    Returns:
+    - The filled array, and a boolean mask (shape ``values.shape[:-1]``) of
+      series without a single observation, which stay all-NaN.
+    """
+    if method not in ("linear", "ffill") or edges not in ("nearest", "keep"):
+        raise ValueError(f"Unknown imputation method={method!r} / edges={edges!r}")
+
+    n_years = values.shape[-1]
+    flat = values.reshape(-1, n_years)
+    valid = ~np.isnan(flat)
+
+    # Position of the previous and next observation of every cell
+    pos = np.arange(n_years, dtype=np.int16)
+    prev = np.maximum.accumulate(np.where(valid, pos, -1), axis=1)
+    nxt = np.minimum.accumulate(np.where(valid, pos, n_years)[:, ::-1], axis=1)[:, ::-1]
+    has_prev, has_next = prev >= 0, nxt < n_years
+
+    rows = np.arange(len(flat))[:, None]
+    prev_val = flat[rows, np.maximum(prev, 0)]
+    next_val = flat[rows, np.minimum(nxt, n_years - 1)]
+
+    out = flat if inplace else flat.copy()
+    if method == "linear":
+        gap = ~valid & has_prev & has_next
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = (pos - prev) / (nxt - prev).astype(flat.dtype)
+        out[gap] = (prev_val + (next_val - prev_val) * weight)[gap]
+    trailing = ~valid & has_prev & ~has_next
+    if method == "ffill":
+        trailing = ~valid & has_prev
+    if method == "ffill" or edges == "nearest":
+        out[trailing] = prev_val[trailing]
+    if edges == "nearest":
+        leading = ~valid & ~has_prev & has_next
+        out[leading] = next_val[leading]
+
+    empty = ~valid.any(axis=1)
+    return out.reshape(values.shape), empty.reshape(values.shape[:-1])
+
+
+def impute(block, method="linear", edges="keep"):
+    """
+    Fill gaps of the selected rows along the year axis, see
+    ``interpolate_years``.
+
+    Rows are processed ``CHUNK_ROWS`` at a time; a chunk of consecutive rows
+    is filled in place through a slice view, any other chunk is gathered,
+    filled and scattered back.
+    """
+    rows = block.rows
+    for start in range(0, len(rows), CHUNK_ROWS):
+        chunk = rows[start:start + CHUNK_ROWS]
+        first, last = chunk[0], chunk[-1]
+        if last - first + 1 == len(chunk):
+            interpolate_years(block.values[first:last + 1], method, edges, inplace=True)
+        else:
+            block.values[chunk] = interpolate_years(block.values[chunk], method, edges,
+                                                    inplace=True)[0]
+    return block
+
+
+def drop_empty(block):
+    """Drop selected rows that have no observation in any year."""
+    rows = block.rows
+    for start in range(0, len(rows), CHUNK_ROWS):
+        chunk = rows[start:start + CHUNK_ROWS]
+        block.mask[chunk[np.isnan(block.values[chunk]).all(axis=1)]] = False
+    return block
+
+
+STAGES = {stage.__name__: stage for stage in (
+    select_indicators, select_countries, drop_countries, fill_missing, impute,
+    drop_empty)}
+
+# The script's indicator selection, with gaps between observed years
+# interpolated rather than filled with 0, and series without any data
+# dropped. Years before the first and after the last observation stay NaN.
+DEFAULT_PIPELINE = [
+    ("select_indicators", {"indicators": indicators_list}),
+    ("drop_empty", {}),
+    ("impute", {"method": "linear", "edges": "keep"}),
+]
+
+
+@traced
+def run_pipeline(block, stages=DEFAULT_PIPELINE, memory_budget_mb=None):
+    """
+    Run preprocessing stages over a block and measure each of them.
+
+    Parameters:
+    - block (Block): Data to process (modified in place).
+    - stages (list): (stage name, keyword arguments) pairs, see ``STAGES``.
+    - memory_budget_mb (float): Raise MemoryError if the block plus a
+      stage's peak allocation exceeds this.
+
+    Returns:
+    - The processed block and a DataFrame with the seconds, peak allocation
+      (MB) and selected row count of every stage.
+    """
+    import time
+    import tracemalloc
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    report = []
+    try:
+        for name, kwargs in stages:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            block = STAGES[name](block, **kwargs)
+            seconds = time.perf_counter() - start
+            peak_mb = (tracemalloc.get_traced_memory()[1] - base) / 2**20
+            report.append((name, seconds, peak_mb, int(block.mask.sum())))
+            if (memory_budget_mb is not None
+                    and block.nbytes / 2**20 + peak_mb > memory_budget_mb):
+                raise MemoryError(f"Stage {name!r} peaked at {peak_mb:.1f} MB on top of "
+                                  f"a {block.nbytes / 2**20:.1f} MB block, "
+                                  f"budget is {memory_budget_mb} MB")
+    finally:
+        if started:
+            tracemalloc.stop()
+    return block, pd.DataFrame(report, columns=["stage", "seconds", "peak_mb", "rows"])
@@ -0,0 +1,167 @@
+"""Linear projection of scaled features between MinMaxScaler and k-means.
+
+Clustering countries on many indicator x year columns makes every k-means
+iteration cost O(n k d). ``fit_projection`` finds the principal components
+of the scaled rows and keeps the fewest that explain a given share of the
+variance, so ``sweep_k`` runs on a handful of columns instead. Three
+solvers are available:
+
+- 'pca': exact SVD of the centred data, for inputs that fit in memory;
+- 'randomized': randomized SVD, for wide inputs of which only a few
+  components are kept;
+- 'incremental': IncrementalPCA fed batch by batch, for inputs too large
+  for one SVD (e.g. a memory-mapped array).
+
+'auto' picks one by input size. A fitted ``Projection`` is plain NumPy
+(mean and components), so it can be stored next to the cluster centres.
+``plot_projection`` gives the first two components as a 2-D view for the
+cluster scatter, with axis labels stating the variance they explain.
+
+sklearn is imported on first use, so importing this module stays cheap.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from energy_analysis.tracing import traced
+
+METHODS = ("auto", "pca", "randomized", "incremental")
+# Input sizes (rows x columns) up to which 'auto' uses the exact SVD, and
+# from which it switches to IncrementalPCA
+AUTO_EXACT_CELLS = 2_000_000
+AUTO_INCREMENTAL_CELLS = 50_000_000
+
+
+class Projection(namedtuple("Projection", ["mean", "components",
+                                           "explained_variance_ratio", "method"])):
+    """
+    Fitted projection ``(X - mean) @ components.T``.
+
+    Attributes:
+    - mean (np.ndarray): Column means of the fitted data, shape (d,).
+    - components (np.ndarray): Orthonormal components, shape (p, d).
+    - explained_variance_ratio (np.ndarray): Share of the total variance
+      explained by each component, shape (p,).
+    - method (str): Solver that fitted it.
+    """
+
+    __slots__ = ()
+
+    @property
+    def n_components(self):
+        return len(self.components)
+
+    def transform(self, X):
+        """Project rows of the scaled space, shape (n, d) -> (n, p)."""
+        return (np.asarray(X, dtype=np.float64) - self.mean) @ self.components.T
+
+    def inverse_transform(self, Z):
+        """Map projected rows back to the scaled space."""
+        return np.asarray(Z, dtype=np.float64) @ self.components + self.mean
+
+    def head(self, n_components):
+        """The first ``n_components`` components only."""
+        return self._replace(components=self.components[:n_components],
+                             explained_variance_ratio=self.explained_variance_ratio[:n_components])
+
+    def report(self):
+        """Explained and cumulative variance ratio per component."""
+        ratio = self.explained_variance_ratio
+        index = pd.Index([f"PC{i + 1}" for i in range(len(ratio))], name="component")
+        return pd.DataFrame({"explained_variance_ratio": ratio,
+                             "cumulative": np.cumsum(ratio)}, index=index)
+
+    def axis_labels(self):
+        """'PC1 (62% of variance)'-style label per component."""
+        return [f"PC{i + 1} ({ratio:.0%} of variance)"
+                for i, ratio in enumerate(self.explained_variance_ratio)]
+
+
+def choose_method(n_rows, n_columns, n_components=None):
+    """The solver 'auto' uses for an input of this size."""
+    cells = n_rows * n_columns
+    if cells >= AUTO_INCREMENTAL_CELLS:
+        return "incremental"
+    if cells > AUTO_EXACT_CELLS or (n_components is not None
+                                    and n_components < min(n_rows, n_columns) // 4):
+        return "randomized"
+    return "pca"
+
+
+def _fit_incremental(data, n_components, batch_size):
+    """IncrementalPCA over row slices, so only one batch is ever copied."""
+    from sklearn.decomposition import IncrementalPCA
+
+    model = IncrementalPCA(n_components=n_components, batch_size=batch_size)
+    bounds = list(range(0, len(data), batch_size)) + [len(data)]
+    # Every batch needs at least n_components rows: fold a short last batch
+    # into the one before it
+    if len(bounds) > 2 and bounds[-1] - bounds[-2] < n_components:
+        del bounds[-2]
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        model.partial_fit(np.asarray(data[start:stop], dtype=np.float64))
+    return model
+
+
+@traced
+def fit_projection(data, n_components=None, variance=0.9, method="auto",
+                   max_components=50, batch_size=None, random_state=42):
+    """
+    Fit a principal component projection of scaled rows.
+
+    Parameters:
+    - data (np.ndarray): Scaled samples, shape (n, d); may be memory-mapped.
+    - n_components (int): Components to keep; None keeps the fewest that
+      explain ``variance``.
+    - variance (float): Share of the total variance to explain when
+      ``n_components`` is None.
+    - method (str): One of ``METHODS``.
+    - max_components (int): Components the randomized and incremental
+      solvers compute when choosing by ``variance``.
+    - batch_size (int): Rows per IncrementalPCA batch, 5 * d if None.
+    - random_state (int): Seed of the randomized solver.
+
+    Returns:
+    - Projection
+    """
+    from sklearn.decomposition import PCA
+
+    n_rows, n_columns = data.shape
+    limit = min(n_rows, n_columns)
+    if method == "auto":
+        method = choose_method(n_rows, n_columns, n_components)
+    if method not in METHODS:
+        raise ValueError(f"Unknown projection method {method!r}, expected one of {METHODS}")
+
+    fit_components = min(limit, n_components or max_components)
+    if method == "pca":
+        model = PCA(svd_solver="full").fit(np.asarray(data, dtype=np.float64))
+    elif method == "randomized":
+        model = PCA(n_components=fit_components, svd_solver="randomized",
+                    random_state=random_state).fit(np.asarray(data, dtype=np.float64))
+    else:
+        batch_size = max(batch_size or 5 * n_columns, fit_components)
+        model = _fit_incremental(data, fit_components, batch_size)
+
+    ratio = model.explained_variance_ratio_
+    if n_components is None:
+        n_components = int(np.searchsorted(np.cumsum(ratio), variance)) + 1
+    n_components = max(1, min(n_components, len(ratio)))
+    return Projection(model.mean_, model.components_[:n_components],
+                      ratio[:n_components], method)
+
+
+def plot_projection(data, projection=None):
+    """
+    The 2-D view for a cluster scatter: the first two components of
+    ``projection`` when it has them, otherwise of an exact PCA of ``data``.
+
+    Returns:
+    - Projection with two components; map centres found in another space
+      to it with ``transform`` (scaled space) or via ``inverse_transform``.
+    """
+    if projection is None or projection.n_components < 2:
+        projection = fit_projection(data, n_components=2, method="pca")
+    return projection.head(2)
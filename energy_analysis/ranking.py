@@ -0,0 +1,91 @@
+"""Top-N / bottom-N country rankings for every indicator and year.
+
+``Rankings`` partitions the whole cube along the country axis once with
+``np.argpartition`` and keeps the sorted positions of the N highest and N
+lowest countries for every indicator and year. Lookups afterwards are plain
+array indexing, with no filtering or sorting of DataFrames.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _extreme_positions(values, n):
+    """Positions of the n largest entries along axis 1, largest first."""
+    k = min(n, values.shape[1])
+    part = np.argpartition(-values, k - 1, axis=1)[:, :k, :]
+    order = np.argsort(-np.take_along_axis(values, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+class Rankings:
+    """
+    Precomputed country rankings of an ``IndicatorCube``.
+
+    Missing values are never ranked, so a lookup may return fewer than
+    ``n`` countries.
+
+    Attributes:
+    - cube (IndicatorCube): The ranked data.
+    - n (int): Largest ranking length available.
+    """
+
+    def __init__(self, cube, n=10):
+        self.cube = cube
+        self.n = n
+        missing = np.isnan(cube.values)
+        self._top = _extreme_positions(np.where(missing, -np.inf, cube.values), n)
+        self._bottom = _extreme_positions(np.where(missing, -np.inf, -cube.values), n)
+
+    def _lookup(self, positions, indicator, year, n):
+        if n is None:
+            n = self.n
+        elif n > self.n:
+            raise ValueError(f"Rankings were computed for n <= {self.n}, got {n}")
+        i = self.cube.indicators.get_loc(indicator)
+        y = self.cube.years.get_loc(year)
+        idx = positions[i, :n, y]
+        values = self.cube.values[i, idx, y]
+        keep = ~np.isnan(values)
+        return pd.Series(values[keep], index=self.cube.countries[idx[keep]], name=year)
+
+    def top(self, indicator, year, n=None):
+        """
+        Countries with the highest values of ``indicator`` in ``year``.
+
+        Parameters:
+        - indicator (str): Indicator name.
+        - year (str): Year label.
+        - n (int): Ranking length, at most ``self.n``.
+
+        Returns:
+        - pd.Series: Values indexed by country, highest first.
+        """
+        return self._lookup(self._top, indicator, year, n)
+
+    def bottom(self, indicator, year, n=None):
+        """
+        Countries with the lowest values of ``indicator`` in ``year``,
+        lowest first. See ``top``.
+        """
+        return self._lookup(self._bottom, indicator, year, n)
+
+    def table(self, indicator, which="top"):
+        """
+        Ranked country names of ``indicator`` for every year.
+
+        Parameters:
+        - indicator (str): Indicator name.
+        - which (str): 'top' or 'bottom'.
+
+        Returns:
+        - pd.DataFrame: One row per year, columns 1..n holding country names
+          (None where fewer countries have data).
+        """
+        positions = {"top": self._top, "bottom": self._bottom}[which]
+        i = self.cube.indicators.get_loc(indicator)
+        idx = positions[i].T
+        names = self.cube.countries.to_numpy(dtype=object)[idx]
+        names[np.isnan(self.cube.values[i][idx, np.arange(idx.shape[0])[:, None]])] = None
+        return pd.DataFrame(names, index=self.cube.years,
+                            columns=pd.RangeIndex(1, idx.shape[1] + 1, name="Rank"))
@@ -0,0 +1,146 @@
+"""Scoring with stored models, using NumPy only.
+
+Loads artifacts written by ``energy_analysis.artifacts`` by memory-mapping
+their arrays and answers requests in batches: ``ClusterScorer`` scales new
+country vectors and assigns them to the nearest stored centre,
+``CurveScorer`` evaluates the stored curve of a series at any years. Neither
+imports pandas, sklearn or scipy, so a service starts fast and shares the
+pages of the store between processes.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from energy_analysis.artifacts import FORMAT_VERSION, MANIFEST_FILE, artifact_dir
+from energy_analysis.curves import CURVES, param_names
+
+
+def load_artifact(root, name, version=None, kind=None):
+    """
+    Memory-map a stored artifact.
+
+    Parameters:
+    - root (str): Store directory.
+    - name (str): Artifact name.
+    - version (int): Version to load, the latest if None.
+    - kind (str): Expected kind; raises ValueError on a mismatch.
+
+    Returns:
+    - The manifest (dict) and a dict of read-only memory-mapped arrays.
+    """
+    path = artifact_dir(root, name, version)
+    with open(os.path.join(path, MANIFEST_FILE)) as fh:
+        manifest = json.load(fh)
+    if manifest["format"] > FORMAT_VERSION:
+        raise ValueError(f"{path} has format {manifest['format']}, "
+                         f"this reader supports up to {FORMAT_VERSION}")
+    if kind is not None and manifest["kind"] != kind:
+        raise ValueError(f"{path} holds {manifest['kind']!r}, expected {kind!r}")
+    arrays = {key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode="r")
+              for key in manifest["arrays"]}
+    return manifest, arrays
+
+
+def _keys(manifest, arrays):
+    """Series key (a string or a tuple of strings) -> row position."""
+    levels = [arrays[f"key_{i}"] for i in range(len(manifest["meta"]["key_names"]))]
+    if len(levels) == 1:
+        return {key: i for i, key in enumerate(levels[0].tolist())}
+    return {key: i for i, key in enumerate(zip(*(level.tolist() for level in levels)))}
+
+
+class ClusterScorer:
+    """Nearest-centre cluster assignment with a stored scaler and centres."""
+
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.version = manifest["version"]
+        self.scale = arrays["scale"]
+        self.offset = arrays["offset"]
+        self.centers = arrays["centers"]
+        self.features = arrays["features"]
+        self.projection_mean = arrays.get("projection_mean")
+        self.projection_components = arrays.get("projection_components")
+        self._center_sq = np.einsum("kd,kd->k", self.centers, self.centers)
+
+    @classmethod
+    def load(cls, root, name, version=None):
+        return cls(*load_artifact(root, name, version, kind="clusters"))
+
+    def transform(self, X):
+        """Scale raw rows like the fitted MinMaxScaler, then project them if
+        the clusters were found in a projected space."""
+        Z = np.asarray(X, dtype=np.float64) * self.scale + self.offset
+        if self.projection_components is not None:
+            Z = (Z - self.projection_mean) @ self.projection_components.T
+        return Z
+
+    def predict(self, X):
+        """
+        Cluster of every row of ``X``.
+
+        Parameters:
+        - X (np.ndarray): Raw (unscaled) rows, shape (n, d), columns in the
+          order of ``features``.
+
+        Returns:
+        - np.ndarray: Cluster per row, -1 for rows with missing values.
+        """
+        Z = self.transform(np.atleast_2d(X))
+        # |z - c|^2 = |z|^2 - 2 z.c + |c|^2; |z|^2 does not change the argmin
+        labels = (self._center_sq - 2 * Z @ self.centers.T).argmin(axis=1)
+        labels[np.isnan(Z).any(axis=1)] = -1
+        return labels
+
+
+class CurveScorer:
+    """Evaluates stored per-series curves at arbitrary years."""
+
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.version = manifest["version"]
+        self.first_year = manifest["meta"]["first_year"]
+        self.curves = [CURVES[name] for name in manifest["meta"]["models"]]
+        self.n_params = [len(param_names(curve)) for curve in self.curves]
+        self.model = arrays["model"]
+        self.params = arrays["params"]
+        self._arrays = arrays
+        self._positions = None
+
+    @classmethod
+    def load(cls, root, name, version=None):
+        return cls(*load_artifact(root, name, version, kind="curves"))
+
+    def positions(self, keys):
+        """Row positions of series keys; -1 for unknown series."""
+        if self._positions is None:
+            self._positions = _keys(self.manifest, self._arrays)
+        return np.array([self._positions.get(key, -1) for key in keys], dtype=np.intp)
+
+    def predict(self, keys, years):
+        """
+        Value of each requested series' curve in the requested year.
+
+        Parameters:
+        - keys (list): Series keys, e.g. (indicator, country) tuples.
+        - years (array-like): One year per key (or a single year for all).
+
+        Returns:
+        - np.ndarray: Curve values, NaN for unknown or unfitted series.
+        """
+        return self.predict_positions(self.positions(keys), years)
+
+    def predict_positions(self, positions, years):
+        """``predict`` for row positions from ``positions()``."""
+        positions = np.asarray(positions, dtype=np.intp)
+        x = np.broadcast_to(np.asarray(years, dtype=np.float64) - self.first_year,
+                            positions.shape)
+        out = np.full(positions.shape, np.nan)
+        codes = np.where(positions >= 0, self.model[positions], -1)
+        for code in np.unique(codes[codes >= 0]):
+            rows = codes == code
+            params = self.params[positions[rows], :self.n_params[code]]
+            out[rows] = self.curves[code](x[rows], *params.T)
+        return out
@@ -0,0 +1,162 @@
+"""Opt-in tracing of the analysis in Chrome trace-event format.
+
+Functions decorated with ``traced`` and the script's stages (``stage()``)
+are recorded as complete events with their duration, call number, result row
+count and, when memory tracing is on, the change in traced Python/NumPy
+allocations. ``write()`` saves them as JSON that chrome://tracing or
+https://ui.perfetto.dev can open. One stage can also be run under cProfile
+and dumped as a ``.prof`` file for pstats, snakeviz or flameprof.
+
+Tracing is off unless ``enable()`` is called; a disabled decorator costs one
+attribute check per call. Events from worker processes are not collected.
+"""
+
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+
+def row_count(result):
+    """Rows of a function result (DataFrame, array, Block or a tuple of them)."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if hasattr(result, "rows") and hasattr(result, "mask"):
+        return int(len(result.rows))
+    shape = getattr(result, "shape", None)
+    if shape:
+        return int(shape[0])
+    return None
+
+
+class Tracer:
+    """Collects trace events; the module-level ``TRACER`` is the one used."""
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.events = []
+        self.calls = Counter()
+        self.path = None
+        self.profile_stage = None
+        self.profile_path = None
+        self._origin = time.perf_counter()
+        self._stage = None
+
+    def enable(self, path=None, memory=False, profile_stage=None, profile_path=None):
+        """
+        Start recording.
+
+        Parameters:
+        - path (str): Trace file written by ``finish()``.
+        - memory (bool): Record allocation deltas with tracemalloc (slower).
+        - profile_stage (str): Run this ``stage()`` under cProfile.
+        - profile_path (str): Profile output, '<stage>.prof' by default.
+        """
+        self.enabled = True
+        self.path = path
+        self.memory = memory
+        self.profile_stage = profile_stage
+        self.profile_path = profile_path or (profile_stage and f"{profile_stage}.prof")
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _now(self):
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def _allocated(self):
+        return tracemalloc.get_traced_memory()[0] if self.memory else 0
+
+    def record(self, name, category, start, allocated, args=None):
+        """Add a complete event that started at ``start`` (µs) until now."""
+        args = dict(args or {})
+        if self.memory:
+            args["memory_delta_mb"] = round((self._allocated() - allocated) / 2**20, 3)
+        self.events.append({
+            "name": name, "cat": category, "ph": "X", "ts": start,
+            "dur": self._now() - start, "pid": os.getpid(),
+            "tid": threading.get_ident(), "args": args})
+
+    @contextmanager
+    def span(self, name, category="stage", **args):
+        """Record the enclosed block as one event."""
+        if not self.enabled:
+            yield
+            return
+        self.calls[name] += 1
+        start, allocated = self._now(), self._allocated()
+        try:
+            yield
+        finally:
+            self.record(name, category, start, allocated, {"call": self.calls[name], **args})
+
+    def stage(self, name):
+        """End the current stage of a top-to-bottom run and start ``name``."""
+        if not self.enabled:
+            return
+        self.end_stage()
+        profiler = None
+        if name == self.profile_stage:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        self._stage = (name, self._now(), self._allocated(), profiler)
+
+    def end_stage(self):
+        if self._stage is None:
+            return
+        name, start, allocated, profiler = self._stage
+        self._stage = None
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(self.profile_path)
+        self.calls[name] += 1
+        self.record(name, "stage", start, allocated)
+
+    def summary(self):
+        """Calls, total and maximum milliseconds per event name."""
+        import pandas as pd
+
+        frame = pd.DataFrame([(e["name"], e["cat"], e["dur"] / 1000) for e in self.events],
+                             columns=["name", "category", "ms"])
+        return frame.groupby(["category", "name"])["ms"].agg(
+            calls="count", total_ms="sum", max_ms="max").sort_values("total_ms", ascending=False)
+
+    def write(self, path):
+        """Save the events as Chrome trace-event JSON."""
+        with open(path, "w") as fh:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, fh)
+
+    def finish(self):
+        """End the last stage and write the trace file, if one was given."""
+        if not self.enabled:
+            return
+        self.end_stage()
+        if self.path:
+            self.write(self.path)
+
+
+TRACER = Tracer()
+
+
+def traced(func):
+    """Record each call of ``func`` while tracing is enabled."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not TRACER.enabled:
+            return func(*args, **kwargs)
+        TRACER.calls[name] += 1
+        call = TRACER.calls[name]
+        start, allocated = TRACER._now(), TRACER._allocated()
+        result = func(*args, **kwargs)
+        TRACER.record(name, "function", start, allocated,
+                      {"call": call, "rows": row_count(result)})
+        return result
+
+    return wrapper
@@ -0,0 +1,20 @@
+import os
+
+from energy_analysis.cache import source_digest
+
+
+def test_source_digest_drops_stale_entries(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    source, other = tmp_path / "shapes.csv", tmp_path / "other.csv"
+    source.write_text("a")
+    other.write_text("b")
+    old = source_digest(str(source), cache_dir)
+    kept = source_digest(str(other), cache_dir)
+    for name in (old, f"{old}-geom-0.1-None", kept, f"{kept}-geom-0.1-None"):
+        os.makedirs(os.path.join(cache_dir, name))
+
+    source.write_text("changed")
+    new = source_digest(str(source), cache_dir)
+    assert new != old
+    assert sorted(os.listdir(cache_dir)) == sorted(
+        ["index.json", kept, f"{kept}-geom-0.1-None"])
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from energy_analysis.clustering import IncrementalClusters
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    centers = np.array([[0.0, 0.0, 0.0], [10.0, 10.0, 10.0], [0.0, 10.0, 0.0]])
+    values = np.vstack([c + rng.uniform(-1, 1, size=(10, 3)) for c in centers])
+    # Pin the range so that updates inside it do not rescale
+    values[0], values[1] = -2.0, 12.0
+    return pd.DataFrame(values, index=[f"C{i}" for i in range(30)], columns=["2000", "2001", "2002"])
+
+
+def _check_state(state):
+    """Sums and counts agree with the labels, scaled rows with the scaler."""
+    np.testing.assert_allclose(state.scaled, state.scaler.transform(state.raw.to_numpy()))
+    k = len(state.counts)
+    np.testing.assert_array_equal(state.counts, np.bincount(state.labels, minlength=k))
+    sums = np.zeros_like(state.sums)
+    np.add.at(sums, state.labels, state.scaled)
+    np.testing.assert_allclose(state.sums, sums, atol=1e-12)
+
+
+def _fitted():
+    state = IncrementalClusters.fit(_frame(), n_clusters=3)
+    _check_state(state)
+    return state
+
+
+def test_update_without_changes():
+    state = _fitted()
+    assert state.update(_frame()).empty
+
+
+def test_update_revised_row_moves_cluster():
+    state = _fitted()
+    frame = _frame()
+    target = state.labels[frame.index.get_loc("C25")]
+    frame.loc["C5"] = frame.loc["C25"]
+    changes = state.update(frame)
+    assert list(changes.index) == ["C5"]
+    assert changes.loc["C5", "new_cluster"] == target
+    _check_state(state)
+
+
+def test_update_added_row():
+    state = _fitted()
+    frame = _frame()
+    frame.loc["New"] = frame.loc["C15"] + 0.1
+    changes = state.update(frame)
+    assert list(changes.index) == ["New"]
+    assert np.isnan(changes.loc["New", "old_cluster"])
+    assert changes.loc["New", "new_cluster"] == state.labels[frame.index.get_loc("C15")]
+    _check_state(state)
+
+
+def test_update_dropped_row():
+    state = _fitted()
+    counts = state.counts.copy()
+    label = state.labels[_frame().index.get_loc("C3")]
+    changes = state.update(_frame().drop(index="C3"))
+    assert list(changes.index) == ["C3"] and np.isnan(changes.loc["C3", "new_cluster"])
+    assert state.counts[label] == counts[label] - 1
+    _check_state(state)
+
+
+def test_update_out_of_range_row_rescales():
+    state = _fitted()
+    frame = _frame()
+    frame.loc["Far"] = 30.0
+    state.update(frame)
+    assert state.scaler.data_max_.max() == 30.0
+    _check_state(state)
+
+
+def test_update_new_column():
+    state = _fitted()
+    labels = state.labels.copy()
+    frame = _frame()
+    frame["2003"] = frame["2002"]
+    changes = state.update(frame)
+    assert list(state.raw.columns) == ["2000", "2001", "2002", "2003"]
+    assert changes.empty
+    np.testing.assert_array_equal(state.labels, labels)
+    _check_state(state)
+
+
+def test_update_dropped_column():
+    state = _fitted()
+    with pytest.raises(ValueError):
+        state.update(_frame().drop(columns="2001"))
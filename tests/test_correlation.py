@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from energy_analysis.correlation import pairwise_corr
+
+
+def _gappy(rows=120, cols=15, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(rows, cols))
+    values[:, ::4] = np.round(values[:, ::4])       # ties
+    values[rng.random(values.shape) < 0.2] = np.nan
+    values[:, 3] = values[:, 2] * 2                  # same missing rows as column 2
+    values[5:, 7] = np.nan                           # too few pairs
+    values[:, 9] = np.where(np.isnan(values[:, 9]), np.nan, 1.0)   # constant
+    return values
+
+
+@pytest.mark.parametrize("method", ["pearson", "spearman"])
+def test_pairwise_corr_matches_pandas(method):
+    values = _gappy()
+    expected = pd.DataFrame(values).corr(method).to_numpy()
+    np.testing.assert_allclose(pairwise_corr(values, method), expected, atol=1e-12)
+
+
+@pytest.mark.parametrize("method", ["pearson", "spearman"])
+def test_pairwise_corr_rows_subset(method):
+    values = _gappy(seed=1)
+    expected = pd.DataFrame(values).corr(method).to_numpy()
+    columns = [11, 2, 7, 0]
+    np.testing.assert_allclose(pairwise_corr(values, method, columns=columns, chunk_size=3),
+                               expected[columns], atol=1e-12)
+
+
+def test_pairwise_corr_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        pairwise_corr(_gappy(), "kendall")
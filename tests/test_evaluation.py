@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+from sklearn.metrics import silhouette_score
+
+from energy_analysis.evaluation import chunked_silhouette
+
+
+@pytest.mark.parametrize("memory_limit_mb", [256, 0.01])
+def test_chunked_silhouette_matches_sklearn(memory_limit_mb):
+    rng = np.random.default_rng(0)
+    data = np.vstack([rng.normal(center, 1.0, size=(40, 3)) for center in (0, 4, 8)])
+    labels = np.repeat(["a", "b", "c"], 40)
+    labels[7] = "d"                      # a singleton cluster scores 0
+    assert chunked_silhouette(data, labels, memory_limit_mb) == pytest.approx(
+        silhouette_score(data, labels), abs=1e-8)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from scipy.optimize import curve_fit
+from scipy.stats import t
+
+from energy_analysis.curves import exp_model, simple_model
+from energy_analysis.fitting import err_bands, fit_batch
+
+nan = np.nan
+
+
+def _series(func, params, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(12, dtype=np.float64)
+    Y = np.array([func(x, *p) for p in params]) + rng.normal(0, 0.1, size=(len(params), len(x)))
+    return x, Y
+
+
+@pytest.mark.parametrize("func, params, p0", [
+    (simple_model, [(0.1, -1.0, 5.0), (-0.05, 2.0, 1.0), (0.0, 0.5, 3.0)], None),
+    (exp_model, [(2.0, 0.1), (5.0, -0.05), (1.0, 0.2)], [1.0, 0.1]),
+])
+def test_fit_batch_matches_curve_fit(func, params, p0):
+    x, Y = _series(func, params)
+    Y[1, [0, 5, 11]] = nan
+    Y[2, 3:] = nan
+    Y[2, :2] = nan                        # one observation: no fit
+    fits = fit_batch(x, Y, func, p0=p0, workers=1)
+    names = list(fits.columns[3:3 + len(params[0])])
+
+    for i in range(2):
+        ok = np.isfinite(Y[i])
+        expected, cov = curve_fit(func, x[ok], Y[i, ok], p0=p0)
+        np.testing.assert_allclose(fits[names].iloc[i], expected, rtol=1e-5, atol=1e-8)
+        for j, k in zip(*np.triu_indices(len(names))):
+            assert fits[f"cov_{names[j]}_{names[k]}"].iloc[i] == pytest.approx(
+                cov[j, k], rel=1e-4, abs=1e-10)
+        assert fits["n_obs"].iloc[i] == ok.sum()
+        assert fits["converged"].iloc[i]
+    assert not fits["converged"].iloc[2]
+    assert np.isnan(fits["resid_var"].iloc[2])
+
+
+def test_err_bands_matches_delta_method():
+    x, Y = _series(simple_model, [(0.1, -1.0, 5.0), (-0.05, 2.0, 1.0)])
+    fits = [curve_fit(simple_model, x, y) for y in Y]
+    x_eval = np.linspace(0, 15, 7)
+    basis = np.column_stack([x_eval**2, x_eval, np.ones_like(x_eval)])
+    t_value = t.ppf(0.975, len(x) - 3)
+
+    stacked = err_bands(np.array([p for p, _ in fits]), np.array([c for _, c in fits]),
+                        x, simple_model, x_eval=x_eval)
+    for i, (params, cov) in enumerate(fits):
+        fitted = basis @ params
+        half = t_value * np.sqrt(np.einsum("mp,pq,mq->m", basis, cov, basis))
+        single = err_bands(params, cov, x, simple_model, x_eval=x_eval)
+        for got, expected in zip(single, (fitted, fitted - half, fitted + half)):
+            np.testing.assert_allclose(got, expected, rtol=1e-6)
+        for got, expected in zip(stacked, single):
+            np.testing.assert_allclose(got[i], expected)
+
+
+def test_err_bands_prediction_band_is_wider():
+    x, Y = _series(simple_model, [(0.1, -1.0, 5.0)])
+    params, cov = curve_fit(simple_model, x, Y[0])
+    _, lower, upper = err_bands(params, cov, x, simple_model)
+    _, p_lower, p_upper = err_bands(params, cov, x, simple_model, resid_var=0.01)
+    assert (p_lower < lower).all() and (p_upper > upper).all()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from energy_analysis.preprocessing import interpolate_years
+
+nan = np.nan
+
+
+def _series():
+    return np.array([[nan, 1.0, nan, 3.0, nan],
+                     [nan, nan, 5.0, nan, nan],
+                     [nan, nan, nan, nan, nan]])
+
+
+def test_linear_keep_leaves_edges_missing():
+    out, empty = interpolate_years(_series())
+    np.testing.assert_array_equal(out, [[nan, 1.0, 2.0, 3.0, nan],
+                                        [nan, nan, 5.0, nan, nan],
+                                        [nan, nan, nan, nan, nan]])
+    np.testing.assert_array_equal(empty, [False, False, True])
+
+
+def test_linear_nearest_fills_edges():
+    out, _ = interpolate_years(_series(), edges="nearest")
+    np.testing.assert_array_equal(out, [[1.0, 1.0, 2.0, 3.0, 3.0],
+                                        [5.0, 5.0, 5.0, 5.0, 5.0],
+                                        [nan, nan, nan, nan, nan]])
+
+
+def test_ffill_carries_forward_only():
+    out, _ = interpolate_years(_series(), method="ffill")
+    np.testing.assert_array_equal(out, [[nan, 1.0, 1.0, 3.0, 3.0],
+                                        [nan, nan, 5.0, 5.0, 5.0],
+                                        [nan, nan, nan, nan, nan]])
+    out, _ = interpolate_years(_series(), method="ffill", edges="nearest")
+    np.testing.assert_array_equal(out[:2, 0], [1.0, 5.0])
+
+
+def test_inplace_and_any_shape():
+    values = _series().astype(np.float32).reshape(3, 1, 5)
+    out, empty = interpolate_years(values, inplace=True)
+    assert out.shape == (3, 1, 5) and empty.shape == (3, 1)
+    assert values[0, 0, 2] == 2.0
+
+
+def test_unknown_edges():
+    with pytest.raises(ValueError):
+        interpolate_years(_series(), edges="zero")